@@ -1,40 +1,71 @@
 import os
 import logging
-from flask import Flask, request, jsonify, send_file, Response, make_response
+from flask import Flask, request, jsonify, send_file, Response, make_response, stream_with_context, g
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge, UnsupportedMediaType
 from flask_cors import CORS
 from functools import wraps
-import yt_dlp
-from openai import OpenAI
 import requests
-from io import BytesIO
-import base64
-import io
+from requests.adapters import HTTPAdapter
 import json
 import re
+import sys
 import time
+import hashlib
+import hmac
+import secrets
+import tempfile
+import threading
+import fcntl
+import sqlite3
+import uuid
+import random
+import subprocess
+import shutil
+import asyncio
+import contextvars
+import unicodedata
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from contextlib import contextmanager, asynccontextmanager
 
 from dotenv import load_dotenv
-from anthropic import Anthropic
-import anthropic
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import NoTranscriptFound
-from youtube_transcript_api.formatters import JSONFormatter
-import json
-from langdetect import detect, LangDetectException
 
-from deep_translator import GoogleTranslator
+# The SDKs, yt_dlp, youtube_transcript_api, langdetect, deep_translator and boto3 are
+# imported where they are used, so endpoints that never touch them do not pay
+# for loading them and workers start faster.
 
 app = Flask(__name__)
 CORS(app)
 
-logging.basicConfig(level=logging.INFO)
-
 # Load environment variables from .env
 load_dotenv()
 
+# Per-request context, propagated into worker pools by submit_in_context
+_request_id = contextvars.ContextVar('request_id', default='-')
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": _request_id.get(),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # 'json' or 'text'
+_log_handler = logging.StreamHandler()
+if LOG_FORMAT == 'json':
+    _log_handler.setFormatter(JsonLogFormatter())
+logging.basicConfig(level=logging.INFO, handlers=[_log_handler])
+
 # Get the API keys from environment variables
 openai_api_key = os.getenv('OPENAI_API_KEY')
 claude_api_key = os.getenv('CLAUDE_API_KEY')
@@ -44,22 +75,504 @@ if not openai_api_key:
 if not claude_api_key:
     raise ValueError("No Claude API key found. Please set the CLAUDE_API_KEY environment variable.")
 
-openai_client = OpenAI(api_key=openai_api_key)
-claude_client = anthropic.Anthropic(api_key=claude_api_key)
+# Serving settings; gunicorn.conf.py holds the worker, timeout and header limits
+MAX_REQUEST_BYTES = int(os.getenv('MAX_REQUEST_BYTES', 10 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+# Tighter caps for JSON bodies: requests that carry a URL and options, and text to summarize
+MAX_JSON_BODY_BYTES = int(os.getenv('MAX_JSON_BODY_BYTES', 64 * 1024))
+MAX_TEXT_BODY_BYTES = int(os.getenv('MAX_TEXT_BODY_BYTES', 2 * 1024 * 1024))
+BODY_CHUNK_BYTES = 64 * 1024  # request bodies are read, and streamed response parts written, in pieces this size
+_shutting_down = threading.Event()
+_background_services_pid = None
+_background_services_lock = threading.Lock()
+
+# Tenants: hashed API keys with per-key rate limits, concurrency caps and daily budgets,
+# kept in SQLite so every worker process enforces the same counters
+TENANTS_DB_PATH = os.getenv('TENANTS_DB_PATH', 'tenants.db')
+TENANT_RATE_WINDOW_SECONDS = int(os.getenv('TENANT_RATE_WINDOW_SECONDS', 60))
+TENANT_DEFAULT_RATE_LIMIT = int(os.getenv('TENANT_DEFAULT_RATE_LIMIT', 60))  # requests per window, 0 for none
+TENANT_DEFAULT_MAX_CONCURRENT = int(os.getenv('TENANT_DEFAULT_MAX_CONCURRENT', 4))
+TENANT_DEFAULT_MAX_JOBS = int(os.getenv('TENANT_DEFAULT_MAX_JOBS', 8))
+TENANT_DEFAULT_DAILY_TOKENS = int(os.getenv('TENANT_DEFAULT_DAILY_TOKENS', 2_000_000))
+TENANT_DEFAULT_DAILY_IMAGES = int(os.getenv('TENANT_DEFAULT_DAILY_IMAGES', 50))
+TENANT_SLOT_STALE_SECONDS = int(os.getenv('TENANT_SLOT_STALE_SECONDS', 900))  # reclaims slots of crashed workers
+TENANT_CACHE_SECONDS = int(os.getenv('TENANT_CACHE_SECONDS', 30))
+# The admin authenticates with ADMIN_API_KEY, or with the old username/password headers when enabled
+ADMIN_API_KEY = os.getenv('ADMIN_API_KEY', '')
+LEGACY_ADMIN_AUTH = os.getenv('LEGACY_ADMIN_AUTH', 'false').lower() == 'true'
+ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
+ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', '')
+ADMIN_TENANT = 'admin'
+_tenant_cache = OrderedDict()
+_tenant_cache_lock = threading.Lock()
+_tenants_ready = False
+_tenant_usage = contextvars.ContextVar('tenant_usage', default=None)
+
+# Shared HTTP connection pool settings
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 50))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 120))
+
+# Provider resilience: every call gets what is left of the request budget as its
+# deadline, each provider has a circuit breaker, and slow idempotent calls are hedged
+REQUEST_BUDGET_SECONDS = float(os.getenv('REQUEST_BUDGET_SECONDS', 540))  # below the gunicorn timeout
+JOB_BUDGET_SECONDS = float(os.getenv('JOB_BUDGET_SECONDS', 3600))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', 30))
+HEDGE_AFTER_SECONDS = float(os.getenv('HEDGE_AFTER_SECONDS', 10))  # 0 disables hedging
+HEDGE_WORKERS = int(os.getenv('HEDGE_WORKERS', 32))
+FALLBACK_ATTEMPTS = int(os.getenv('FALLBACK_ATTEMPTS', 2))  # attempts per tier before falling back
+_deadline = contextvars.ContextVar('deadline', default=None)
+_breakers = {}
+_hedge_executor = None
+_openai_client = None
+_claude_client = None
+_http_session = None
+_client_lock = threading.Lock()
+
+# Async pipeline engine settings
+ENGINE_BLOCKING_WORKERS = int(os.getenv('ENGINE_BLOCKING_WORKERS', 32))
+_engine_loop = None
+_engine_pid = None
+_async_openai_client = None
+_async_claude_client = None
+_async_http_client = None
+_async_inflight = {}  # only touched from the engine loop
+
+# Metrics settings
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint'),
+    'pipeline_stage_duration_seconds': ('histogram', 'Time spent in each pipeline stage'),
+    'pipeline_stage_in_flight': ('gauge', 'Pipeline stages currently running'),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result'),
+    'provider_tokens_total': ('counter', 'Tokens used by provider, model and direction'),
+    'provider_images_total': ('counter', 'Images generated by model'),
+    'provider_audio_seconds_total': ('counter', 'Seconds of audio transcribed by model'),
+    'blob_store_requests_total': ('counter', 'Shared blob store operations by operation and result'),
+    'tenant_throttled_total': ('counter', 'Requests refused with 429 by tenant and reason'),
+    'circuit_breaker_state': ('gauge', 'Circuit breaker state by provider (0 closed, 1 half-open, 2 open)'),
+    'circuit_breaker_transitions_total': ('counter', 'Circuit breaker state changes by provider and new state'),
+    'provider_calls_rejected_total': ('counter', 'Provider calls refused before sending by provider and reason'),
+    'provider_hedges_total': ('counter', 'Hedged provider calls by provider and outcome'),
+    'provider_fallbacks_total': ('counter', 'Completions served by a fallback model by stage and model'),
+    'prewarm_discovered_total': ('counter', 'New uploads found on watched channels and playlists by backend'),
+    'prewarm_videos_total': ('counter', 'Videos pre-warmed by reason and result'),
+}
+_metric_values = {}
+_metrics_lock = threading.Lock()
+
+# Result cache settings for the transcript -> summary -> infographic pipeline
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', 'result_cache')
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+RESULT_CACHE_EVICT_INTERVAL = 60  # seconds between eviction sweeps
+RESULT_CACHE_TTLS = {
+    'transcript': int(os.getenv('RESULT_CACHE_TTL_TRANSCRIPT', 7 * 86400)),
+    'translation': int(os.getenv('RESULT_CACHE_TTL_TRANSLATION', 30 * 86400)),
+    'summary': int(os.getenv('RESULT_CACHE_TTL_SUMMARY', 30 * 86400)),
+    'infographic': int(os.getenv('RESULT_CACHE_TTL_INFOGRAPHIC', 30 * 86400)),
+}
+_last_result_cache_eviction = 0.0
+
+# Shared tier behind the local audio and result caches, e.g. s3://bucket/prefix
+# or file:///mnt/shared/cache; unset keeps every cache on local disk only
+BLOB_STORE_URL = os.getenv('BLOB_STORE_URL', '')
+BLOB_STORE_ENDPOINT_URL = os.getenv('BLOB_STORE_ENDPOINT_URL') or None  # MinIO and other S3-compatible stores
+BLOB_STORE_REGION = os.getenv('BLOB_STORE_REGION') or None
+_blob_store = None
+_blob_store_pid = None
+
+# Lock files used to coalesce duplicate work across gunicorn workers
+LOCK_DIR = os.getenv('LOCK_DIR', os.path.join(tempfile.gettempdir(), 'youtube-backend-locks'))
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# Transcript acquisition settings
+TRANSCRIPT_LANGUAGES = [code.strip() for code in os.getenv('TRANSCRIPT_LANGUAGES', 'en').split(',') if code.strip()]
+TRANSCRIPT_WHISPER_FALLBACK = os.getenv('TRANSCRIPT_WHISPER_FALLBACK', 'true').lower() == 'true'
+TRANSCRIPT_HEDGE_SECONDS = float(os.getenv('TRANSCRIPT_HEDGE_SECONDS', 8))  # negative: only after captions fail
+
+# Pre-warming: new uploads on watched channels and playlists are transcribed and
+# summarized ahead of requests, and frequently requested videos are refreshed
+# before their cache entries expire
+PREWARM_ENABLED = os.getenv('PREWARM_ENABLED', 'false').lower() == 'true'
+PREWARM_WATCHLIST = [source.strip() for source in os.getenv('PREWARM_WATCHLIST', '').split(',') if source.strip()]
+PREWARM_DB_PATH = os.getenv('PREWARM_DB_PATH', 'prewarm.db')
+PREWARM_INTERVAL_SECONDS = int(os.getenv('PREWARM_INTERVAL_SECONDS', 900))
+PREWARM_HOURS = os.getenv('PREWARM_HOURS', '1-6')  # UTC hours, e.g. "22-6"; empty means any time
+PREWARM_CONCURRENCY = int(os.getenv('PREWARM_CONCURRENCY', 2))
+PREWARM_DAILY_TOKENS = int(os.getenv('PREWARM_DAILY_TOKENS', 500000))
+PREWARM_DISCOVER_LIMIT = int(os.getenv('PREWARM_DISCOVER_LIMIT', 10))  # newest uploads checked per source
+PREWARM_WHISPER = os.getenv('PREWARM_WHISPER', 'false').lower() == 'true'
+PREWARM_REFRESH_AHEAD_SECONDS = int(os.getenv('PREWARM_REFRESH_AHEAD_SECONDS', 2 * 86400))
+PREWARM_HOT_SCORE = float(os.getenv('PREWARM_HOT_SCORE', 3))
+PREWARM_HIT_HALF_LIFE_SECONDS = float(os.getenv('PREWARM_HIT_HALF_LIFE_SECONDS', 3 * 86400))
+PREWARM_TENANT = 'prewarm'
+YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
+YOUTUBE_API_ENDPOINT = os.getenv('YOUTUBE_API_ENDPOINT')  # override for a local stub of the Data API
+_prewarm_run = contextvars.ContextVar('prewarm_run', default=False)
+_refresh_ahead = contextvars.ContextVar('refresh_ahead', default=0)
+_youtube_api = None
+_uploads_playlists = {}
+
+# Background job settings
+JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', 'jobs.db')
+JOB_POOL = os.getenv('JOB_POOL', 'thread')  # 'thread' or 'process'
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', 32))
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 3600))
+_job_executor = None
+_job_slots = threading.BoundedSemaphore(JOB_WORKERS)
+_job_store_ready = False
+
+# Batch settings
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 8))
+_batch_executor = None
+_provider_batches_ready = False
+
+# Language detection settings
+LANGDETECT_SEED = int(os.getenv('LANGDETECT_SEED', 0))
+LANGDETECT_WINDOWS = int(os.getenv('LANGDETECT_WINDOWS', 5))
+LANGDETECT_WINDOW_CHARS = int(os.getenv('LANGDETECT_WINDOW_CHARS', 400))
+_language_detector_factory = None
+
+# Translation settings
+TRANSLATION_BACKEND = os.getenv('TRANSLATION_BACKEND', 'openai')  # 'openai' or 'google'
+TRANSLATION_CHUNK_CHARS = int(os.getenv('TRANSLATION_CHUNK_CHARS', 1000))
+TRANSLATION_CONCURRENCY = int(os.getenv('TRANSLATION_CONCURRENCY', 8))
+TRANSLATION_RATE_PER_SECOND = float(os.getenv('TRANSLATION_RATE_PER_SECOND', 5))
+TRANSLATION_RATE_BURST = int(os.getenv('TRANSLATION_RATE_BURST', 10))
+RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', 5))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', 1.0))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 30.0))
+_translation_executor = None
+
+# Translation memory: previously translated segments, reused across texts
+TRANSLATION_MEMORY_PATH = os.getenv('TRANSLATION_MEMORY_PATH', 'translation_memory.db')
+TRANSLATION_MEMORY_LRU_SIZE = int(os.getenv('TRANSLATION_MEMORY_LRU_SIZE', 10000))
+_translation_memory_lru = OrderedDict()
+_translation_memory_stats = {'memory_hits': 0, 'store_hits': 0, 'misses': 0}
+_translation_memory_lock = threading.Lock()
+_translation_memory_ready = False
+
+# Summarization settings
+SUMMARY_MAP_MODEL = os.getenv('SUMMARY_MAP_MODEL', 'claude-3-haiku-20240307')
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', 3000))
+SUMMARY_CONCURRENCY = int(os.getenv('SUMMARY_CONCURRENCY', 4))
+SUMMARY_SECTION_SECONDS = float(os.getenv('SUMMARY_SECTION_SECONDS', 600))  # map step for long videos
+SUMMARY_FALLBACK_MODELS = os.getenv('SUMMARY_FALLBACK_MODELS', 'anthropic:claude-3-haiku-20240307,openai:gpt-3.5-turbo')
+
+# Infographic variants: ?w= thumbnails and WebP/AVIF by Accept header, made with Pillow
+INFOGRAPHIC_MIN_WIDTH = int(os.getenv('INFOGRAPHIC_MIN_WIDTH', 16))
+INFOGRAPHIC_WEBP_QUALITY = int(os.getenv('INFOGRAPHIC_WEBP_QUALITY', 80))
+INFOGRAPHIC_AVIF_QUALITY = int(os.getenv('INFOGRAPHIC_AVIF_QUALITY', 60))
+IMAGE_CHUNK_BYTES = 64 * 1024
+_image_encoders = None
+
+# Whisper transcription settings
+WHISPER_MODEL = "whisper-1"
+WHISPER_SEGMENT_SECONDS = int(os.getenv('WHISPER_SEGMENT_SECONDS', 600))
+WHISPER_CONCURRENCY = int(os.getenv('WHISPER_CONCURRENCY', 4))
+WHISPER_SPEECH_BITRATE = os.getenv('WHISPER_SPEECH_BITRATE', '24k')
+WHISPER_SILENCE_THRESHOLD = os.getenv('WHISPER_SILENCE_THRESHOLD', '-35dB')
+WHISPER_SILENCE_MIN_SECONDS = float(os.getenv('WHISPER_SILENCE_MIN_SECONDS', 0.5))
+_whisper_executor = None
+
+# Audio cache settings
+AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR', 'temp_audio')
+AUDIO_CACHE_TTL = int(os.getenv('AUDIO_CACHE_TTL', 86400))
+AUDIO_CACHE_MAX_BYTES = int(os.getenv('AUDIO_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+AUDIO_CACHE_EVICT_INTERVAL = int(os.getenv('AUDIO_CACHE_EVICT_INTERVAL', 300))
+AUDIO_STREAM_CHUNK_BYTES = 64 * 1024
+NATIVE_AUDIO_FORMAT = 'bestaudio[ext=m4a]/bestaudio'
+AUDIO_MIMETYPES = {
+    'mp3': 'audio/mpeg',
+    'm4a': 'audio/mp4',
+    'webm': 'audio/webm',
+    'opus': 'audio/ogg',
+    'ogg': 'audio/ogg',
+}
+_audio_streams = {}
+
+# Endpoints that spend provider budget; a tenant over a budget gets 429 from these only
+PRICED_ENDPOINTS = {
+    'summarize_youtube': ('tokens',),
+    'infographic_youtube': ('tokens', 'images'),
+    'create_infographic': ('images',),
+    'transcribe_youtube_api': ('tokens',),
+    'summarize_text': ('tokens',),
+    'youtube_summary_infographic': ('tokens', 'images'),
+    'summarize_youtube_stream': ('tokens',),
+    'summarize_text_stream': ('tokens',),
+    'create_job': ('tokens', 'images'),
+    'batch_summarize': ('tokens',),
+}
+
+class TenantThrottled(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Rate limited ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class UsageMeter:
+    """Provider usage of one request or job, charged to its tenant when it finishes."""
+
+    def __init__(self, tenant_id):
+        self.tenant_id = tenant_id
+        self.tokens = 0
+        self.images = 0
+        self._lock = threading.Lock()
+
+    def add(self, tokens=0, images=0):
+        with self._lock:
+            self.tokens += tokens
+            self.images += images
+
+    def flush(self):
+        with self._lock:
+            tokens, images = self.tokens, self.images
+            self.tokens = self.images = 0
+        if tokens or images:
+            try:
+                charge_tenant(self.tenant_id, tokens, images)
+            except Exception as e:
+                logging.error(f"Error charging usage to tenant {self.tenant_id}: {str(e)}")
+
+def hash_api_key(api_key):
+    # API keys are long random tokens, so a fast unsalted hash is enough to keep them out of the database
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
 
+def init_tenants_db():
+    global _tenants_ready
+    if _tenants_ready:
+        return
+    with sqlite_db(TENANTS_DB_PATH) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tenants (
+                tenant_id TEXT PRIMARY KEY,
+                key_hash TEXT UNIQUE,
+                rate_limit INTEGER NOT NULL,
+                max_concurrent INTEGER NOT NULL,
+                max_jobs INTEGER NOT NULL,
+                daily_tokens INTEGER NOT NULL,
+                daily_images INTEGER NOT NULL,
+                disabled INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tenant_requests (
+                tenant_id TEXT NOT NULL,
+                ts REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS tenant_requests_window ON tenant_requests (tenant_id, ts)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tenant_slots (
+                slot_id TEXT PRIMARY KEY,
+                tenant_id TEXT NOT NULL,
+                started_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS tenant_slots_tenant ON tenant_slots (tenant_id)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tenant_usage (
+                tenant_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                tokens INTEGER NOT NULL DEFAULT 0,
+                images INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (tenant_id, day)
+            )
+        """)
+    _tenants_ready = True
+
+def _tenant_cache_get(cache_id):
+    with _tenant_cache_lock:
+        entry = _tenant_cache.get(cache_id)
+        if entry is not None and time.monotonic() - entry[1] < TENANT_CACHE_SECONDS:
+            _tenant_cache.move_to_end(cache_id)
+            return entry
+    return None
+
+def _tenant_cache_put(cache_id, tenant):
+    with _tenant_cache_lock:
+        _tenant_cache[cache_id] = (tenant, time.monotonic())
+        _tenant_cache.move_to_end(cache_id)
+        while len(_tenant_cache) > 10000:
+            _tenant_cache.popitem(last=False)
+
+def load_tenant(key_hash=None, tenant_id=None):
+    """Tenant row by key hash or ID, cached in memory for TENANT_CACHE_SECONDS.
+
+    Unknown keys are cached too, so a client retrying a bad key does not hit
+    SQLite on every request. Changes made by another worker show up within
+    the cache lifetime.
+    """
+    cache_id = ('key', key_hash) if key_hash is not None else ('id', tenant_id)
+    entry = _tenant_cache_get(cache_id)
+    if entry is not None:
+        return entry[0]
+    init_tenants_db()
+    column, value = ('key_hash', key_hash) if key_hash is not None else ('tenant_id', tenant_id)
+    with sqlite_db(TENANTS_DB_PATH) as conn:
+        row = conn.execute(f"SELECT * FROM tenants WHERE {column} = ?", (value,)).fetchone()
+    tenant = dict(row) if row is not None and not row['disabled'] else None
+    _tenant_cache_put(cache_id, tenant)
+    return tenant
+
+def legacy_admin_tenant():
+    # The admin login is unlimited unless an 'admin' tenant row sets limits for it
+    return load_tenant(tenant_id=ADMIN_TENANT) or {
+        'tenant_id': ADMIN_TENANT, 'rate_limit': 0, 'max_concurrent': 0, 'max_jobs': 0,
+        'daily_tokens': 0, 'daily_images': 0,
+    }
+
+def authenticate_request():
+    api_key = request.headers.get('X-API-Key')
+    authorization = request.headers.get('Authorization', '')
+    if not api_key and authorization.startswith('Bearer '):
+        api_key = authorization[len('Bearer '):].strip()
+    if api_key:
+        if ADMIN_API_KEY and hmac.compare_digest(api_key.encode(), ADMIN_API_KEY.encode()):
+            return legacy_admin_tenant()
+        return load_tenant(key_hash=hash_api_key(api_key))
+
+    # Without a configured password the headers can never match, even if enabled
+    if LEGACY_ADMIN_AUTH and ADMIN_PASSWORD:
+        username = request.headers.get('username') or ''
+        password = request.headers.get('password') or ''
+        if (hmac.compare_digest(username.encode(), ADMIN_USERNAME.encode())
+                & hmac.compare_digest(password.encode(), ADMIN_PASSWORD.encode())):
+            return legacy_admin_tenant()
+    return None
+
+def usage_day(now=None):
+    return time.strftime('%Y-%m-%d', time.gmtime(now))
+
+def seconds_until_next_day(now):
+    return int(86400 - now % 86400) + 1
 
+def admit_request(tenant, budgets=(), take_slot=False):
+    """Check the tenant's budgets, rate limit and concurrency cap, then take a slot.
+
+    Returns the slot ID to pass to release_slot, or None when no slot was
+    taken. Raises TenantThrottled if any limit is exceeded.
+    """
+    init_tenants_db()
+    tenant_id = tenant['tenant_id']
+    now = time.time()
+    conn = sqlite_connect(TENANTS_DB_PATH)
+    try:
+        # One write transaction, so concurrent workers cannot both take the last slot
+        conn.execute("BEGIN IMMEDIATE")
+        if budgets:
+            usage = conn.execute(
+                "SELECT tokens, images FROM tenant_usage WHERE tenant_id = ? AND day = ?",
+                (tenant_id, usage_day(now))
+            ).fetchone()
+            for budget in budgets:
+                limit = tenant[f"daily_{budget}"]
+                if limit and usage is not None and usage[budget] >= limit:
+                    raise TenantThrottled(f"daily_{budget}", seconds_until_next_day(now))
+
+        if tenant['rate_limit']:
+            window_start = now - TENANT_RATE_WINDOW_SECONDS
+            conn.execute("DELETE FROM tenant_requests WHERE tenant_id = ? AND ts <= ?", (tenant_id, window_start))
+            count, oldest = conn.execute(
+                "SELECT COUNT(*), MIN(ts) FROM tenant_requests WHERE tenant_id = ?", (tenant_id,)
+            ).fetchone()
+            if count >= tenant['rate_limit']:
+                # The window slides: a request is allowed again once the oldest one leaves it
+                raise TenantThrottled('rate', max(1, int(oldest + TENANT_RATE_WINDOW_SECONDS - now) + 1))
+            conn.execute("INSERT INTO tenant_requests (tenant_id, ts) VALUES (?, ?)", (tenant_id, now))
+
+        slot_id = None
+        if take_slot and tenant['max_concurrent']:
+            conn.execute(
+                "DELETE FROM tenant_slots WHERE tenant_id = ? AND started_at < ?",
+                (tenant_id, now - TENANT_SLOT_STALE_SECONDS)
+            )
+            active = conn.execute("SELECT COUNT(*) FROM tenant_slots WHERE tenant_id = ?", (tenant_id,)).fetchone()[0]
+            if active >= tenant['max_concurrent']:
+                raise TenantThrottled('concurrency', 1)
+            slot_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO tenant_slots (slot_id, tenant_id, started_at) VALUES (?, ?, ?)",
+                (slot_id, tenant_id, now)
+            )
+        conn.execute("COMMIT")
+        return slot_id
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def release_slot(slot_id):
+    with sqlite_db(TENANTS_DB_PATH) as conn:
+        conn.execute("DELETE FROM tenant_slots WHERE slot_id = ?", (slot_id,))
+
+def charge_tenant(tenant_id, tokens=0, images=0):
+    init_tenants_db()
+    with sqlite_db(TENANTS_DB_PATH) as conn:
+        conn.execute(
+            """
+            INSERT INTO tenant_usage (tenant_id, day, tokens, images) VALUES (?, ?, ?, ?)
+            ON CONFLICT (tenant_id, day) DO UPDATE SET
+                tokens = tokens + excluded.tokens, images = images + excluded.images
+            """,
+            (tenant_id, usage_day(), tokens, images)
+        )
+
+def throttled_response(e):
+    inc_counter('tenant_throttled_total', tenant=g.tenant['tenant_id'], reason=e.reason)
+    response = jsonify({"error": str(e), "reason": e.reason, "retry_after": e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
 
 # Authentication decorator
 def require_auth(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        username = request.headers.get('username')
-        password = request.headers.get('password')
-        if username == 'admin' and password == 'AlekhyaAnu':
-            return f(*args, **kwargs)
-        return jsonify({"error": "Authentication failed"}), 401
+        tenant = authenticate_request()
+        if tenant is None:
+            return jsonify({"error": "Authentication failed"}), 401
+        g.tenant = tenant
+        budgets = PRICED_ENDPOINTS.get(request.endpoint)
+        try:
+            # Only work that spends provider budget counts against the concurrency cap
+            slot_id = admit_request(tenant, budgets or (), take_slot=budgets is not None)
+        except TenantThrottled as e:
+            return throttled_response(e)
+
+        meter = UsageMeter(tenant['tenant_id'])
+        _tenant_usage.set(meter)
+
+        def finish():
+            if slot_id is not None:
+                release_slot(slot_id)
+            meter.flush()
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            finish()
+            raise
+        # Streaming responses keep their slot and record usage until the last chunk is sent
+        response.call_on_close(finish)
+        return response
     return decorated
 
+def require_admin(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if g.tenant['tenant_id'] != ADMIN_TENANT:
+            return jsonify({"error": "Admin access required"}), 403
+        return f(*args, **kwargs)
+    return require_auth(decorated)
+
 # Add a new function to extract YouTube video ID
 def extract_youtube_video_id(url):
     # Regular expression pattern to match YouTube video IDs
@@ -69,443 +582,2947 @@ def extract_youtube_video_id(url):
         return match.group(1)
     return None
 
-# Modify the download_youtube_audio function
-def download_youtube_audio(url, output_dir="temp_audio"):
+class InvalidVideoUrl(ValueError):
+    pass
+
+def require_video_id(url):
+    """The video ID in url; raises InvalidVideoUrl (a 400) when there is none."""
     video_id = extract_youtube_video_id(url)
     if not video_id:
-        raise ValueError("Invalid YouTube URL")
-    
-    output_path = os.path.join(output_dir, video_id)
-    mp3_file = f"{output_path}.mp3"
-    metadata_file = os.path.join(output_dir, "metadata.json")
-    
-    current_time = time.time()
-    
-    # Load or initialize metadata
-    if os.path.exists(metadata_file):
-        with open(metadata_file, 'r') as f:
-            metadata = json.load(f)
-    else:
-        metadata = {}
-    
-    # Check if the file exists and is not older than 24 hours
-    if os.path.exists(mp3_file) and video_id in metadata:
-        file_age = current_time - metadata[video_id]['timestamp']
-        logging.info(f"File: {mp3_file}")
-        logging.info(f"Current time: {current_time}")
-        logging.info(f"File timestamp: {metadata[video_id]['timestamp']}")
-        logging.info(f"Calculated file age: {file_age:.2f} seconds")
-        
-        if file_age < 86400:  # 24 hours in seconds
-            logging.info(f"Using cached audio file for video ID: {video_id} (age: {file_age:.2f} seconds)")
-            return mp3_file
-        else:
-            logging.info(f"Cached file for video ID: {video_id} is too old (age: {file_age:.2f} seconds). Downloading again.")
-            os.remove(mp3_file)
-    else:
-        logging.info(f"No cached file found for video ID: {video_id}. Downloading.")
-    
-    # Download logic remains the same
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'outtmpl': output_path,
-        'quiet': True,
-        'no_warnings': True,
-    }
-    
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-        logging.info(f"Successfully downloaded and converted audio for video ID: {video_id}")
-        
-        # Update metadata
-        metadata[video_id] = {'timestamp': current_time}
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f)
-        
-        return mp3_file
-    except Exception as e:
-        logging.error(f"Error downloading audio for video ID {video_id}: {str(e)}")
-        raise
+        raise InvalidVideoUrl("Invalid YouTube URL")
+    return video_id
 
+def _metric_key(name, labels):
+    return name, tuple(sorted(labels.items()))
 
+def inc_counter(name, value=1, **labels):
+    key = _metric_key(name, labels)
+    with _metrics_lock:
+        _metric_values[key] = _metric_values.get(key, 0) + value
 
-def detect_language(text):
-   try:
-        detected_lang = detect(text)
-        return detected_lang
-   except LangDetectException as e:
-        detected_lang = 'unknown'
-        logging.error(f"Error detecting language: {str(e)}")
-        raise
+def add_gauge(name, delta, **labels):
+    inc_counter(name, delta, **labels)
+
+def set_gauge(name, value, **labels):
+    key = _metric_key(name, labels)
+    with _metrics_lock:
+        _metric_values[key] = value
+
+def observe_histogram(name, value, **labels):
+    key = _metric_key(name, labels)
+    with _metrics_lock:
+        buckets, total, count = _metric_values.get(key, ([0] * len(METRICS_BUCKETS), 0.0, 0))
+        buckets = [n + (value <= bound) for n, bound in zip(buckets, METRICS_BUCKETS)]
+        _metric_values[key] = (buckets, total + value, count + 1)
 
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
 
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
 
-def translate_to_english(text):
+def render_metrics():
+    """Render all metrics in the Prometheus text exposition format."""
+    with _metrics_lock:
+        values = dict(_metric_values)
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (metric_name, labels), value in sorted(values.items(), key=lambda item: str(item[0])):
+            if metric_name != name:
+                continue
+            if kind != 'histogram':
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            buckets, total, count = value
+            for bound, bucket_count in zip(METRICS_BUCKETS, buckets):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+@contextmanager
+def timed_stage(stage):
+    """Time a pipeline stage for /metrics and the request's Server-Timing header."""
+    add_gauge('pipeline_stage_in_flight', 1, stage=stage)
+    start = time.perf_counter()
+    outcome = 'error'
     try:
-        # Split the text into chunks of approximately 1000 characters
-        chunks = [text[i:i+1000] for i in range(0, len(text), 1000)]
-        translated_chunks = []
+        yield
+        outcome = 'ok'
+    finally:
+        duration = time.perf_counter() - start
+        add_gauge('pipeline_stage_in_flight', -1, stage=stage)
+        observe_histogram('pipeline_stage_duration_seconds', duration, stage=stage, outcome=outcome)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, duration))
 
-        for chunk in chunks:
-            response = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",  # Using a smaller model for translation
-                messages=[
-                    {"role": "system", "content": "You are a translator. Translate the following text to English, maintaining the original meaning and tone as closely as possible."},
-                    {"role": "user", "content": f"Translate this to English:\n\n{chunk}"}
-                ],
-                max_tokens=1500
-            )
-            translated_chunks.append(response.choices[0].message.content.strip())
+def record_usage(provider, model, usage, meter=None):
+    # Anthropic reports input/output tokens, OpenAI prompt/completion tokens
+    if usage is None:
+        return
+    input_tokens = getattr(usage, 'input_tokens', None) or getattr(usage, 'prompt_tokens', None) or 0
+    output_tokens = getattr(usage, 'output_tokens', None) or getattr(usage, 'completion_tokens', None) or 0
+    inc_counter('provider_tokens_total', input_tokens, provider=provider, model=model, direction='input')
+    inc_counter('provider_tokens_total', output_tokens, provider=provider, model=model, direction='output')
+    # Usage goes to the current request's tenant unless another meter is given
+    meter = meter or _tenant_usage.get()
+    if meter is not None:
+        meter.add(tokens=input_tokens + output_tokens)
 
-        return ' '.join(translated_chunks)
-    except Exception as e:
-        logging.error(f"Error translating text: {str(e)}")
-        raise
+def record_images(model, size, count=1):
+    inc_counter('provider_images_total', count, model=model, size=size)
+    meter = _tenant_usage.get()
+    if meter is not None:
+        meter.add(images=count)
 
+def submit_in_context(executor, fn, *args, **kwargs):
+    # Each task gets its own copy of the caller's context (request ID, timings)
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
 
+def map_in_context(executor, fn, iterable):
+    futures = [submit_in_context(executor, fn, item) for item in iterable]
+    return [future.result() for future in futures]
 
+def get_http_session():
+    global _http_session
+    if _http_session is None:
+        with _client_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _http_session = session
+    return _http_session
 
-def transcribe_audio(file_path):
-    try:
-        with open(file_path, "rb") as audio_file:
-            transcription = openai_client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="text"
-            )
-        
-        # Detect the language of the transcription
-        detected_language = detect_language(transcription)
-        
-        if detected_language != 'en':
-            logging.info(f"Detected non-English language: {detected_language}. Translating to English.")
-            translated_transcription = translate_to_english(transcription)
-            return {
-                "original_transcription": transcription,
-                "detected_language": detected_language,
-                "english_translation": translated_transcription
-            }
-        else:
-            return {
-                "transcription": transcription,
-                "detected_language": "en"
-            }
-    except Exception as e:
-        logging.error(f"Error transcribing audio: {str(e)}")
-        raise
+def http_get(url, **kwargs):
+    kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    response = get_http_session().get(url, **kwargs)
+    response.raise_for_status()
+    return response
 
-def summarize(text):
-    try:
-        response = claude_client.messages.create(
-            model="claude-3-opus-20240229",
-            max_tokens=1000,
-             messages=[
-        {
-            "role": "user",
-            "content": f"Summarize this text into 5-10 bullet points fit for an infographic with titles. Make each point clear and concise and capture the most important treasures of information:\n\n{text}"
-        }
-    ]
-           
+def _pooled_httpx_client():
+    import httpx
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_MAXSIZE),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    )
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        with _client_lock:
+            if _openai_client is None:
+                from openai import OpenAI
+                # Retries are handled by call_with_backoff
+                _openai_client = OpenAI(api_key=openai_api_key, max_retries=0, http_client=_pooled_httpx_client())
+    return _openai_client
+
+def get_claude_client():
+    global _claude_client
+    if _claude_client is None:
+        with _client_lock:
+            if _claude_client is None:
+                import anthropic
+                # The SDK bundles its own pooled httpx client; reusing this one instance keeps connections alive
+                _claude_client = anthropic.Anthropic(
+                    api_key=claude_api_key,
+                    max_retries=0,
+                    timeout=anthropic.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+                )
+    return _claude_client
+
+# The async clients are bound to the engine loop, so only call these from coroutines running on it
+
+def get_async_http_client():
+    global _async_http_client
+    if _async_http_client is None:
+        import httpx
+        _async_http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_MAXSIZE),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            follow_redirects=True
         )
-        summary = response.content[0].text.strip().split('\n')
-        # Clean up the bullet points
-        summary = [point.strip().lstrip('•-* ') for point in summary if point.strip()]
-        return summary
-    except Exception as e:
-        logging.error(f"Error summarizing text: {str(e)}")
-        raise
+    return _async_http_client
 
-def generate_infographic(bullet_points):
-    prompt = "Create an infographic with the following bullet points:\n" + "\n".join(bullet_points)
-    try:
-        response = openai_client.images.generate(
-            model="dall-e-3",
-            prompt=prompt,
-            size="1024x1024",
-            quality="standard",
-            n=1,
+def get_async_openai_client():
+    global _async_openai_client
+    if _async_openai_client is None:
+        import httpx
+        from openai import AsyncOpenAI
+        _async_openai_client = AsyncOpenAI(
+            api_key=openai_api_key,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_MAXSIZE),
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+            )
         )
-        image_url = response.data[0].url
-        
-        # Download the image
-        image_response = requests.get(image_url)
-        image_data = BytesIO(image_response.content)
-        
-        return image_data
-    except Exception as e:
-        logging.error(f"Error generating infographic: {str(e)}")
-        raise
+    return _async_openai_client
 
-@app.route('/summarize-youtube', methods=['POST'])
-@require_auth
-def summarize_youtube():
-    data = request.json
-    youtube_url = data.get('url')
-    
-    if not youtube_url:
-        return jsonify({"error": "No URL provided"}), 400
-    
-    try:
-        logging.info(f"Transcribing YouTube video from {youtube_url}")
-        transcription_result = transcribe_youtube(youtube_url)
-        
-        # Use the English translation if available, otherwise use the original transcription
-        text_to_summarize = transcription_result.get("english_translation") or transcription_result.get("transcription")
-        
-        logging.info("Summarizing transcription")
-        summary = summarize(text_to_summarize)
-        
-        return jsonify({
-            "transcription_result": transcription_result,
-            "summary": summary
-        })
-    except Exception as e:
-        logging.error(f"Error processing request: {str(e)}")
-        return jsonify({"error": str(e)}), 500
-    
+def get_async_claude_client():
+    global _async_claude_client
+    if _async_claude_client is None:
+        import anthropic
+        _async_claude_client = anthropic.AsyncAnthropic(
+            api_key=claude_api_key,
+            max_retries=0,
+            timeout=anthropic.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        )
+    return _async_claude_client
 
+def text_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
+def cache_key(subject, **params):
+    # The key is the subject (a video ID or a text digest) plus a hash of the
+    # model/prompt parameters, so changing a prompt never serves stale results
+    params_hash = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"{subject}-{params_hash[:32]}"
 
-def process_transcript(url, language='en'):
-    try:
-        video_id = extract_youtube_video_id(url)
-        logging.info(f"Processing transcript for video ID: {video_id}")
-        
-        # Get list of available transcripts
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        
+class FileBlobStore:
+    """Blob store on a shared filesystem such as an NFS or EFS mount."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def stat(self, key):
         try:
-            # Try to get the transcript in the specified language
-            transcript = transcript_list.find_transcript([language])
-            logging.info(f"Transcript found for language '{language}'")
-        except NoTranscriptFound:
-            # If the specified language is not available, fall back to the default language
-            logging.warning(f"No transcript found for language '{language}'. Using default transcript.")
-            transcript = transcript_list.find_transcript([transcript_list.transcript_data[0]['language_code']])
-            logging.info(f"Transcript found for language '{transcript_list.transcript_data[0]['language_code']}'")
+            return os.stat(self._path(key)).st_mtime
+        except FileNotFoundError:
+            return None
 
-        # Fetch the actual transcript data
-        transcript_data = transcript.fetch()
-        
-        # Extract all 'text' fields and concatenate them
-        full_text = ' '.join(item['text'] for item in transcript_data)
-        
-        return {
-            'transcription': full_text,
-            'detected_language': transcript.language_code
-        }
-    
-    except Exception as e:
-        logging.error(f"Error in process_transcript: {str(e)}")
-        return {'error': str(e)}
+    def find(self, prefix):
+        directory, _, name_prefix = self._path(prefix).rpartition(os.sep)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        key_dir = prefix.rpartition('/')[0]
+        return [f"{key_dir}/{name}" if key_dir else name
+                for name in names if name.startswith(name_prefix) and not name.endswith('.tmp')]
 
-@app.route('/infographic-youtube', methods=['POST'])
-@require_auth
-def infographic_youtube():
-    data = request.json
-    youtube_url = data.get('url')
-    
-    if not youtube_url:
-        return jsonify({"error": "No URL provided"}), 400
-    
+    def download(self, key, dest_path):
+        with open(self._path(key), 'rb') as src, open(dest_path, 'wb') as dest:
+            shutil.copyfileobj(src, dest, AUDIO_STREAM_CHUNK_BYTES)
+
+    def upload(self, src_path, key):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as dest, open(src_path, 'rb') as src:
+                shutil.copyfileobj(src, dest, AUDIO_STREAM_CHUNK_BYTES)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def purge(self, prefix, max_age):
+        cutoff = time.time() - max_age
+        removed = 0
+        for root, _, names in os.walk(self._path(prefix)):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+class S3BlobStore:
+    """Blob store in an S3 bucket, or any S3-compatible store via BLOB_STORE_ENDPOINT_URL.
+
+    boto3's managed transfers stream files in multipart chunks, so neither
+    uploads nor downloads hold a whole file in memory.
+    """
+
+    def __init__(self, bucket, prefix):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client('s3', endpoint_url=BLOB_STORE_ENDPOINT_URL, region_name=BLOB_STORE_REGION)
+
+    def stat(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return response['LastModified'].timestamp()
+
+    def find(self, prefix):
+        response = self.client.list_objects_v2(Bucket=self.bucket, Prefix=self.prefix + prefix)
+        return [item['Key'][len(self.prefix):] for item in response.get('Contents', [])]
+
+    def download(self, key, dest_path):
+        self.client.download_file(self.bucket, self.prefix + key, dest_path)
+
+    def upload(self, src_path, key):
+        self.client.upload_file(src_path, self.bucket, self.prefix + key)
+
+    def purge(self, prefix, max_age):
+        cutoff = time.time() - max_age
+        removed = 0
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            expired = [{'Key': item['Key']} for item in page.get('Contents', [])
+                       if item['LastModified'].timestamp() < cutoff]
+            if expired:
+                self.client.delete_objects(Bucket=self.bucket, Delete={'Objects': expired, 'Quiet': True})
+                removed += len(expired)
+        return removed
+
+def get_blob_store():
+    """The shared blob store configured by BLOB_STORE_URL, or None."""
+    global _blob_store, _blob_store_pid
+    if not BLOB_STORE_URL:
+        return None
+    with _client_lock:
+        # boto3 clients are not fork-safe, so a forked job process makes its own
+        if _blob_store is None or _blob_store_pid != os.getpid():
+            scheme, _, location = BLOB_STORE_URL.partition('://')
+            if scheme == 's3':
+                bucket, _, prefix = location.partition('/')
+                _blob_store = S3BlobStore(bucket, prefix.rstrip('/') + '/' if prefix else '')
+            elif scheme == 'file':
+                _blob_store = FileBlobStore(location)
+            else:
+                raise ValueError(f"Unsupported BLOB_STORE_URL scheme: {scheme}")
+            _blob_store_pid = os.getpid()
+    return _blob_store
+
+def blob_store_upload(src_path, key):
+    """Write a local cache file through to the shared tier; failures only cost a future cache miss."""
+    store = get_blob_store()
+    if store is None:
+        return
     try:
-        logging.info(f"Transcribing YouTube video from {youtube_url}")
-        transcription_result = transcribe_youtube(youtube_url)
-        
-        # Use the English translation if available, otherwise use the original transcription
-        text_to_summarize = transcription_result.get("english_translation") or transcription_result.get("transcription")
-        
-        logging.info("Summarizing transcription")
-        summary = summarize(text_to_summarize)
-        
-        logging.info(f"Generating infographic with {len(summary)} summary points")
-        image_data = generate_infographic(summary)
-        
-        return send_file(image_data, mimetype='image/png')
+        with timed_stage('blob_store_upload'):
+            store.upload(src_path, key)
+        inc_counter('blob_store_requests_total', op='upload', result='ok')
     except Exception as e:
-        logging.error(f"Error processing request: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        inc_counter('blob_store_requests_total', op='upload', result='error')
+        logging.warning(f"Error uploading {key} to the blob store: {str(e)}")
 
-@app.route('/create-infographic', methods=['POST'])
-@require_auth
-def create_infographic():
-    data = request.json
-    logging.info(f"Received data: {data}")
-    
-    bullet_points = data.get('summary')
-    
-    if not bullet_points:
-        logging.error("No bullet points provided")
-        return jsonify({"error": "No bullet points provided"}), 400
-    
-    if not isinstance(bullet_points, list):
-        logging.error(f"Invalid bullet points format. Expected list, got {type(bullet_points)}")
-        return jsonify({"error": "Invalid bullet points format. Expected a list."}), 400
-    
-    if len(bullet_points) == 0:
-        logging.error("Empty list of bullet points provided")
-        return jsonify({"error": "Empty list of bullet points provided"}), 400
-    
+def blob_store_promote(key, dest_path, ttl):
+    """Copy a blob to dest_path if the shared tier has a fresh copy.
+
+    Returns the blob's creation time, so the local copy expires on the same
+    schedule, or None on a miss.
+    """
+    store = get_blob_store()
+    if store is None:
+        return None
     try:
-        logging.info(f"Generating infographic with {len(bullet_points)} bullet points")
-        image_data = generate_infographic(bullet_points)
-        return send_file(image_data, mimetype='image/png')
+        created_at = store.stat(key)
+        if created_at is None or time.time() - created_at > ttl:
+            inc_counter('blob_store_requests_total', op='promote', result='miss')
+            return None
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        # Download next to the destination and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), suffix='.tmp')
+        os.close(fd)
+        try:
+            with timed_stage('blob_store_download'):
+                store.download(key, tmp_path)
+            os.utime(tmp_path, (time.time(), created_at))
+            os.replace(tmp_path, dest_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        inc_counter('blob_store_requests_total', op='promote', result='hit')
+        return created_at
     except Exception as e:
-        logging.error(f"Error processing request: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        inc_counter('blob_store_requests_total', op='promote', result='error')
+        logging.warning(f"Error reading {key} from the blob store: {str(e)}")
+        return None
 
-@app.route('/download-mp3-youtube', methods=['POST'])
-@require_auth
-def download_mp3():
-    data = request.json
-    youtube_url = data.get('url')
-    
-    if not youtube_url:
-        return jsonify({"error": "No URL provided"}), 400
-    
+def blob_store_find(prefix):
+    store = get_blob_store()
+    if store is None:
+        return []
     try:
-        logging.info(f"Downloading audio from {youtube_url}")
-        mp3_file = download_youtube_audio(youtube_url)
-        
-        return send_file(mp3_file, mimetype="audio/mpeg", as_attachment=True, download_name="youtube_audio.mp3")
+        return store.find(prefix)
     except Exception as e:
-        logging.error(f"Error processing request: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        inc_counter('blob_store_requests_total', op='find', result='error')
+        logging.warning(f"Error listing {prefix} in the blob store: {str(e)}")
+        return []
 
-@app.route('/transcribe-youtube', methods=['POST'])
-@require_auth
-def transcribe_youtube_api():
-    data = request.json
-    youtube_url = data.get('url')
-    
-    if not youtube_url:
-        return jsonify({"error": "No URL provided"}), 400
-    
+def purge_blob_store():
+    """Delete shared blobs older than their cache's TTL; returns the number removed."""
+    store = get_blob_store()
+    if store is None:
+        return 0
+    removed = store.purge('audio/', AUDIO_CACHE_TTL)
+    for layer, ttl in RESULT_CACHE_TTLS.items():
+        removed += store.purge(f"results/{layer}/", ttl)
+    return removed
+
+def _result_cache_path(layer, key, ext):
+    return os.path.join(RESULT_CACHE_DIR, layer, f"{key}.{ext}")
+
+def _result_blob_key(layer, key, ext):
+    return f"results/{layer}/{key}.{ext}"
+
+def result_cache_lookup(layer, key, ext='bin'):
+    """Path of a fresh cache entry, or None on a miss.
+
+    A pre-warm refresh sets _refresh_ahead, so entries that expire within
+    that many seconds count as misses and are recomputed early.
+    """
+    path = _result_cache_path(layer, key, ext)
+    ttl = RESULT_CACHE_TTLS[layer] - _refresh_ahead.get()
     try:
-        logging.info(f"Transcribing YouTube video from {youtube_url}")
-        transcription_result = transcribe_youtube(youtube_url)
-        
-        return jsonify(transcription_result)
-    except Exception as e:
-        logging.error(f"Error processing request: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        stat = os.stat(path)
+    except FileNotFoundError:
+        # Another replica may have produced it already
+        if blob_store_promote(_result_blob_key(layer, key, ext), path, ttl) is None:
+            inc_counter('cache_requests_total', cache=layer, result='miss')
+            return None
+        stat = os.stat(path)
+    # mtime is the creation time (for the TTL), atime is the last access (for LRU)
+    if time.time() - stat.st_mtime > ttl:
+        if ttl == RESULT_CACHE_TTLS[layer]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        inc_counter('cache_requests_total', cache=layer, result='miss')
+        return None
+    try:
+        os.utime(path, (time.time(), stat.st_mtime))
+    except FileNotFoundError:
+        inc_counter('cache_requests_total', cache=layer, result='miss')
+        return None
+    inc_counter('cache_requests_total', cache=layer, result='hit')
+    return path
 
-@app.route('/summarize-text', methods=['POST'])
-@require_auth
-def summarize_text():
-    data = request.json
-    text = data.get('text')
-    
-    if not text:
-        return jsonify({"error": "No text provided"}), 400
-    
+def result_cache_get_bytes(layer, key, ext='bin'):
+    path = result_cache_lookup(layer, key, ext)
+    if path is None:
+        return None
     try:
-        # Detect language and translate if necessary
-        detected_language = detect_language(text)
-        if detected_language != 'en':
-            logging.info(f"Detected non-English language: {detected_language}. Translating to English.")
-            text = translate_to_english(text)
-        
-        logging.info("Summarizing provided text")
-        summary = summarize(text)
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        # Evicted between the lookup and the read
+        return None
+
+@contextmanager
+def result_cache_writer(layer, key, ext='bin'):
+    """Write a cache entry incrementally; it appears only once the block completes.
+
+    Call result_cache_publish afterwards to write it through to the blob store.
+    """
+    path = _result_cache_path(layer, key, ext)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temp file and rename so readers never see a partial entry
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def result_cache_publish(layer, key, ext='bin'):
+    path = _result_cache_path(layer, key, ext)
+    blob_store_upload(path, _result_blob_key(layer, key, ext))
+    maybe_evict_result_cache()
+    return path
+
+def result_cache_put_bytes(layer, key, data, ext='bin'):
+    with result_cache_writer(layer, key, ext) as f:
+        f.write(data)
+    return result_cache_publish(layer, key, ext)
+
+def result_cache_get(layer, key):
+    data = result_cache_get_bytes(layer, key, ext='json')
+    if data is None:
+        return None
+    return json.loads(data)
+
+def result_cache_put(layer, key, value):
+    # Encoded as it is written, so a large transcript is not also held as one JSON string
+    with result_cache_writer(layer, key, 'json') as f:
+        for chunk in iter_json(value):
+            f.write(chunk)
+    result_cache_publish(layer, key, 'json')
+
+def evict_result_cache():
+    current_time = time.time()
+    entries = []
+    removed = 0
+    for layer, ttl in RESULT_CACHE_TTLS.items():
+        layer_dir = os.path.join(RESULT_CACHE_DIR, layer)
+        if not os.path.isdir(layer_dir):
+            continue
+        for entry in os.scandir(layer_dir):
+            if not entry.is_file() or entry.name.endswith('.tmp'):
+                continue
+            stat = entry.stat()
+            if current_time - stat.st_mtime > ttl:
+                os.remove(entry.path)
+                removed += 1
+            else:
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+
+    # Drop least recently used entries until we are back under the size budget
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= RESULT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        total_size -= size
+        removed += 1
+    return removed
+
+def maybe_evict_result_cache():
+    global _last_result_cache_eviction
+    if time.time() - _last_result_cache_eviction < RESULT_CACHE_EVICT_INTERVAL:
+        return
+    _last_result_cache_eviction = time.time()
+    try:
+        removed = evict_result_cache()
+        if removed:
+            logging.info(f"Evicted {removed} result cache entries")
+    except Exception as e:
+        logging.error(f"Error evicting result cache: {str(e)}")
+
+def sqlite_connect(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+@contextmanager
+def sqlite_db(path):
+    conn = sqlite_connect(path)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+@contextmanager
+def file_lock(name):
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    lock_path = os.path.join(LOCK_DIR, f"{name}.lock")
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+@contextmanager
+def try_file_lock(name):
+    """Like file_lock, but yields False at once if another process holds the lock."""
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    lock_path = os.path.join(LOCK_DIR, f"{name}.lock")
+    with open(lock_path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def single_flight(stage, key_func):
+    """Join duplicate in-flight calls for the same (stage, key).
+
+    Threads in this process wait on the leader's future. The leader also holds
+    a file lock, so a leader in another worker process waits for it to finish
+    and then finds the result in the cache instead of redoing the work.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            key = (stage, key_func(*args, **kwargs))
+            with _inflight_lock:
+                future = _inflight.get(key)
+                is_leader = future is None
+                if is_leader:
+                    future = Future()
+                    _inflight[key] = future
+            if not is_leader:
+                logging.info(f"Joining in-flight {stage} for {key[1]}")
+                return future.result()
+
+            try:
+                with file_lock(f"{stage}-{key[1]}"):
+                    result = f(*args, **kwargs)
+                future.set_result(result)
+                return result
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with _inflight_lock:
+                    _inflight.pop(key, None)
+        return wrapper
+    return decorator
+
+def _video_id_key(url, *args, **kwargs):
+    return extract_youtube_video_id(url) or text_digest(url)
+
+def _download_key(url, output_dir=AUDIO_CACHE_DIR, fmt='mp3'):
+    video_id = _video_id_key(url)
+    return video_id if fmt == 'mp3' else f"{video_id}-{fmt}"
+
+def _audio_index_path(cache_dir):
+    return os.path.join(cache_dir, "index.db")
+
+def init_audio_cache_index(cache_dir=AUDIO_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    index_missing = not os.path.exists(_audio_index_path(cache_dir))
+    with sqlite_db(_audio_index_path(cache_dir)) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS audio_cache (
+                video_id TEXT NOT NULL,
+                fmt TEXT NOT NULL DEFAULT 'mp3',
+                file_path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (video_id, fmt)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS audio_cache_last_access ON audio_cache (last_access)")
+    if index_missing:
+        rebuild_audio_cache_index(cache_dir)
+
+def rebuild_audio_cache_index(cache_dir=AUDIO_CACHE_DIR):
+    # Timestamps from the legacy metadata.json are kept so existing files expire on schedule
+    legacy_metadata = {}
+    metadata_file = os.path.join(cache_dir, "metadata.json")
+    if os.path.exists(metadata_file):
+        try:
+            with open(metadata_file, 'r') as f:
+                legacy_metadata = json.load(f)
+        except ValueError as e:
+            logging.warning(f"Ignoring unreadable {metadata_file}: {str(e)}")
+
+    rows = []
+    for entry in os.scandir(cache_dir):
+        video_id, ext = os.path.splitext(entry.name)
+        if not entry.is_file() or ext[1:] not in AUDIO_MIMETYPES:
+            continue
+        stat = entry.stat()
+        created_at = legacy_metadata.get(video_id, {}).get('timestamp', stat.st_mtime)
+        fmt = 'mp3' if ext == '.mp3' else 'native'
+        rows.append((video_id, fmt, entry.path, stat.st_size, created_at, created_at))
+
+    with sqlite_db(_audio_index_path(cache_dir)) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO audio_cache (video_id, fmt, file_path, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+    logging.info(f"Rebuilt audio cache index with {len(rows)} files from {cache_dir}")
+
+def audio_cache_lookup(video_id, fmt='mp3', cache_dir=AUDIO_CACHE_DIR):
+    if not os.path.exists(_audio_index_path(cache_dir)):
+        init_audio_cache_index(cache_dir)
+    with sqlite_db(_audio_index_path(cache_dir)) as conn:
+        row = conn.execute(
+            "SELECT file_path, created_at FROM audio_cache WHERE video_id = ? AND fmt = ?",
+            (video_id, fmt)
+        ).fetchone()
+        if row is not None and (time.time() - row['created_at'] >= AUDIO_CACHE_TTL or not os.path.exists(row['file_path'])):
+            conn.execute("DELETE FROM audio_cache WHERE video_id = ? AND fmt = ?", (video_id, fmt))
+            if os.path.exists(row['file_path']):
+                os.remove(row['file_path'])
+            row = None
+        if row is not None:
+            conn.execute(
+                "UPDATE audio_cache SET last_access = ?, hits = hits + 1 WHERE video_id = ? AND fmt = ?",
+                (time.time(), video_id, fmt)
+            )
+    if row is None:
+        # Evicted here, or downloaded by another replica: fetch it from the shared tier
+        file_path = promote_cached_audio(video_id, fmt, cache_dir)
+        inc_counter('cache_requests_total', cache='audio', result='miss' if file_path is None else 'hit')
+        return file_path
+    inc_counter('cache_requests_total', cache='audio', result='hit')
+    return row['file_path']
+
+def _index_audio_file(video_id, file_path, fmt, cache_dir, created_at):
+    with sqlite_db(_audio_index_path(cache_dir)) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO audio_cache (video_id, fmt, file_path, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+            (video_id, fmt, file_path, os.path.getsize(file_path), created_at, time.time())
+        )
+
+def audio_cache_insert(video_id, file_path, fmt='mp3', cache_dir=AUDIO_CACHE_DIR):
+    _index_audio_file(video_id, file_path, fmt, cache_dir, time.time())
+    blob_store_upload(file_path, f"audio/{os.path.basename(file_path)}")
+
+def promote_cached_audio(video_id, fmt='mp3', cache_dir=AUDIO_CACHE_DIR):
+    # Native audio keeps YouTube's container, so its extension is only known from the listing
+    if fmt == 'mp3':
+        keys = [f"audio/{video_id}.mp3"]
+    else:
+        keys = [key for key in blob_store_find(f"audio/{video_id}.") if not key.endswith('.mp3')]
+    for key in keys:
+        file_path = os.path.join(cache_dir, key.rpartition('/')[2])
+        created_at = blob_store_promote(key, file_path, AUDIO_CACHE_TTL)
+        if created_at is not None:
+            _index_audio_file(video_id, file_path, fmt, cache_dir, created_at)
+            logging.info(f"Promoted {key} from the blob store")
+            return file_path
+    return None
+
+def evict_audio_cache(cache_dir=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES):
+    removed = []
+    conn = sqlite_connect(_audio_index_path(cache_dir))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        expired = conn.execute(
+            "SELECT video_id, fmt, file_path FROM audio_cache WHERE created_at < ?",
+            (time.time() - AUDIO_CACHE_TTL,)
+        ).fetchall()
+        removed.extend(expired)
+
+        # Least recently used files go first once the byte budget is exceeded
+        total_size = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM audio_cache WHERE created_at >= ?",
+            (time.time() - AUDIO_CACHE_TTL,)
+        ).fetchone()[0]
+        if total_size > max_bytes:
+            for row in conn.execute(
+                "SELECT video_id, fmt, file_path, size FROM audio_cache WHERE created_at >= ? ORDER BY last_access",
+                (time.time() - AUDIO_CACHE_TTL,)
+            ):
+                if total_size <= max_bytes:
+                    break
+                removed.append(row)
+                total_size -= row['size']
+
+        conn.executemany(
+            "DELETE FROM audio_cache WHERE video_id = ? AND fmt = ?",
+            [(row['video_id'], row['fmt']) for row in removed]
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    for row in removed:
+        if os.path.exists(row['file_path']):
+            os.remove(row['file_path'])
+        logging.info(f"Removed cached audio file: {row['file_path']}")
+    return len(removed)
+
+def _audio_cache_janitor():
+    while True:
+        time.sleep(AUDIO_CACHE_EVICT_INTERVAL)
+        try:
+            evict_audio_cache()
+        except Exception as e:
+            logging.error(f"Error evicting audio cache: {str(e)}")
+
+def start_audio_cache_janitor():
+    init_audio_cache_index()
+    threading.Thread(target=_audio_cache_janitor, name='audio-cache-janitor', daemon=True).start()
+
+# Modify the download_youtube_audio function
+@single_flight('download', _download_key)
+def download_youtube_audio(url, output_dir=AUDIO_CACHE_DIR, fmt='mp3'):
+    """Download audio as a 192 kbps MP3, or with fmt='native' in YouTube's own container without transcoding."""
+    video_id = require_video_id(url)
+    
+    output_path = os.path.join(output_dir, video_id)
+    
+    cached_file = audio_cache_lookup(video_id, fmt=fmt, cache_dir=output_dir)
+    if cached_file:
+        logging.info(f"Using cached audio file for video ID: {video_id}")
+        return cached_file
+    logging.info(f"No cached file found for video ID: {video_id}. Downloading.")
+    
+    if fmt == 'native':
+        ydl_opts = {
+            'format': NATIVE_AUDIO_FORMAT,
+            'outtmpl': f"{output_path}.%(ext)s",
+            'quiet': True,
+            'no_warnings': True,
+        }
+    else:
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '192',
+            }],
+            'outtmpl': output_path,
+            'quiet': True,
+            'no_warnings': True,
+        }
+    
+    try:
+        import yt_dlp
+        with timed_stage('yt_dlp_download'), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            audio_file = ydl.prepare_filename(info) if fmt == 'native' else f"{output_path}.mp3"
+        logging.info(f"Successfully downloaded audio for video ID: {video_id}")
+        
+        audio_cache_insert(video_id, audio_file, fmt=fmt, cache_dir=output_dir)
+        
+        return audio_file
+    except Exception as e:
+        logging.error(f"Error downloading audio for video ID {video_id}: {str(e)}")
+        raise
+
+class AudioStream:
+    """An audio download that clients can read while it is still being written."""
+
+    def __init__(self, video_id, fmt):
+        self.video_id = video_id
+        self.fmt = fmt
+        self.part_path = None
+        self.final_path = None
+        self.error = None
+        self.ready = threading.Event()
+        self.done = threading.Event()
+
+    @property
+    def mimetype(self):
+        path = self.final_path or self.part_path[:-len('.part')]
+        return AUDIO_MIMETYPES.get(os.path.splitext(path)[1][1:], 'application/octet-stream')
+
+def _extract_audio_source(url, fmt):
+    import yt_dlp
+    ydl_opts = {
+        'format': NATIVE_AUDIO_FORMAT if fmt == 'native' else 'bestaudio/best',
+        'quiet': True,
+        'no_warnings': True,
+    }
+    with timed_stage('yt_dlp_extract'), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return ydl.extract_info(url, download=False)
+
+def _iter_transcoded_mp3(info):
+    headers = ''.join(f"{name}: {value}\r\n" for name, value in info.get('http_headers', {}).items())
+    process = subprocess.Popen(
+        ['ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error', '-headers', headers,
+         '-i', info['url'], '-vn', '-c:a', 'libmp3lame', '-b:a', '192k', '-f', 'mp3', 'pipe:1'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    try:
+        while True:
+            chunk = process.stdout.read(AUDIO_STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {process.stderr.read().decode(errors='replace')[-500:]}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+def _iter_native_audio(info):
+    response = http_get(info['url'], headers=info.get('http_headers'), stream=True)
+    with response:
+        yield from response.iter_content(AUDIO_STREAM_CHUNK_BYTES)
+
+def _fill_audio_stream(stream, url, output_dir):
+    try:
+        # Same lock as download_youtube_audio, so only one worker fetches a given video
+        with file_lock(f"download-{_download_key(url, fmt=stream.fmt)}"):
+            cached_file = audio_cache_lookup(stream.video_id, fmt=stream.fmt, cache_dir=output_dir)
+            if cached_file:
+                stream.final_path = cached_file
+                return
+
+            info = _extract_audio_source(url, stream.fmt)
+            if stream.fmt == 'native':
+                final_path = os.path.join(output_dir, f"{stream.video_id}.{info['ext']}")
+                chunks = _iter_native_audio(info)
+            else:
+                final_path = os.path.join(output_dir, f"{stream.video_id}.mp3")
+                chunks = _iter_transcoded_mp3(info)
+
+            part_path = f"{final_path}.part"
+            with open(part_path, 'wb') as part_file:
+                stream.part_path = part_path
+                # The chunk generators start lazily, so a missing ffmpeg, a refused URL or a bad
+                # format only shows up here. Readers are let in after the first chunk, which lets
+                # a request that failed before any audio get a JSON error instead of a cut stream
+                for chunk in chunks:
+                    part_file.write(chunk)
+                    part_file.flush()
+                    stream.ready.set()
+            os.replace(part_path, final_path)
+            audio_cache_insert(stream.video_id, final_path, fmt=stream.fmt, cache_dir=output_dir)
+            stream.final_path = final_path
+            logging.info(f"Finished streaming download for video ID: {stream.video_id}")
+    except Exception as e:
+        logging.error(f"Error streaming audio for video ID {stream.video_id}: {str(e)}")
+        stream.error = e
+        if stream.part_path and os.path.exists(stream.part_path):
+            os.remove(stream.part_path)
+    finally:
+        stream.ready.set()
+        stream.done.set()
+        with _inflight_lock:
+            _audio_streams.pop((stream.video_id, stream.fmt), None)
+
+def open_audio_stream(url, video_id, fmt='mp3', output_dir=AUDIO_CACHE_DIR):
+    # Requests for a video that is already streaming read the same part file
+    with _inflight_lock:
+        stream = _audio_streams.get((video_id, fmt))
+        if stream is None:
+            stream = AudioStream(video_id, fmt)
+            _audio_streams[(video_id, fmt)] = stream
+            threading.Thread(
+                target=_fill_audio_stream, args=(stream, url, output_dir),
+                name=f"audio-{video_id}", daemon=True
+            ).start()
+    stream.ready.wait()
+    return stream
+
+def iter_audio_stream(stream):
+    try:
+        audio_file = open(stream.part_path, 'rb')
+    except FileNotFoundError:
+        # The download finished and the part file was renamed in the meantime
+        stream.done.wait()
+        if stream.error:
+            raise stream.error
+        audio_file = open(stream.final_path, 'rb')
+
+    with audio_file:
+        while True:
+            # Check done before reading, so the last read after completion drains the file
+            finished = stream.done.is_set()
+            chunk = audio_file.read(AUDIO_STREAM_CHUNK_BYTES)
+            if chunk:
+                yield chunk
+            elif finished:
+                break
+            else:
+                time.sleep(0.05)
+    if stream.error:
+        raise stream.error
+
+
+
+def get_language_detector_factory():
+    """Load the langdetect profiles once per process.
+
+    langdetect's own detect() loads them lazily into a global without a lock,
+    so concurrent first calls can fail with "Need to load profiles".
+    """
+    global _language_detector_factory
+    if _language_detector_factory is None:
+        with _client_lock:
+            if _language_detector_factory is None:
+                from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+                factory = DetectorFactory()
+                factory.load_profile(PROFILES_DIRECTORY)
+                # A fixed seed makes the result the same on every call and in every worker
+                factory.set_seed(LANGDETECT_SEED)
+                _language_detector_factory = factory
+    return _language_detector_factory
+
+def warm_language_detector():
+    # Load the profiles in the background so the first request does not pay for it
+    threading.Thread(target=get_language_detector_factory, name='langdetect-warmup', daemon=True).start()
+
+def language_sample(text):
+    """Up to LANGDETECT_WINDOWS windows spread evenly over the text, cut at spaces."""
+    budget = LANGDETECT_WINDOWS * LANGDETECT_WINDOW_CHARS
+    if len(text) <= budget:
+        return text
+    step = (len(text) - LANGDETECT_WINDOW_CHARS) / (LANGDETECT_WINDOWS - 1) if LANGDETECT_WINDOWS > 1 else 0
+    windows = []
+    for n in range(LANGDETECT_WINDOWS):
+        start = int(n * step)
+        if start:
+            start = text.find(' ', start) + 1 or start
+        windows.append(text[start:start + LANGDETECT_WINDOW_CHARS].rsplit(' ', 1)[0])
+    return ' '.join(windows)
+
+def normalize_language_code(code):
+    # YouTube uses BCP-47 tags (en-US, pt-BR); langdetect uses bare codes except for Chinese
+    code = code.lower()
+    if code.startswith('zh'):
+        return 'zh-tw' if code in ('zh-tw', 'zh-hant', 'zh-hk') else 'zh-cn'
+    return code.split('-')[0]
+
+def identify_languages(texts):
+    """Return a (language, confidence) pair for each text, or None where nothing was detectable.
+
+    Each text is sampled with language_sample, so the cost does not grow with
+    its length.
+    """
+    from langdetect import LangDetectException
+
+    factory = get_language_detector_factory()
+    results = []
+    with timed_stage('langdetect'):
+        for text in texts:
+            detector = factory.create()
+            detector.append(language_sample(text))
+            try:
+                best = detector.get_probabilities()[0]
+            except (LangDetectException, IndexError):
+                # No letters to go on (numbers, punctuation, empty text)
+                results.append(None)
+                continue
+            results.append((best.lang, round(best.prob, 4)))
+    return results
+
+class UndetectableLanguage(ValueError):
+    pass
+
+def identify_language(text, hint=None):
+    """(language, confidence) for text; a language code from the source (e.g. YouTube captions) wins."""
+    if hint:
+        return normalize_language_code(hint), 1.0
+    result = identify_languages([text])[0]
+    if result is None:
+        logging.error("Error detecting language: No features in text.")
+        raise UndetectableLanguage("Could not detect the language of the text")
+    return result
+
+def detect_language(text, hint=None):
+    return identify_language(text, hint)[0]
+
+
+
+class TokenBucket:
+    """Thread-safe token bucket: allows `rate` calls per second with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def is_retryable_error(e):
+    # OpenAI and Anthropic SDK errors both carry the HTTP status code
+    status_code = getattr(e, 'status_code', None)
+    if status_code is None and getattr(e, 'response', None) is not None:
+        # requests.HTTPError and httpx.HTTPStatusError carry the response instead
+        status_code = getattr(e.response, 'status_code', None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    retryable = [requests.ConnectionError, requests.Timeout]
+    # Only modules that are already loaded can have raised e, so nothing is imported here
+    for module_name, class_names in (
+        ('openai', ('APIConnectionError',)),
+        ('anthropic', ('APIConnectionError',)),
+        ('httpx', ('TransportError',)),
+        ('deep_translator.exceptions', ('TooManyRequests', 'RequestError')),
+    ):
+        module = sys.modules.get(module_name)
+        if module is not None:
+            retryable.extend(getattr(module, name) for name in class_names)
+    return isinstance(e, tuple(retryable))
+
+def backoff_delay(attempt, e):
+    # Exponential backoff with jitter so parallel callers do not retry in lockstep
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+    logging.warning(f"Retrying after error (attempt {attempt + 1}, waiting {delay:.1f}s): {str(e)}")
+    return delay
+
+def call_with_backoff(fn, *args, **kwargs):
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == RETRY_MAX_ATTEMPTS - 1 or not is_retryable_error(e):
+                raise
+            time.sleep(backoff_delay(attempt, e))
+
+class ProviderUnavailable(Exception):
+    def __init__(self, provider, retry_after):
+        super().__init__(f"{provider} is unavailable after repeated failures, retry after {retry_after}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class CircuitBreaker:
+    """Stop calling a provider after repeated failures, then let one probe call through.
+
+    After BREAKER_FAILURE_THRESHOLD consecutive failures the breaker opens
+    and calls fail at once with ProviderUnavailable. After
+    BREAKER_RESET_SECONDS it goes half-open: one call is let through, and
+    its outcome closes or reopens the breaker.
+    """
+    STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self._lock = threading.Lock()
+        set_gauge('circuit_breaker_state', 0, provider=provider)
+
+    def _transition(self, state):
+        # Caller holds self._lock
+        if state == self.state:
+            return
+        logging.warning(f"Circuit breaker for {self.provider}: {self.state} -> {state}")
+        self.state = state
+        set_gauge('circuit_breaker_state', self.STATES[state], provider=self.provider)
+        inc_counter('circuit_breaker_transitions_total', provider=self.provider, state=state)
+
+    def before_call(self):
+        with self._lock:
+            if self.state == 'open':
+                waited = time.monotonic() - self.opened_at
+                if waited < BREAKER_RESET_SECONDS:
+                    inc_counter('provider_calls_rejected_total', provider=self.provider, reason='breaker_open')
+                    raise ProviderUnavailable(self.provider, int(BREAKER_RESET_SECONDS - waited) + 1)
+                self._transition('half_open')
+            if self.state == 'half_open':
+                if self.probing:
+                    inc_counter('provider_calls_rejected_total', provider=self.provider, reason='breaker_probing')
+                    raise ProviderUnavailable(self.provider, 1)
+                self.probing = True
+
+    def record(self, error=None):
+        """Record a call's outcome; only errors that blame the provider count as failures."""
+        with self._lock:
+            self.probing = False
+            if error is None or not is_retryable_error(error):
+                self.failures = 0
+                self._transition('closed')
+                return
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= BREAKER_FAILURE_THRESHOLD:
+                self.opened_at = time.monotonic()
+                self._transition('open')
+
+    def release(self):
+        """Give up a call without an outcome: the caller was cancelled or went away.
+
+        That says nothing about the provider, so only the half-open probe is
+        freed, letting the next call probe instead.
+        """
+        with self._lock:
+            self.probing = False
+
+def get_breaker(provider):
+    with _inflight_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+def breaker_states():
+    with _inflight_lock:
+        return {provider: breaker.state for provider, breaker in _breakers.items()}
+
+def remaining_budget():
+    deadline = _deadline.get()
+    return float('inf') if deadline is None else deadline - time.monotonic()
+
+def call_timeout(provider):
+    """Timeout for the next call: the HTTP read timeout, capped by what is left of the request budget."""
+    remaining = remaining_budget()
+    if remaining <= 0:
+        inc_counter('provider_calls_rejected_total', provider=provider, reason='deadline')
+        raise DeadlineExceeded(f"Request budget exhausted before calling {provider}")
+    return min(HTTP_READ_TIMEOUT, remaining)
+
+def is_provider_failure(e):
+    return isinstance(e, ProviderUnavailable) or is_retryable_error(e)
+
+def get_hedge_executor():
+    global _hedge_executor
+    with _inflight_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+    return _hedge_executor
+
+def hedged_call(provider, fn, *args, **kwargs):
+    """Run fn, and a second copy if the first has not answered within HEDGE_AFTER_SECONDS.
+
+    The first success wins. A losing thread cannot be interrupted, so it runs
+    to completion and its result is dropped.
+    """
+    futures = [submit_in_context(get_hedge_executor(), fn, *args, **kwargs)]
+    done, _ = wait(futures, timeout=HEDGE_AFTER_SECONDS)
+    if not done:
+        inc_counter('provider_hedges_total', provider=provider, outcome='launched')
+        futures.append(submit_in_context(get_hedge_executor(), fn, *args, **kwargs))
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is not futures[0]:
+                    inc_counter('provider_hedges_total', provider=provider, outcome='won')
+                return future.result()
+            error = future.exception()
+    raise error
+
+class ProviderAttempts:
+    """The breaker, per-attempt timeout and retry policy of call_provider and call_provider_async.
+
+    Iterating yields the timeout for each attempt. After a failure,
+    retry_delay returns how long to back off, or None when the error must be
+    raised: it is not retryable, the attempts are used up, or the backoff
+    would not fit in the remaining budget.
+    """
+
+    def __init__(self, provider, attempts):
+        self.provider = provider
+        self.attempts = attempts
+        self.breaker = get_breaker(provider)
+        self.attempt = 0
+
+    def __iter__(self):
+        for self.attempt in range(self.attempts):
+            timeout = call_timeout(self.provider)
+            self.breaker.before_call()
+            yield timeout
+
+    def retry_delay(self, e):
+        self.breaker.record(e)
+        if self.attempt == self.attempts - 1 or not is_retryable_error(e):
+            return None
+        delay = backoff_delay(self.attempt, e)
+        return delay if delay < remaining_budget() else None
+
+    def succeeded(self):
+        self.breaker.record()
+
+    def abandoned(self):
+        self.breaker.release()
+
+def call_provider(provider, fn, *args, hedge=False, attempts=RETRY_MAX_ATTEMPTS, **kwargs):
+    """Call a blocking fn(*args, timeout=..., **kwargs) through the provider's circuit breaker.
+
+    Each attempt gets a timeout from the remaining request budget. Retryable
+    errors are retried with backoff while the budget allows. With hedge set,
+    slow attempts are hedged; use it only for idempotent, cheap calls.
+    call_provider_async is the same for coroutine functions.
+    """
+    policy = ProviderAttempts(provider, attempts)
+    for timeout in policy:
+        try:
+            if hedge and 0 < HEDGE_AFTER_SECONDS < timeout:
+                result = hedged_call(provider, fn, *args, timeout=timeout, **kwargs)
+            else:
+                result = fn(*args, timeout=timeout, **kwargs)
+        except Exception as e:
+            delay = policy.retry_delay(e)
+            if delay is None:
+                raise
+            time.sleep(delay)
+        except BaseException:
+            policy.abandoned()
+            raise
+        else:
+            policy.succeeded()
+            return result
+
+async def hedged_call_async(provider, fn, *args, **kwargs):
+    """hedged_call for coroutine functions; the losing attempt is cancelled."""
+    tasks = [asyncio.ensure_future(fn(*args, **kwargs))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=HEDGE_AFTER_SECONDS)
+        if not done:
+            inc_counter('provider_hedges_total', provider=provider, outcome='launched')
+            tasks.append(asyncio.ensure_future(fn(*args, **kwargs)))
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        inc_counter('provider_hedges_total', provider=provider, outcome='won')
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # Unlike threads, the losing request can be cancelled
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def call_provider_async(provider, fn, *args, hedge=False, attempts=RETRY_MAX_ATTEMPTS, **kwargs):
+    policy = ProviderAttempts(provider, attempts)
+    for timeout in policy:
+        try:
+            if hedge and 0 < HEDGE_AFTER_SECONDS < timeout:
+                result = await hedged_call_async(provider, fn, *args, timeout=timeout, **kwargs)
+            else:
+                result = await fn(*args, timeout=timeout, **kwargs)
+        except Exception as e:
+            delay = policy.retry_delay(e)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+        except BaseException:
+            # Cancelled, e.g. the losing side of a race; the provider did nothing wrong
+            policy.abandoned()
+            raise
+        else:
+            policy.succeeded()
+            return result
+
+def error_response(e):
+    # Dependency failures get their own status codes so clients and load balancers can tell them from bugs
+    if isinstance(e, ProviderUnavailable):
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    if isinstance(e, DeadlineExceeded):
+        return jsonify({"error": str(e)}), 504
+    # Requests that cannot succeed as sent: no video in the URL, a window with no speech,
+    # text in no detectable language
+    if isinstance(e, (InvalidVideoUrl, EmptyTranscriptWindow, UndetectableLanguage)):
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"error": str(e)}), 500
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?\u3002\uff01\uff1f])\s+')
+
+def split_sentences(text):
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+def split_segments(text, max_chars):
+    """Split text into sentences of at most max_chars characters.
+
+    Sentences longer than max_chars (common in unpunctuated captions) are
+    split at the last space that fits.
+    """
+    segments = []
+    for sentence in split_sentences(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            segments.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        segments.append(sentence)
+    return segments
+
+def group_segments(segments, max_chars):
+    """Group consecutive segments into batches of at most max_chars characters."""
+    groups = []
+    current = []
+    current_chars = 0
+    for segment in segments:
+        if current and current_chars + 1 + len(segment) > max_chars:
+            groups.append(current)
+            current = []
+            current_chars = 0
+        current.append(segment)
+        current_chars += len(segment) + (1 if current_chars else 0)
+    if current:
+        groups.append(current)
+    return groups
+
+def chunk_text(text, max_chars):
+    """Group sentences into chunks of at most max_chars characters."""
+    return [' '.join(group) for group in group_segments(split_segments(text, max_chars), max_chars)]
+
+TRANSLATION_MODEL = "gpt-3.5-turbo"
+TRANSLATION_PROMPT = "You are a translator. Translate the following text to English, maintaining the original meaning and tone as closely as possible."
+TRANSLATION_BATCH_PROMPT = (
+    "The input is a JSON array of text segments. Reply with only a JSON array of their English "
+    "translations, with the same number of items in the same order."
+)
+
+def translate_text_openai(text):
+    with timed_stage('translation'):
+        response = call_provider(
+            'openai', get_openai_client().chat.completions.create,
+            hedge=True,
+            model=TRANSLATION_MODEL,  # Using a smaller model for translation
+            messages=[
+                {"role": "system", "content": TRANSLATION_PROMPT},
+                {"role": "user", "content": f"Translate this to English:\n\n{text}"}
+            ],
+            max_tokens=1500
+        )
+    record_usage('openai', TRANSLATION_MODEL, response.usage)
+    return response.choices[0].message.content.strip()
+
+def parse_translation_batch(content, expected):
+    content = content.strip()
+    if content.startswith('```'):
+        content = content.strip('`').removeprefix('json').strip()
+    try:
+        translations = json.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(translations, list) or len(translations) != expected:
+        return None
+    return [str(translation).strip() for translation in translations]
+
+def translate_segments_openai(segments):
+    # One request per batch; segment boundaries survive because the model answers with a JSON array
+    with timed_stage('translation'):
+        response = call_provider(
+            'openai', get_openai_client().chat.completions.create,
+            hedge=True,
+            model=TRANSLATION_MODEL,
+            messages=[
+                {"role": "system", "content": f"{TRANSLATION_PROMPT} {TRANSLATION_BATCH_PROMPT}"},
+                {"role": "user", "content": json.dumps(segments, ensure_ascii=False)}
+            ],
+            max_tokens=1500
+        )
+    record_usage('openai', TRANSLATION_MODEL, response.usage)
+    translations = parse_translation_batch(response.choices[0].message.content, len(segments))
+    if translations is None:
+        logging.warning(f"Batch translation of {len(segments)} segments came back misaligned; translating one by one")
+        translations = [translate_text_openai(segment) for segment in segments]
+    return translations
+
+def translate_segments_google(segments):
+    from deep_translator import GoogleTranslator
+    with timed_stage('translation'):
+        return call_with_backoff(GoogleTranslator(source='auto', target='en').translate_batch, segments)
+
+TRANSLATION_BACKENDS = {
+    'openai': translate_segments_openai,
+    'google': translate_segments_google,
+}
+_translation_buckets = {
+    name: TokenBucket(TRANSLATION_RATE_PER_SECOND, TRANSLATION_RATE_BURST) for name in TRANSLATION_BACKENDS
+}
+
+def get_translation_executor():
+    global _translation_executor
+    with _inflight_lock:
+        if _translation_executor is None:
+            # Shared by all requests so TRANSLATION_CONCURRENCY is a process-wide cap
+            _translation_executor = ThreadPoolExecutor(max_workers=TRANSLATION_CONCURRENCY, thread_name_prefix='translate')
+    return _translation_executor
+
+def translation_engine(backend):
+    # Memory entries from one model or prompt are never served for another
+    if backend == 'openai':
+        return f"openai-{TRANSLATION_MODEL}-{text_digest(TRANSLATION_PROMPT + TRANSLATION_BATCH_PROMPT)[:8]}"
+    return backend
+
+def segment_hash(segment):
+    # Case, Unicode form and spacing differences do not change the translation
+    normalized = ' '.join(unicodedata.normalize('NFKC', segment).casefold().split())
+    return text_digest(normalized)
+
+def init_translation_memory():
+    global _translation_memory_ready
+    if _translation_memory_ready:
+        return
+    with sqlite_db(TRANSLATION_MEMORY_PATH) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS translation_memory (
+                source_language TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                segment_hash TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (source_language, engine, segment_hash)
+            )
+        """)
+    _translation_memory_ready = True
+
+def _translation_memory_remember(key, translation):
+    # Caller holds _translation_memory_lock
+    _translation_memory_lru[key] = translation
+    _translation_memory_lru.move_to_end(key)
+    while len(_translation_memory_lru) > TRANSLATION_MEMORY_LRU_SIZE:
+        _translation_memory_lru.popitem(last=False)
+
+def translation_memory_lookup(source_language, engine, hashes):
+    """Return {segment_hash: translation} for the hashes already translated."""
+    init_translation_memory()
+    found = {}
+    with _translation_memory_lock:
+        for digest in hashes:
+            translation = _translation_memory_lru.get((source_language, engine, digest))
+            if translation is not None:
+                _translation_memory_lru.move_to_end((source_language, engine, digest))
+                found[digest] = translation
+    memory_hits = len(found)
+
+    missing = [digest for digest in hashes if digest not in found]
+    with sqlite_db(TRANSLATION_MEMORY_PATH) as conn:
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(missing), 500):
+            batch = missing[start:start + 500]
+            rows = conn.execute(
+                f"SELECT segment_hash, translation FROM translation_memory "
+                f"WHERE source_language = ? AND engine = ? AND segment_hash IN ({','.join('?' * len(batch))})",
+                (source_language, engine, *batch)
+            )
+            for row in rows:
+                found[row['segment_hash']] = row['translation']
+
+    store_hits = len(found) - memory_hits
+    misses = len(hashes) - len(found)
+    with _translation_memory_lock:
+        for digest in missing:
+            if digest in found:
+                _translation_memory_remember((source_language, engine, digest), found[digest])
+        _translation_memory_stats['memory_hits'] += memory_hits
+        _translation_memory_stats['store_hits'] += store_hits
+        _translation_memory_stats['misses'] += misses
+    inc_counter('cache_requests_total', memory_hits + store_hits, cache='translation_memory', result='hit')
+    inc_counter('cache_requests_total', misses, cache='translation_memory', result='miss')
+    return found
+
+def translation_memory_store(source_language, engine, translations):
+    """Save {segment_hash: translation} for later texts."""
+    now = time.time()
+    with sqlite_db(TRANSLATION_MEMORY_PATH) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO translation_memory (source_language, engine, segment_hash, translation, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(source_language, engine, digest, translation, now) for digest, translation in translations.items()]
+        )
+    with _translation_memory_lock:
+        for digest, translation in translations.items():
+            _translation_memory_remember((source_language, engine, digest), translation)
+
+def translation_memory_stats():
+    init_translation_memory()
+    with sqlite_db(TRANSLATION_MEMORY_PATH) as conn:
+        entries = conn.execute("SELECT COUNT(*) FROM translation_memory").fetchone()[0]
+    with _translation_memory_lock:
+        stats = dict(_translation_memory_stats)
+        stats['lru_entries'] = len(_translation_memory_lru)
+    lookups = stats['memory_hits'] + stats['store_hits'] + stats['misses']
+    stats['hit_rate'] = round((stats['memory_hits'] + stats['store_hits']) / lookups, 4) if lookups else None
+    stats['stored_entries'] = entries
+    return stats
+
+def translate_segment_list(segments, backend, source_language=None):
+    """Translate a list of segments in order, sending only segments the memory has not seen.
+
+    source_language (from detect_language) keeps memory entries for different
+    languages apart; without it the entries are filed under 'auto'.
+    """
+    translate_segments = TRANSLATION_BACKENDS[backend]
+    bucket = _translation_buckets[backend]
+    source_language = source_language or 'auto'
+    engine = translation_engine(backend)
+
+    def rate_limited_translate(segments):
+        bucket.acquire()
+        return translate_segments(segments)
+
+    hashes = [segment_hash(segment) for segment in segments]
+    translations = translation_memory_lookup(source_language, engine, list(dict.fromkeys(hashes)))
+
+    # Each distinct missing segment is translated once, in batches sent concurrently
+    misses = {}
+    for digest, segment in zip(hashes, segments):
+        if digest not in translations:
+            misses.setdefault(digest, segment)
+    if misses:
+        logging.info(f"Translating {len(misses)} of {len(segments)} segments ({len(segments) - len(misses)} from memory)")
+        batches = group_segments(list(misses.values()), TRANSLATION_CHUNK_CHARS)
+        translated = [
+            translation
+            for batch in map_in_context(get_translation_executor(), rate_limited_translate, batches)
+            for translation in batch
+        ]
+        new_translations = dict(zip(misses, translated))
+        translation_memory_store(source_language, engine, new_translations)
+        translations.update(new_translations)
+
+    return [translations[digest] for digest in hashes]
+
+def translate_to_english(text, backend=None, source_language=None):
+    """Translate free text; the whole result is cached and each sentence goes through the memory."""
+    backend = backend or TRANSLATION_BACKEND
+    if backend not in TRANSLATION_BACKENDS:
+        raise ValueError(f"Unknown translation backend: {backend}")
+    key = cache_key(text_digest(text), backend=backend, model=TRANSLATION_MODEL, prompt=TRANSLATION_PROMPT, chunk_size=TRANSLATION_CHUNK_CHARS)
+    cached = result_cache_get('translation', key)
+    if cached is not None:
+        return cached
+
+    try:
+        segments = split_segments(text, TRANSLATION_CHUNK_CHARS)
+        translation = ' '.join(translate_segment_list(segments, backend, source_language))
+        result_cache_put('translation', key, translation)
+        return translation
+    except Exception as e:
+        logging.error(f"Error translating text: {str(e)}")
+        raise
+
+def translate_transcript(transcript, backend=None, source_language=None):
+    """Translate each passage of a transcript, keeping its timing.
+
+    All passages go through the translation memory in one pass, so a window
+    of a video that was translated before costs only memory lookups.
+    """
+    backend = backend or TRANSLATION_BACKEND
+    if backend not in TRANSLATION_BACKENDS:
+        raise ValueError(f"Unknown translation backend: {backend}")
+    try:
+        pieces = [split_segments(text, TRANSLATION_CHUNK_CHARS) for text in transcript.texts]
+        translated = iter(translate_segment_list([segment for piece in pieces for segment in piece], backend, source_language))
+        texts = [' '.join(next(translated) for _ in piece) for piece in pieces]
+        return Transcript(transcript.starts, transcript.durations, texts)
+    except Exception as e:
+        logging.error(f"Error translating transcript: {str(e)}")
+        raise
+
+def run_ffmpeg(args):
+    with timed_stage('ffmpeg'):
+        result = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-nostdin', '-y', *args],
+            capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr[-500:]}")
+    return result.stderr
+
+def probe_duration(file_path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+         '-of', 'default=noprint_wrappers=1:nokey=1', file_path],
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip())
+
+def prepare_speech_audio(file_path, output_path):
+    # Mono 16 kHz low-bitrate Opus is all Whisper needs and is ~8x smaller than 192 kbps MP3
+    run_ffmpeg([
+        '-i', file_path, '-vn', '-ac', '1', '-ar', '16000',
+        '-c:a', 'libopus', '-b:a', WHISPER_SPEECH_BITRATE, '-application', 'voip',
+        output_path
+    ])
+    return output_path
+
+def detect_silences(file_path):
+    stderr = run_ffmpeg([
+        '-i', file_path,
+        '-af', f"silencedetect=noise={WHISPER_SILENCE_THRESHOLD}:d={WHISPER_SILENCE_MIN_SECONDS}",
+        '-f', 'null', '-'
+    ])
+    starts = [float(value) for value in re.findall(r'silence_start: (-?[\d.]+)', stderr)]
+    ends = [float(value) for value in re.findall(r'silence_end: (-?[\d.]+)', stderr)]
+    # Cut in the middle of each silence so no word is split across segments
+    return [(start + end) / 2 for start, end in zip(starts, ends)]
+
+def plan_segments(duration, split_points, max_seconds):
+    boundaries = [0.0]
+    while duration - boundaries[-1] > max_seconds:
+        segment_start = boundaries[-1]
+        # Prefer the latest silence in the second half of the window, otherwise cut hard
+        candidates = [
+            point for point in split_points
+            if segment_start + max_seconds / 2 < point <= segment_start + max_seconds
+        ]
+        boundaries.append(candidates[-1] if candidates else segment_start + max_seconds)
+    boundaries.append(duration)
+    return list(zip(boundaries, boundaries[1:]))
+
+def _field(item, name):
+    # The SDK returns verbose_json segments as dicts or objects depending on its version
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+def whisper_request(segment_path, timeout=None):
+    # Opened per attempt: a retried or fallback call must not send an already consumed stream
+    with open(segment_path, "rb") as audio_file:
+        return get_openai_client().audio.transcriptions.create(
+            model=WHISPER_MODEL,
+            file=audio_file,
+            response_format="verbose_json",
+            timeout=timeout
+        )
+
+def transcribe_segment(video_id, source_size, segment_path, start, end):
+    key = cache_key(video_id, source=WHISPER_MODEL, size=source_size, start=round(start, 2), end=round(end, 2))
+    cached = result_cache_get('transcript', key)
+    if cached is not None:
+        return cached
+
+    with timed_stage('whisper'):
+        response = call_provider('openai', whisper_request, segment_path)
+    inc_counter('provider_audio_seconds_total', end - start, model=WHISPER_MODEL)
+    # Shift segment timestamps from segment-local to whole-video time
+    result = {
+        'text': response.text.strip(),
+        'segments': [
+            {
+                'start': start + _field(segment, 'start'),
+                'end': start + _field(segment, 'end'),
+                'text': _field(segment, 'text').strip()
+            }
+            for segment in (getattr(response, 'segments', None) or [])
+        ]
+    }
+    result_cache_put('transcript', key, result)
+    return result
+
+def get_whisper_executor():
+    global _whisper_executor
+    with _inflight_lock:
+        if _whisper_executor is None:
+            _whisper_executor = ThreadPoolExecutor(max_workers=WHISPER_CONCURRENCY, thread_name_prefix='whisper')
+    return _whisper_executor
+
+def transcribe_long_audio(file_path, video_id):
+    """Transcribe audio of any length by splitting it on silence into bounded segments.
+
+    Segments are transcribed in parallel and cached individually, so a retry
+    after a partial failure only redoes the segments that failed.
+    """
+    source_size = os.path.getsize(file_path)
+    with tempfile.TemporaryDirectory(prefix='whisper-') as work_dir:
+        speech_path = prepare_speech_audio(file_path, os.path.join(work_dir, 'speech.ogg'))
+        duration = probe_duration(speech_path)
+        segments = plan_segments(duration, detect_silences(speech_path), WHISPER_SEGMENT_SECONDS)
+        logging.info(f"Transcribing {duration:.0f}s of audio for video ID {video_id} in {len(segments)} segments")
+
+        futures = []
+        for index, (start, end) in enumerate(segments):
+            segment_path = os.path.join(work_dir, f"segment-{index}.ogg")
+            run_ffmpeg(['-ss', f"{start:.3f}", '-t', f"{end - start:.3f}", '-i', speech_path, '-c', 'copy', segment_path])
+            futures.append(submit_in_context(
+                get_whisper_executor(), transcribe_segment, video_id, source_size, segment_path, start, end
+            ))
+
+        # Wait for every segment so the successful ones are cached even if one fails
+        errors = [future.exception() for future in futures]
+        failed = [e for e in errors if e is not None]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(segments)} audio segments failed to transcribe: {failed[0]}")
+        results = [future.result() for future in futures]
+
+    return {
+        'text': ' '.join(result['text'] for result in results if result['text']),
+        'segments': [segment for result in results for segment in result['segments']]
+    }
+
+@single_flight('whisper', lambda file_path: os.path.splitext(os.path.basename(file_path))[0])
+def whisper_transcript(file_path):
+    """Timed Whisper transcript of an audio file and its detected language."""
+    video_id = os.path.splitext(os.path.basename(file_path))[0]
+    key = cache_key(
+        video_id, source=WHISPER_MODEL, size=os.path.getsize(file_path),
+        segment_seconds=WHISPER_SEGMENT_SECONDS, format='timed'
+    )
+    cached = result_cache_get('transcript', key)
+    if cached is not None:
+        return cached
+
+    try:
+        transcription = transcribe_long_audio(file_path, video_id)
+        transcript = Transcript.from_segments(transcription['segments'])
+        if not transcript and transcription['text']:
+            # Without segment timings the whole text starts at zero
+            transcript = Transcript([0.0], [0.0], [transcription['text']])
+        result = {
+            'segments': transcript.to_dict(),
+            'detected_language': detect_language(transcript.text),
+        }
+        result_cache_put('transcript', key, result)
+        return result
+    except Exception as e:
+        logging.error(f"Error transcribing audio: {str(e)}")
+        raise
+
+def transcribe_audio(file_path):
+    # Non-English audio is translated to English
+    return localize_transcript(whisper_transcript(file_path))[0]
+
+SUMMARY_MODEL = "claude-3-opus-20240229"
+SUMMARY_PROMPT = "Summarize this text into 5-10 bullet points fit for an infographic with titles. Make each point clear and concise and capture the most important treasures of information:"
+SUMMARY_MAP_PROMPT = "Summarize this section of a longer transcript into concise notes. Keep every important fact, name and number:"
+
+def parse_model_tiers(spec):
+    """Parse 'provider:model,provider:model' into [(provider, model), ...]."""
+    tiers = []
+    for item in spec.split(','):
+        provider, _, model = item.strip().partition(':')
+        if provider and model:
+            tiers.append((provider, model))
+    return tiers
+
+# Models tried in order when the one before fails with a provider error
+SUMMARY_TIERS = [('anthropic', SUMMARY_MODEL)] + parse_model_tiers(SUMMARY_FALLBACK_MODELS)
+SUMMARY_MAP_TIERS = [('anthropic', SUMMARY_MAP_MODEL)] + [
+    tier for tier in parse_model_tiers(SUMMARY_FALLBACK_MODELS) if tier[1] != SUMMARY_MAP_MODEL
+]
+COMPLETION_STAGES = {'anthropic': 'claude', 'openai': 'gpt'}
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+def summary_chunk_key(chunk):
+    return cache_key(text_digest(chunk), model=SUMMARY_MAP_MODEL, prompt=SUMMARY_MAP_PROMPT, max_tokens=1000)
+
+def summary_chunk_messages(chunk):
+    return [
+        {
+            "role": "user",
+            "content": f"{SUMMARY_MAP_PROMPT}\n\n{chunk}"
+        }
+    ]
+
+def summary_cache_key(text):
+    return cache_key(
+        text_digest(text), model=SUMMARY_MODEL, prompt=SUMMARY_PROMPT, max_tokens=1000,
+        map_model=SUMMARY_MAP_MODEL, map_prompt=SUMMARY_MAP_PROMPT, chunk_tokens=SUMMARY_CHUNK_TOKENS
+    )
+
+def summary_messages(condensed_text):
+    return [
+        {
+            "role": "user",
+            "content": f"{SUMMARY_PROMPT}\n\n{condensed_text}"
+        }
+    ]
+
+def parse_summary(raw_summary):
+    summary = raw_summary.strip().split('\n')
+    # Clean up the bullet points
+    return [point.strip().lstrip('•-* ') for point in summary if point.strip()]
+
+def stream_summary(text):
+    """Yield ('progress' | 'token' | 'summary', data) tuples while summarizing text.
+
+    Tokens are forwarded as the Anthropic streaming API produces them; the
+    parsed bullet list is always the last item.
+    """
+    key = summary_cache_key(text)
+    cached = result_cache_get('summary', key)
+    if cached is not None:
+        yield 'summary', cached
+        return
+
+    if estimate_tokens(text) > SUMMARY_CHUNK_TOKENS:
+        yield 'progress', {"stage": "condensing"}
+    condensed_text = condense_for_summary(text)
+
+    yield 'progress', {"stage": "summarizing"}
+    messages = summary_messages(condensed_text)
+    breaker = get_breaker(f"anthropic/{SUMMARY_MODEL}")
+    streamed = False
+    try:
+        timeout = call_timeout('anthropic')
+        breaker.before_call()
+        try:
+            with timed_stage('claude'), get_claude_client().messages.stream(
+                model=SUMMARY_MODEL,
+                max_tokens=1000,
+                messages=messages,
+                timeout=timeout
+            ) as stream:
+                for delta in stream.text_stream:
+                    streamed = True
+                    yield 'token', delta
+                final_message = stream.get_final_message()
+        except Exception as e:
+            breaker.record(e)
+            raise
+        except BaseException:
+            # GeneratorExit when the client disconnects mid-stream; free the probe so the breaker is not stuck half-open
+            breaker.release()
+            raise
+        breaker.record()
+        record_usage('anthropic', SUMMARY_MODEL, final_message.usage)
+        raw_summary = final_message.content[0].text
+        fallback_tier = None
+    except Exception as e:
+        # Once tokens have been sent the answer cannot switch models
+        if streamed or not is_provider_failure(e) or len(SUMMARY_TIERS) == 1:
+            raise
+        logging.warning(f"Streaming summary with {SUMMARY_MODEL} failed, falling back: {str(e)}")
+        yield 'progress', {"stage": "fallback"}
+        raw_summary, fallback_tier = complete_with_fallback('summary', SUMMARY_TIERS[1:], messages, 1000)
+        inc_counter('provider_fallbacks_total', stage='summary', model=SUMMARY_TIERS[1 + fallback_tier][1])
+        yield 'token', raw_summary
+
+    summary = parse_summary(raw_summary)
+    if fallback_tier is None:
+        result_cache_put('summary', key, summary)
+    yield 'summary', summary
+
+LINK_WORD = re.compile(r'\w{4,}')
+
+def link_summary(summary, transcript, video_id):
+    """A {"start", "url"} link per summary point, to the passage it most likely came from.
+
+    Passages are scored by the words they share with the point, rarer words
+    counting for more. Points that share no words with any passage get None.
+    """
+    passage_words = [set(LINK_WORD.findall(text.lower())) for text in transcript.texts]
+    document_frequency = {}
+    for words in passage_words:
+        for word in words:
+            document_frequency[word] = document_frequency.get(word, 0) + 1
+    links = []
+    for point in summary:
+        point_words = set(LINK_WORD.findall(point.lower()))
+        best_score, best_index = 0.0, None
+        for index, words in enumerate(passage_words):
+            score = sum(math.log(1 + len(passage_words) / document_frequency[word]) for word in point_words & words)
+            if score > best_score:
+                best_score, best_index = score, index
+        if best_index is None:
+            links.append(None)
+        else:
+            start = transcript.starts[best_index]
+            links.append({"start": round(start, 1), "url": video_timestamp_url(video_id, start)})
+    return links
+
+INFOGRAPHIC_MODEL = "dall-e-3"
+INFOGRAPHIC_SIZE = "1024x1024"
+INFOGRAPHIC_QUALITY = "standard"
+
+def infographic_prompt(bullet_points):
+    return "Create an infographic with the following bullet points:\n" + "\n".join(bullet_points)
+
+def infographic_cache_key(bullet_points):
+    prompt = infographic_prompt(bullet_points)
+    return cache_key(text_digest(prompt), model=INFOGRAPHIC_MODEL, size=INFOGRAPHIC_SIZE, quality=INFOGRAPHIC_QUALITY)
+
+def image_encoders():
+    """Mimetypes besides PNG that Pillow can encode here; empty without Pillow."""
+    global _image_encoders
+    if _image_encoders is None:
+        try:
+            from PIL import features
+        except ImportError:
+            logging.warning("Pillow is not installed; infographics are served as the original PNG")
+            _image_encoders = ()
+        else:
+            # AVIF support depends on how Pillow was built, and older versions do not know the feature
+            def supported(feature):
+                try:
+                    return features.check(feature)
+                except ValueError:
+                    return False
+            _image_encoders = tuple(
+                mimetype for mimetype, feature in (('image/avif', 'avif'), ('image/webp', 'webp')) if supported(feature)
+            )
+    return _image_encoders
+
+def parse_image_width(value):
+    if value is None:
+        return None
+    if not value.isdigit() or int(value) < INFOGRAPHIC_MIN_WIDTH:
+        raise ValueError(f"Invalid width. Expected an integer of at least {INFOGRAPHIC_MIN_WIDTH}.")
+    return int(value)
+
+def infographic_variant(path, width=None, mimetype='image/png'):
+    """Path of the cached infographic at path, resized to width and encoded as mimetype.
+
+    Variants are made on first use and cached next to the original, so they
+    expire and are shared like any other cache entry.
+    """
+    from PIL import Image
+
+    ext = mimetype.split('/')[1]
+    with Image.open(path) as image:
+        # Never upscale, so every width past the original shares one variant
+        if width is not None and width >= image.width:
+            width = None
+        if width is None and ext == 'png':
+            return path
+        variant_key = f"{os.path.splitext(os.path.basename(path))[0]}-{width or 'full'}"
+        cached = result_cache_lookup('infographic', variant_key, ext=ext)
+        if cached is not None:
+            return cached
+
+        with timed_stage('image_variant'):
+            if width is not None:
+                image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            with result_cache_writer('infographic', variant_key, ext=ext) as variant_file:
+                if ext == 'webp':
+                    image.save(variant_file, format='WEBP', quality=INFOGRAPHIC_WEBP_QUALITY, method=4)
+                elif ext == 'avif':
+                    image.save(variant_file, format='AVIF', quality=INFOGRAPHIC_AVIF_QUALITY)
+                else:
+                    image.save(variant_file, format='PNG', optimize=True)
+    return result_cache_publish('infographic', variant_key, ext=ext)
+
+def negotiate_infographic(path, width=None):
+    """(path, mimetype) of the cached infographic variant in the best format the client accepts."""
+    encoders = image_encoders()
+    # PNG comes first so clients sending only */* keep getting the original format
+    mimetype = request.accept_mimetypes.best_match(('image/png',) + encoders) or 'image/png'
+    if width is not None and not encoders:
+        width = None
+    if width is not None or mimetype != 'image/png':
+        path = infographic_variant(path, width, mimetype)
+    return path, mimetype
+
+def send_infographic(path, width=None):
+    """Send a cached infographic in the best format the client accepts, at most width pixels wide."""
+    path, mimetype = negotiate_infographic(path, width)
+    # send_file hands the open file to the server, which can use sendfile() instead of copying
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=True,
+        max_age=RESULT_CACHE_TTLS['infographic']
+    )
+    response.vary.add('Accept')
+    return response
+
+def get_engine_loop():
+    """Start the shared event loop that runs async pipelines, once per process."""
+    global _engine_loop, _engine_pid, _async_openai_client, _async_claude_client, _async_http_client, _async_inflight
+    with _client_lock:
+        if _engine_loop is None or _engine_pid != os.getpid():
+            # A forked job process inherits the globals but not the loop thread, so it starts its own
+            _async_openai_client = _async_claude_client = _async_http_client = None
+            _async_inflight = {}
+            loop = asyncio.new_event_loop()
+            # asyncio.to_thread runs blocking steps (yt-dlp, ffmpeg, caption fetches, cache and blob store I/O) on this pool
+            loop.set_default_executor(
+                ThreadPoolExecutor(max_workers=ENGINE_BLOCKING_WORKERS, thread_name_prefix='engine-blocking')
+            )
+            threading.Thread(target=loop.run_forever, name='pipeline-engine', daemon=True).start()
+            _engine_loop = loop
+            _engine_pid = os.getpid()
+    return _engine_loop
+
+def run_pipeline(coro):
+    """Run a coroutine on the engine loop and block the calling thread until it is done.
+
+    This is how the (synchronous) Flask handlers use the engine, so a request
+    keeps its gunicorn thread for the whole pipeline; only the work inside the
+    pipeline runs as coroutines.
+    """
+    # The coroutine inherits the caller's context (request ID, stage timings)
+    loop = get_engine_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        # Blocking the loop on its own coroutine would never return
+        coro.close()
+        raise RuntimeError("run_pipeline called on the engine loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+@asynccontextmanager
+async def async_file_lock(name):
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    lock_path = os.path.join(LOCK_DIR, f"{name}.lock")
+    with open(lock_path, 'a') as lock_file:
+        # flock blocks, so wait for it off the loop
+        await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def async_single_flight(stage, key_func):
+    """single_flight for coroutines on the engine loop.
+
+    Callers in this process share one task; the task holds the same lock file
+    as single_flight, so it also coalesces with threaded callers and other
+    worker processes.
+    """
+    def decorator(f):
+        async def run_locked(key, args, kwargs):
+            async with async_file_lock(f"{stage}-{key[1]}"):
+                return await f(*args, **kwargs)
+
+        @wraps(f)
+        async def wrapper(*args, **kwargs):
+            key = (stage, key_func(*args, **kwargs))
+            task = _async_inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(run_locked(key, args, kwargs))
+                _async_inflight[key] = task
+                task.add_done_callback(lambda _: _async_inflight.pop(key, None))
+            else:
+                logging.info(f"Joining in-flight {stage} for {key[1]}")
+            # A cancelled caller must not cancel the work other callers are waiting on
+            return await asyncio.shield(task)
+        return wrapper
+    return decorator
+
+async def complete_async(provider, model, messages, max_tokens, hedge=False, attempts=RETRY_MAX_ATTEMPTS):
+    """One chat completion from either provider; returns the reply text.
+
+    Completions have a breaker per model, since an overloaded model does not
+    mean the provider's other models are down.
+    """
+    with timed_stage(COMPLETION_STAGES[provider]):
+        if provider == 'anthropic':
+            response = await call_provider_async(
+                f"anthropic/{model}", get_async_claude_client().messages.create,
+                model=model, max_tokens=max_tokens, messages=messages, hedge=hedge, attempts=attempts
+            )
+            text = response.content[0].text
+        else:
+            response = await call_provider_async(
+                f"openai/{model}", get_async_openai_client().chat.completions.create,
+                model=model, max_tokens=max_tokens, messages=messages, hedge=hedge, attempts=attempts
+            )
+            text = response.choices[0].message.content
+    record_usage(provider, model, response.usage)
+    return text
+
+async def complete_with_fallback_async(stage, tiers, messages, max_tokens, hedge=False):
+    """Try each (provider, model) tier in turn; returns (text, index of the tier that answered).
+
+    Only provider failures (outages, overload, open breakers) fall through to
+    the next tier; bad requests and an exhausted budget are raised at once.
+    """
+    for index, (provider, model) in enumerate(tiers):
+        last_tier = index == len(tiers) - 1
+        try:
+            text = await complete_async(provider, model, messages, max_tokens, hedge,
+                                        attempts=RETRY_MAX_ATTEMPTS if last_tier else FALLBACK_ATTEMPTS)
+        except Exception as e:
+            if last_tier or not is_provider_failure(e):
+                raise
+            logging.warning(f"{stage} with {model} failed, falling back to {tiers[index + 1][1]}: {str(e)}")
+            continue
+        if index:
+            inc_counter('provider_fallbacks_total', stage=stage, model=model)
+        return text, index
+
+def complete_with_fallback(stage, tiers, messages, max_tokens, hedge=False):
+    return run_pipeline(complete_with_fallback_async(stage, tiers, messages, max_tokens, hedge))
+
+async def summarize_chunk_async(chunk, semaphore):
+    key = summary_chunk_key(chunk)
+    cached = await asyncio.to_thread(result_cache_get, 'summary', key)
+    if cached is not None:
+        return cached
+
+    # Chunk notes are cheap and idempotent, so slow calls are hedged
+    async with semaphore:
+        notes, tier = await complete_with_fallback_async(
+            'summary_map', SUMMARY_MAP_TIERS, summary_chunk_messages(chunk), 1000, hedge=True
+        )
+    notes = notes.strip()
+    if tier == 0:
+        # Fallback output is not cached under the primary model's key, so the next request retries it
+        await asyncio.to_thread(result_cache_put, 'summary', key, notes)
+    return notes
+
+async def condense_for_summary_async(text):
+    """Map-reduce text until it fits in a single summary prompt.
+
+    Each chunk is summarized concurrently (up to SUMMARY_CONCURRENCY) by the
+    cheaper map model; if the joined notes are still too long, they are
+    condensed again.
+    """
+    chunk_chars = SUMMARY_CHUNK_TOKENS * 4
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    level = 0
+    while estimate_tokens(text) > SUMMARY_CHUNK_TOKENS:
+        chunks = chunk_text(text, chunk_chars)
+        level += 1
+        logging.info(f"Summarizing {len(chunks)} chunks (level {level})")
+        notes = await asyncio.gather(*(summarize_chunk_async(chunk, semaphore) for chunk in chunks))
+        condensed = '\n\n'.join(notes)
+        if len(condensed) >= len(text):
+            # The notes did not get any shorter, so another pass would not converge
+            break
+        text = condensed
+    return text
+
+def condense_for_summary(text):
+    return run_pipeline(condense_for_summary_async(text))
+
+async def transcript_summary_input_async(transcript):
+    """The text to summarize for a transcript window.
+
+    A window that fits in one prompt is summarized as is. Longer ones are
+    first condensed section by section, where sections are fixed stretches
+    of the video clock (SUMMARY_SECTION_SECONDS). Notes for a section are
+    cached, so a later window or a "since t" update only pays for the
+    sections it touches that were not seen before.
+    """
+    text = transcript.text
+    if estimate_tokens(text) <= SUMMARY_CHUNK_TOKENS:
+        return text
+    sections = transcript.sections(SUMMARY_SECTION_SECONDS)
+    logging.info(f"Summarizing {len(sections)} transcript sections")
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    return '\n\n'.join(await asyncio.gather(*(summarize_chunk_async(section, semaphore) for section in sections)))
+
+def transcript_summary_input(transcript):
+    return run_pipeline(transcript_summary_input_async(transcript))
+
+@async_single_flight('summarize', lambda text: text_digest(text))
+async def summarize_async(text):
+    key = summary_cache_key(text)
+    cached = await asyncio.to_thread(result_cache_get, 'summary', key)
+    if cached is not None:
+        return cached
+
+    try:
+        condensed_text = await condense_for_summary_async(text)
+        raw_summary, tier = await complete_with_fallback_async(
+            'summary', SUMMARY_TIERS, summary_messages(condensed_text), 1000
+        )
+        summary = parse_summary(raw_summary)
+        if tier == 0:
+            await asyncio.to_thread(result_cache_put, 'summary', key, summary)
+        return summary
+    except Exception as e:
+        logging.error(f"Error summarizing text: {str(e)}")
+        raise
+
+def summarize(text):
+    return run_pipeline(summarize_async(text))
+
+async def download_image_async(url, key, timeout=None):
+    # Chunks go straight from the provider into the cache file, never all in memory at once.
+    # Opening, writing and renaming the file all block, so they run off the loop
+    writer = result_cache_writer('infographic', key, ext='png')
+    async with get_async_http_client().stream('GET', url, timeout=timeout or HTTP_READ_TIMEOUT) as response:
+        response.raise_for_status()
+        image_file = await asyncio.to_thread(writer.__enter__)
+        try:
+            async for chunk in response.aiter_bytes(IMAGE_CHUNK_BYTES):
+                await asyncio.to_thread(image_file.write, chunk)
+        except BaseException as e:
+            if not await asyncio.to_thread(writer.__exit__, type(e), e, e.__traceback__):
+                raise
+        else:
+            await asyncio.to_thread(writer.__exit__, None, None, None)
+    return await asyncio.to_thread(result_cache_publish, 'infographic', key, ext='png')
+
+async def generate_infographic_async(bullet_points):
+    """Generate (or reuse) the infographic and return the path of the cached PNG."""
+    key = infographic_cache_key(bullet_points)
+    cached = await asyncio.to_thread(result_cache_lookup, 'infographic', key, ext='png')
+    if cached is not None:
+        return cached
+
+    try:
+        with timed_stage('dalle'):
+            response = await call_provider_async(
+                'openai', get_async_openai_client().images.generate,
+                model=INFOGRAPHIC_MODEL,
+                prompt=infographic_prompt(bullet_points),
+                size=INFOGRAPHIC_SIZE,
+                quality=INFOGRAPHIC_QUALITY,
+                n=1,
+            )
+        record_images(INFOGRAPHIC_MODEL, INFOGRAPHIC_SIZE)
+
+        with timed_stage('image_download'):
+            return await call_provider_async('image_download', download_image_async, response.data[0].url, key)
+    except Exception as e:
+        logging.error(f"Error generating infographic: {str(e)}")
+        raise
+
+def generate_infographic(bullet_points):
+    return run_pipeline(generate_infographic_async(bullet_points))
+
+async def youtube_pipeline_async(youtube_url, languages=None, infographic=False, start=None, end=None):
+    """Transcript -> summary (-> infographic) on the engine loop, for the whole video or a time window.
+
+    Returns (transcription_result, summary, summary_links, image_path);
+    image_path is the cached PNG, or None unless infographic is set.
+    """
+    # The English passages of the window: the translation if there is one, otherwise the original
+    transcription_result, english = await transcript_window_async(youtube_url, languages, start, end)
+
+    logging.info("Summarizing transcription")
+    summary = await summarize_async(await transcript_summary_input_async(english))
+    summary_links = link_summary(summary, english, extract_youtube_video_id(youtube_url))
+    if not infographic:
+        return transcription_result, summary, summary_links, None
+
+    logging.info(f"Generating infographic with {len(summary)} summary points")
+    image_path = await generate_infographic_async(summary)
+    return transcription_result, summary, summary_links, image_path
+
+@app.before_request
+def start_request_tracking():
+    _request_id.set(request.headers.get('X-Request-ID') or uuid.uuid4().hex)
+    _request_timings.set([])
+    _deadline.set(time.monotonic() + REQUEST_BUDGET_SECONDS)
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def finish_request_tracking(response):
+    duration = time.perf_counter() - g.request_start
+    observe_histogram(
+        'http_request_duration_seconds', duration,
+        endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code
+    )
+    # Stage timings are summed per stage; streamed responses only include stages run before the first byte
+    totals = {}
+    for stage, stage_duration in _request_timings.get() or []:
+        totals[stage] = totals.get(stage, 0) + stage_duration
+    server_timing = [f"{stage};dur={stage_duration * 1000:.1f}" for stage, stage_duration in totals.items()]
+    server_timing.append(f"total;dur={duration * 1000:.1f}")
+    response.headers['Server-Timing'] = ', '.join(server_timing)
+    response.headers['X-Request-ID'] = _request_id.get()
+    return response
+
+@app.errorhandler(413)
+def request_too_large(e):
+    if e.description == RequestEntityTooLarge.description:
+        return jsonify({"error": f"Request body exceeds {MAX_REQUEST_BYTES} bytes"}), 413
+    return jsonify({"error": e.description}), 413
+
+@app.errorhandler(400)
+@app.errorhandler(415)
+def bad_request_body(e):
+    return jsonify({"error": e.description}), e.code
+
+def request_json(max_bytes=MAX_JSON_BODY_BYTES):
+    """Parse the JSON request body, reading it in chunks and giving up with a 413 past max_bytes.
+
+    Only the read is incremental, so an oversized body is refused before it is
+    held in full. The accepted body is then decoded and parsed in one piece;
+    the raw bytes are dropped before parsing, so at most two copies of it (the
+    text and the parsed values) are held at once.
+
+    Every endpoint takes a JSON object; other JSON values are refused with a 400.
+    """
+    if not request.is_json:
+        raise UnsupportedMediaType("Expected a JSON body with Content-Type: application/json")
+    too_large = RequestEntityTooLarge(f"Request body exceeds {max_bytes} bytes")
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise too_large
+    # Chunked bodies have no Content-Length, so the cap is also checked while reading
+    body = bytearray()
+    while chunk := request.stream.read(BODY_CHUNK_BYTES):
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    try:
+        text = body.decode(json.detect_encoding(body))
+        del body
+        data = json.loads(text)
+    except ValueError:
+        raise BadRequest("Request body is not valid JSON")
+    if not isinstance(data, dict):
+        raise BadRequest("Request body must be a JSON object")
+    return data
+
+JSON_TYPE_NAMES = {str: 'a string', list: 'a list'}
+
+def json_field(data, name, expected=str):
+    """data[name], or None if it is missing or null; a 400 if it has any other type than expected."""
+    value = data.get(name)
+    if value is not None and not isinstance(value, expected):
+        raise BadRequest(f"'{name}' must be {JSON_TYPE_NAMES[expected]}")
+    return value
+
+@app.route('/metrics', methods=['GET'])
+@require_admin
+def metrics():
+    # Admin only: the labels name every tenant
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/translation-memory/stats', methods=['GET'])
+@require_auth
+def translation_memory_stats_api():
+    try:
+        return jsonify(translation_memory_stats())
+    except Exception as e:
+        logging.error(f"Error reading translation memory stats: {str(e)}")
+        return error_response(e)
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness: the worker is up and serving requests. An open breaker is
+    # reported but does not fail the check; restarting would not fix the provider.
+    return jsonify({"status": "ok", "circuit_breakers": breaker_states()})
+
+def readiness_checks():
+    checks = {}
+    for name, directory in (('audio_cache', AUDIO_CACHE_DIR), ('result_cache', RESULT_CACHE_DIR), ('locks', LOCK_DIR)):
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=directory):
+                pass
+            checks[name] = "ok"
+        except OSError as e:
+            checks[name] = str(e)
+    for tool in ('ffmpeg', 'ffprobe'):
+        checks[tool] = "ok" if shutil.which(tool) else "not found on PATH"
+    try:
+        init_job_store()
+        with sqlite_db(JOBS_DB_PATH) as conn:
+            conn.execute("SELECT 1 FROM jobs LIMIT 1")
+        checks['jobs_db'] = "ok"
+    except Exception as e:
+        checks['jobs_db'] = str(e)
+    try:
+        init_tenants_db()
+        with sqlite_db(TENANTS_DB_PATH) as conn:
+            conn.execute("SELECT 1 FROM tenants LIMIT 1")
+        checks['tenants_db'] = "ok"
+    except Exception as e:
+        checks['tenants_db'] = str(e)
+    checks['accepting'] = "draining" if _shutting_down.is_set() else "ok"
+    return checks
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    # Readiness only checks local dependencies, never the paid APIs
+    checks = readiness_checks()
+    ready = all(result == "ok" for result in checks.values())
+    return jsonify({"status": "ready" if ready else "unavailable", "checks": checks}), 200 if ready else 503
+
+@app.route('/summarize-youtube', methods=['POST'])
+@require_auth
+def summarize_youtube():
+    data = request_json()
+    youtube_url = json_field(data, 'url')
+    
+    if not youtube_url:
+        return jsonify({"error": "No URL provided"}), 400
+    try:
+        require_video_id(youtube_url)
+        start, end = parse_time_window(request.args)
+        languages = normalize_languages(data.get('languages'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        logging.info(f"Transcribing YouTube video from {youtube_url}")
+        transcription_result, summary, summary_links, _ = run_pipeline(
+            youtube_pipeline_async(youtube_url, languages, start=start, end=end)
+        )
+        
+        return jsonify({
+            "transcription_result": transcription_result,
+            "summary": summary,
+            "summary_links": summary_links
+        })
+    except Exception as e:
+        logging.error(f"Error processing request: {str(e)}")
+        return error_response(e)
+
+@app.route('/infographic-youtube', methods=['POST'])
+@require_auth
+def infographic_youtube():
+    data = request_json()
+    youtube_url = json_field(data, 'url')
+    
+    if not youtube_url:
+        return jsonify({"error": "No URL provided"}), 400
+    try:
+        require_video_id(youtube_url)
+        width = parse_image_width(request.args.get('w'))
+        start, end = parse_time_window(request.args)
+        languages = normalize_languages(data.get('languages'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        logging.info(f"Transcribing YouTube video from {youtube_url}")
+        _, _, _, image_path = run_pipeline(
+            youtube_pipeline_async(youtube_url, languages, infographic=True, start=start, end=end)
+        )
+        
+        return send_infographic(image_path, width)
+    except Exception as e:
+        logging.error(f"Error processing request: {str(e)}")
+        return error_response(e)
+
+@app.route('/create-infographic', methods=['POST'])
+@require_auth
+def create_infographic():
+    data = request_json()
+    logging.info(f"Received data: {data}")
+    
+    bullet_points = data.get('summary')
+    
+    if not bullet_points:
+        logging.error("No bullet points provided")
+        return jsonify({"error": "No bullet points provided"}), 400
+    
+    if not isinstance(bullet_points, list) or not all(isinstance(point, str) for point in bullet_points):
+        logging.error(f"Invalid bullet points format. Expected list, got {type(bullet_points)}")
+        return jsonify({"error": "Invalid bullet points format. Expected a list of strings."}), 400
+    
+    if len(bullet_points) == 0:
+        logging.error("Empty list of bullet points provided")
+        return jsonify({"error": "Empty list of bullet points provided"}), 400
+    try:
+        width = parse_image_width(request.args.get('w'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        logging.info(f"Generating infographic with {len(bullet_points)} bullet points")
+        image_path = run_pipeline(generate_infographic_async(bullet_points))
+        return send_infographic(image_path, width)
+    except Exception as e:
+        logging.error(f"Error processing request: {str(e)}")
+        return error_response(e)
+
+def send_audio_file(audio_file):
+    ext = os.path.splitext(audio_file)[1]
+    # Range, If-None-Match and If-Modified-Since are honoured for GET and HEAD requests
+    return send_file(
+        audio_file,
+        mimetype=AUDIO_MIMETYPES.get(ext[1:], 'application/octet-stream'),
+        as_attachment=True,
+        download_name=f"youtube_audio{ext}",
+        conditional=True,
+        etag=True,
+        max_age=AUDIO_CACHE_TTL
+    )
+
+@app.route('/download-mp3-youtube', methods=['GET', 'POST'])
+@require_auth
+def download_mp3():
+    data = request_json() if request.method == 'POST' else request.args
+    youtube_url = json_field(data, 'url')
+    fmt = json_field(data, 'format') or 'mp3'
+    
+    if not youtube_url:
+        return jsonify({"error": "No URL provided"}), 400
+    if fmt not in ('mp3', 'native'):
+        return jsonify({"error": "Invalid format. Expected 'mp3' or 'native'."}), 400
+    video_id = extract_youtube_video_id(youtube_url)
+    if not video_id:
+        return jsonify({"error": "Invalid YouTube URL"}), 400
+    
+    try:
+        cached_file = audio_cache_lookup(video_id, fmt=fmt)
+        if cached_file:
+            logging.info(f"Serving cached audio for video ID: {video_id}")
+            return send_audio_file(cached_file)
+
+        logging.info(f"Downloading audio from {youtube_url}")
+        stream = open_audio_stream(youtube_url, video_id, fmt)
+        if stream.error:
+            raise stream.error
+        if stream.part_path is None:
+            return send_audio_file(stream.final_path)
+
+        # Cache miss: send the audio while it is still being downloaded and encoded
+        ext = os.path.splitext(stream.part_path[:-len('.part')])[1]
+        return Response(
+            iter_audio_stream(stream),
+            mimetype=stream.mimetype,
+            headers={'Content-Disposition': f"attachment; filename=youtube_audio{ext}"}
+        )
+    except Exception as e:
+        logging.error(f"Error processing request: {str(e)}")
+        return error_response(e)
+
+@app.route('/transcribe-youtube', methods=['POST'])
+@require_auth
+def transcribe_youtube_api():
+    data = request_json()
+    youtube_url = json_field(data, 'url')
+    
+    if not youtube_url:
+        return jsonify({"error": "No URL provided"}), 400
+    try:
+        require_video_id(youtube_url)
+        start, end = parse_time_window(request.args)
+        languages = normalize_languages(data.get('languages'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        logging.info(f"Transcribing YouTube video from {youtube_url}")
+        transcription_result = transcribe_youtube(youtube_url, languages, start, end)
         
+        return jsonify(transcription_result)
+    except ValueError as e:
+        # An invalid URL or a window with no speech in it
+        logging.error(f"Error processing request: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error processing request: {str(e)}")
+        return error_response(e)
+
+def prepare_text_input(text, detected_language=None):
+    # Detect language (unless the caller already did) and translate if necessary
+    detected_language = detected_language or detect_language(text)
+    if detected_language != 'en':
+        logging.info(f"Detected non-English language: {detected_language}. Translating to English.")
+        text = translate_to_english(text, source_language=detected_language)
+    return detected_language, text
+
+def summarize_text_input(text, detected_language=None):
+    detected_language, text = prepare_text_input(text, detected_language)
+    
+    logging.info("Summarizing provided text")
+    summary = summarize(text)
+    
+    return {
+        "detected_language": detected_language,
+        "summary": summary
+    }
+
+@app.route('/summarize-text', methods=['POST'])
+@require_auth
+def summarize_text():
+    data = request_json(MAX_TEXT_BODY_BYTES)
+    text = json_field(data, 'text')
+    # An optional "language" from the client skips detection
+    language_hint = json_field(data, 'language')
+    
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+    
+    try:
+        detected_language, confidence = identify_language(text, hint=language_hint)
+        detected_language, text = prepare_text_input(text, detected_language)
+        logging.info("Summarizing provided text")
+        summary = run_pipeline(summarize_async(text))
         return jsonify({
             "detected_language": detected_language,
+            "language_confidence": confidence,
             "summary": summary
         })
     except Exception as e:
         logging.error(f"Error processing request: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
+
+@app.route('/youtube-summary-infographic', methods=['POST'])
+@require_auth
+def youtube_summary_infographic():
+    data = request_json()
+    youtube_url = json_field(data, 'url')
+    
+    if not youtube_url:
+        return jsonify({"error": "No URL provided"}), 400
+    try:
+        require_video_id(youtube_url)
+        width = parse_image_width(request.args.get('w'))
+        start, end = parse_time_window(request.args)
+        languages = normalize_languages(data.get('languages'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        logging.info(f"Processing {youtube_url}")
+        transcription_result, summary, summary_links, image_path = run_pipeline(
+            youtube_pipeline_async(youtube_url, languages, infographic=True, start=start, end=end)
+        )
+        
+        image_path, mimetype = negotiate_infographic(image_path, width)
+        # Opened now so a cache eviction cannot remove the file before it is sent
+        image_file = open(image_path, 'rb')
+        text_data = {
+            "transcription_result": transcription_result,
+            "summary": summary,
+            "summary_links": summary_links
+        }
+        # The JSON part is encoded and the image part read as the body is sent, so neither is held whole
+        response = multipart_response([
+            ({'Content-Type': 'application/json'}, iter_json(text_data)),
+            (
+                {'Content-Type': mimetype, 'Content-Length': os.fstat(image_file.fileno()).st_size},
+                iter_file(image_file)
+            ),
+        ])
+        # Runs even when the client disconnects before the image part
+        response.call_on_close(image_file.close)
+        response.vary.add('Accept')
+        return response
+    except Exception as e:
+        logging.error(f"Error processing request: {str(e)}")
+        return error_response(e)
+
+def _json_pieces(value):
+    # Long strings are escaped a slice at a time, so no escaped copy of a whole transcript is held
+    if isinstance(value, str) and len(value) > BODY_CHUNK_BYTES:
+        yield '"'
+        for start in range(0, len(value), BODY_CHUNK_BYTES):
+            yield json.dumps(value[start:start + BODY_CHUNK_BYTES])[1:-1]
+        yield '"'
+    elif isinstance(value, dict):
+        yield '{'
+        for n, (key, item) in enumerate(value.items()):
+            yield f"{', ' if n else ''}{json.dumps(str(key))}: "
+            yield from _json_pieces(item)
+        yield '}'
+    elif isinstance(value, (list, tuple)):
+        yield '['
+        for n, item in enumerate(value):
+            if n:
+                yield ', '
+            yield from _json_pieces(item)
+        yield ']'
+    else:
+        yield json.dumps(value)
+
+def iter_json(value):
+    """Encode value as JSON in chunks of about BODY_CHUNK_BYTES."""
+    pieces, size = [], 0
+    for piece in _json_pieces(value):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= BODY_CHUNK_BYTES:
+            yield ''.join(pieces).encode()
+            pieces, size = [], 0
+    if pieces:
+        yield ''.join(pieces).encode()
+
+def iter_file(f):
+    while chunk := f.read(BODY_CHUNK_BYTES):
+        yield chunk
+
+def multipart_response(parts):
+    """Stream (headers, chunks) pairs as a multipart/mixed body."""
+    boundary = uuid.uuid4().hex
+
+    def generate():
+        for headers, chunks in parts:
+            head = ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+            yield f"--{boundary}\r\n{head}\r\n".encode()
+            yield from chunks
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode()
 
-@app.route('/youtube-summary-infographic', methods=['POST'])
+    return Response(generate(), content_type=f'multipart/mixed; boundary="{boundary}"')
+
+STREAM_TRANSCRIPT_PIECE_CHARS = 2000
+
+def stream_summary_events(text):
+    # Returns the summary once it has been sent
+    for event, data in stream_summary(text):
+        if event == 'token':
+            yield sse_event('token', {"text": data})
+        elif event == 'summary':
+            yield sse_event('summary', {"summary": data})
+            return data
+        else:
+            yield sse_event(event, data)
+
+def event_stream(generate):
+    def guarded():
+        try:
+            yield from generate()
+        except Exception as e:
+            logging.error(f"Error streaming response: {str(e)}")
+            yield sse_event('error', {"error": str(e)})
+
+    # X-Accel-Buffering stops nginx from holding the stream back
+    return Response(
+        stream_with_context(guarded()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/summarize-youtube/stream', methods=['POST'])
 @require_auth
-def youtube_summary_infographic():
-    data = request.json
-    youtube_url = data.get('url')
+def summarize_youtube_stream():
+    data = request_json()
+    youtube_url = json_field(data, 'url')
     
     if not youtube_url:
         return jsonify({"error": "No URL provided"}), 400
+    try:
+        video_id = require_video_id(youtube_url)
+        start, end = parse_time_window(request.args)
+        languages = normalize_languages(data.get('languages'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def transcript_events(transcript):
+        pieces = transcript.passages(STREAM_TRANSCRIPT_PIECE_CHARS).window(start, end)
+        for piece_start, text in zip(pieces.starts, pieces.texts):
+            yield sse_event('transcript', {"start": round(piece_start, 1), "text": text})
+
+    def generate():
+        logging.info(f"Streaming summary for YouTube video {youtube_url}")
+        note_video_request(video_id)
+        try:
+            captions = Transcript.from_dict(fetch_youtube_transcript(video_id, languages)['segments'])
+        except Exception as e:
+            logging.info(f"No captions for {video_id} ({str(e)}); transcribing audio")
+            captions = None
+            yield sse_event('progress', {"stage": "transcribing_audio"})
+        if captions is not None:
+            yield from transcript_events(captions)
+
+        # Captions are cached now, so this only adds language detection and translation
+        # (or the Whisper fallback when there were no captions)
+        acquired = run_pipeline(acquire_transcript_async(youtube_url, languages))
+        transcription_result, english = localize_transcript(acquired, start, end)
+        if captions is None:
+            yield from transcript_events(Transcript.from_dict(acquired['segments']))
+        if 'english_translation' in transcription_result:
+            yield sse_event('translation', {
+                "detected_language": transcription_result['detected_language'],
+                "text": transcription_result['english_translation']
+            })
+
+        if estimate_tokens(english.text) > SUMMARY_CHUNK_TOKENS:
+            yield sse_event('progress', {"stage": "condensing"})
+        summary = yield from stream_summary_events(transcript_summary_input(english))
+        yield sse_event('summary_links', {"summary_links": link_summary(summary, english, video_id)})
+
+    return event_stream(generate)
+
+@app.route('/summarize-text/stream', methods=['POST'])
+@require_auth
+def summarize_text_stream():
+    data = request_json(MAX_TEXT_BODY_BYTES)
+    text = json_field(data, 'text')
     
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+    # Detection is sampled and quick, so it runs before the stream starts and can still fail with a 400
     try:
-        logging.info(f"Processing audio from {youtube_url}")
-        mp3_file = download_youtube_audio(youtube_url)
-        
-        logging.info(f"Transcribing audio from {mp3_file}")
-        transcription_result = transcribe_audio(mp3_file)
-        
-        # Use the English translation if available, otherwise use the original transcription
-        text_to_summarize = transcription_result.get("english_translation") or transcription_result.get("transcription")
-        
-        logging.info("Summarizing transcription")
-        summary = summarize(text_to_summarize)
-        
-        logging.info(f"Generating infographic with {len(summary)} summary points")
-        image_data = generate_infographic(summary)
-        
-        # Prepare the multipart response
-        response = make_response()
-        response.status_code = 200
+        detected_language = detect_language(text)
+    except UndetectableLanguage as e:
+        return error_response(e)
 
-        # Add the image part
-        response.data = image_data.getvalue()
-        response.headers['Content-Type'] = 'image/png'
-        
-        # Prepare the text data
-        text_data = {
-            "transcription_result": transcription_result,
-            "summary": summary
-        }
-        
-        # Add the JSON data as a custom header
-        response.headers['X-JSON-Data'] = json.dumps(text_data)
+    def generate():
+        yield sse_event('language', {"detected_language": detected_language})
 
-        return response
-    except Exception as e:
-        logging.error(f"Error processing request: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        text_to_summarize = text
+        if detected_language != 'en':
+            logging.info(f"Detected non-English language: {detected_language}. Translating to English.")
+            text_to_summarize = translate_to_english(text, source_language=detected_language)
+            yield sse_event('translation', {"text": text_to_summarize})
+
+        yield from stream_summary_events(text_to_summarize)
+
+    return event_stream(generate)
 
 # Add a new route for cleaning up old cached files
 @app.route('/cleanup-cache', methods=['POST'])
-@require_auth
+@require_admin
 def cleanup_cache():
     try:
-        cleanup_count = 0
-        current_time = time.time()
-        metadata_file = os.path.join("temp_audio", "metadata.json")
-        
-        if os.path.exists(metadata_file):
-            with open(metadata_file, 'r') as f:
-                metadata = json.load(f)
-            
-            updated_metadata = {}
-            for video_id, data in metadata.items():
-                file_path = os.path.join("temp_audio", f"{video_id}.mp3")
-                file_age = current_time - data['timestamp']
-                if file_age > 86400 and os.path.exists(file_path):  # 24 hours in seconds
-                    os.remove(file_path)
-                    cleanup_count += 1
-                    logging.info(f"Removed old cache file: {video_id}.mp3 (age: {file_age:.2f} seconds)")
-                else:
-                    updated_metadata[video_id] = data
-            
-            with open(metadata_file, 'w') as f:
-                json.dump(updated_metadata, f)
+        cleanup_count = evict_audio_cache() + evict_result_cache() + purge_blob_store()
         
         return jsonify({"message": f"Cleaned up {cleanup_count} old cache files"}), 200
     except Exception as e:
         logging.error(f"Error cleaning up cache: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
+
+def create_tenant(tenant_id, **limits):
+    """Create or update a tenant and issue it a new API key; any previous key stops working."""
+    init_tenants_db()
+    api_key = f"ytb_{secrets.token_urlsafe(32)}"
+    settings = {
+        'rate_limit': TENANT_DEFAULT_RATE_LIMIT,
+        'max_concurrent': TENANT_DEFAULT_MAX_CONCURRENT,
+        'max_jobs': TENANT_DEFAULT_MAX_JOBS,
+        'daily_tokens': TENANT_DEFAULT_DAILY_TOKENS,
+        'daily_images': TENANT_DEFAULT_DAILY_IMAGES,
+        **{name: int(value) for name, value in limits.items() if value is not None},
+    }
+    with sqlite_db(TENANTS_DB_PATH) as conn:
+        conn.execute(
+            """
+            INSERT INTO tenants (tenant_id, key_hash, rate_limit, max_concurrent, max_jobs, daily_tokens, daily_images, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (tenant_id) DO UPDATE SET
+                key_hash = excluded.key_hash, rate_limit = excluded.rate_limit,
+                max_concurrent = excluded.max_concurrent, max_jobs = excluded.max_jobs,
+                daily_tokens = excluded.daily_tokens, daily_images = excluded.daily_images, disabled = 0
+            """,
+            (tenant_id, hash_api_key(api_key), settings['rate_limit'], settings['max_concurrent'],
+             settings['max_jobs'], settings['daily_tokens'], settings['daily_images'], time.time())
+        )
+    with _tenant_cache_lock:
+        _tenant_cache.clear()
+    return api_key, settings
+
+def tenant_usage(tenant_id):
+    init_tenants_db()
+    with sqlite_db(TENANTS_DB_PATH) as conn:
+        usage = conn.execute(
+            "SELECT tokens, images FROM tenant_usage WHERE tenant_id = ? AND day = ?", (tenant_id, usage_day())
+        ).fetchone()
+        requests_in_window = conn.execute(
+            "SELECT COUNT(*) FROM tenant_requests WHERE tenant_id = ? AND ts > ?",
+            (tenant_id, time.time() - TENANT_RATE_WINDOW_SECONDS)
+        ).fetchone()[0]
+        active = conn.execute("SELECT COUNT(*) FROM tenant_slots WHERE tenant_id = ?", (tenant_id,)).fetchone()[0]
+    return {
+        "day": usage_day(),
+        "tokens": usage['tokens'] if usage else 0,
+        "images": usage['images'] if usage else 0,
+        "requests_in_window": requests_in_window,
+        "active_requests": active,
+    }
+
+@app.route('/tenants', methods=['POST'])
+@require_admin
+def create_tenant_api():
+    data = request_json()
+    tenant_id = json_field(data, 'tenant_id')
+    if not tenant_id or not re.fullmatch(r'[A-Za-z0-9_.-]{1,64}', tenant_id):
+        return jsonify({"error": "Invalid tenant_id. Expected 1-64 letters, digits, '.', '_' or '-'."}), 400
+    limits = {name: data.get(name) for name in ('rate_limit', 'max_concurrent', 'max_jobs', 'daily_tokens', 'daily_images')}
+    try:
+        api_key, settings = create_tenant(tenant_id, **limits)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Limits must be integers"}), 400
+    # The key is only ever returned here; the database keeps its hash
+    return jsonify({"tenant_id": tenant_id, "api_key": api_key, **settings}), 201
+
+@app.route('/tenants/<tenant_id>', methods=['GET'])
+@require_auth
+def tenant_status(tenant_id):
+    if g.tenant['tenant_id'] not in (tenant_id, ADMIN_TENANT):
+        return jsonify({"error": "Tenant not found"}), 404
+    tenant = load_tenant(tenant_id=tenant_id) or (g.tenant if tenant_id == g.tenant['tenant_id'] else None)
+    if tenant is None:
+        return jsonify({"error": "Tenant not found"}), 404
+    limits = {name: tenant[name] for name in ('rate_limit', 'max_concurrent', 'max_jobs', 'daily_tokens', 'daily_images')}
+    return jsonify({"tenant_id": tenant_id, "limits": limits, "usage": tenant_usage(tenant_id)})
 
 @app.route('/test-time', methods=['GET'])
 def test_time():
     current_time = time.time()
-    test_file = os.path.join("temp_audio", "test_file.txt")
+    test_file = os.path.join(AUDIO_CACHE_DIR, "test_file.txt")
     with open(test_file, "w") as f:
         f.write("Test")
     file_mtime = os.path.getmtime(test_file)
@@ -516,57 +3533,1257 @@ def test_time():
         "difference": current_time - file_mtime
     })
 
-def transcribe_youtube(youtube_url):
+class EmptyTranscriptWindow(ValueError):
+    pass
+
+class Transcript:
+    """Timed transcript segments held as parallel arrays.
+
+    Start times and durations are packed doubles and texts a plain list, so
+    a long video's captions cost a few bytes per segment instead of a dict
+    each. Segments are kept in start order; cutting out a time window is a
+    bisect and only copies the segments inside it.
+    """
+    __slots__ = ('starts', 'durations', 'texts')
+
+    def __init__(self, starts=(), durations=(), texts=()):
+        self.starts = array('d', starts)
+        self.durations = array('d', durations)
+        self.texts = list(texts)
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Caption entries with text, start and duration (dicts or SDK objects)."""
+        rows = sorted(
+            (float(_field(entry, 'start')), float(_field(entry, 'duration')), _field(entry, 'text').strip())
+            for entry in entries
+        )
+        rows = [row for row in rows if row[2]]
+        return cls(*zip(*rows)) if rows else cls()
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Whisper segments with start, end and text."""
+        return cls.from_entries(
+            {'start': segment['start'], 'duration': segment['end'] - segment['start'], 'text': segment['text']}
+            for segment in segments
+        )
+
+    @classmethod
+    def from_srt(cls, srt_content):
+        entries = []
+        for block in re.split(r'\n\s*\n', srt_content.replace('\r\n', '\n').strip()):
+            lines = block.strip().split('\n')
+            for index, line in enumerate(lines):
+                match = SRT_TIMING.match(line.strip())
+                if match:
+                    start, end = (srt_seconds(value) for value in match.groups())
+                    entries.append({'start': start, 'duration': end - start, 'text': ' '.join(lines[index + 1:])})
+                    break
+        return cls.from_entries(entries)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['start'], data['duration'], data['text'])
+
+    def to_dict(self):
+        # Millisecond precision keeps the cached JSON small
+        return {
+            'start': [round(value, 3) for value in self.starts],
+            'duration': [round(value, 3) for value in self.durations],
+            'text': self.texts,
+        }
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def text(self):
+        return ' '.join(self.texts)
+
+    @property
+    def start(self):
+        return self.starts[0] if self.texts else 0.0
+
+    @property
+    def end(self):
+        return self.starts[-1] + self.durations[-1] if self.texts else 0.0
+
+    def _slice(self, lo, hi):
+        return Transcript(self.starts[lo:hi], self.durations[lo:hi], self.texts[lo:hi])
+
+    def window(self, start=None, end=None):
+        """Segments that overlap [start, end); either bound may be None."""
+        lo = 0
+        if start is not None:
+            lo = max(0, bisect_right(self.starts, start) - 1)
+            if lo < len(self) and self.starts[lo] + self.durations[lo] <= start:
+                lo += 1
+        hi = len(self) if end is None else bisect_left(self.starts, end)
+        return self._slice(lo, max(lo, hi))
+
+    def passages(self, max_chars):
+        """Merge consecutive segments into passages of at most max_chars characters.
+
+        Passages always start from the beginning of the video, so the same
+        passage comes out the same whichever window is asked for later, and
+        its translation and notes are cached once.
+        """
+        passages = Transcript()
+        first = 0
+        chars = 0
+        for index, text in enumerate(self.texts):
+            if index > first and chars + 1 + len(text) > max_chars:
+                passages._append_range(self, first, index)
+                first = index
+                chars = 0
+            chars += len(text) + (1 if chars else 0)
+        if first < len(self):
+            passages._append_range(self, first, len(self))
+        return passages
+
+    def _append_range(self, source, lo, hi):
+        self.starts.append(source.starts[lo])
+        self.durations.append(source.starts[hi - 1] + source.durations[hi - 1] - source.starts[lo])
+        self.texts.append(' '.join(source.texts[lo:hi]))
+
+    def sections(self, seconds):
+        """Texts of the fixed-length sections of the video clock that these segments fall in."""
+        sections = OrderedDict()
+        for start, text in zip(self.starts, self.texts):
+            sections.setdefault(int(start // seconds), []).append(text)
+        return [' '.join(texts) for texts in sections.values()]
+
+SRT_TIMING = re.compile(r'(\d+:\d{2}:\d{2}[,.]\d{1,3})\s*-->\s*(\d+:\d{2}:\d{2}[,.]\d{1,3})')
+
+def srt_seconds(value):
+    hours, minutes, seconds = value.replace(',', '.').split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def parse_timestamp(value):
+    """Seconds from '90', '90.5', '1:30' or '1:01:30'; None when not given."""
+    if value is None or value == '':
+        return None
     try:
-        video_id = extract_youtube_video_id(youtube_url)
-        logging.info(f"Processing transcript for video ID: {video_id}")
-        
-        # Get list of available transcripts
+        seconds = 0.0
+        for part in str(value).split(':'):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}")
+    if seconds < 0 or math.isinf(seconds) or math.isnan(seconds):
+        raise ValueError(f"Invalid timestamp: {value}")
+    return seconds
+
+def parse_time_window(args):
+    """(start, end) in seconds from ?start=&end=; a start alone means everything since then."""
+    start = parse_timestamp(args.get('start'))
+    end = parse_timestamp(args.get('end'))
+    if start is not None and end is not None and end <= start:
+        raise ValueError("end must be after start")
+    return start, end
+
+def video_timestamp_url(video_id, seconds):
+    return f"https://www.youtube.com/watch?v={video_id}&t={int(seconds)}s"
+
+LANGUAGE_CODE = re.compile(r'[A-Za-z]{2,3}(-[A-Za-z0-9]{2,8})?')
+
+def normalize_languages(languages):
+    """Language codes in order of preference, from a list or a comma-separated string.
+
+    Raises ValueError for anything but language codes such as 'en' or 'pt-BR'.
+    """
+    if languages is None:
+        return TRANSCRIPT_LANGUAGES
+    if isinstance(languages, str):
+        languages = languages.split(',')
+    if not isinstance(languages, list) or not all(isinstance(code, str) for code in languages):
+        raise ValueError("languages must be a list of language codes")
+    codes = [code.strip() for code in languages if code.strip()]
+    invalid = [code for code in codes if not LANGUAGE_CODE.fullmatch(code)]
+    if invalid:
+        raise ValueError(f"Invalid language code: {invalid[0][:20]!r}")
+    return codes or TRANSCRIPT_LANGUAGES
+
+def select_caption_track(transcript_list, languages):
+    """Manual captions in a preferred language, then generated ones, then the original-language track."""
+    from youtube_transcript_api._errors import NoTranscriptFound
+
+    for find_track in (transcript_list.find_manually_created_transcript, transcript_list.find_generated_transcript):
+        try:
+            return find_track(languages)
+        except NoTranscriptFound:
+            pass
+    # No preferred language; a manual track beats auto-generated captions
+    tracks = sorted(transcript_list, key=lambda track: track.is_generated)
+    if not tracks:
+        raise NoTranscriptFound(transcript_list.video_id, languages, transcript_list)
+    return tracks[0]
+
+def fetch_youtube_transcript(video_id, languages=None):
+    languages = normalize_languages(languages)
+    key = cache_key(video_id, source='youtube_transcript_api', languages=languages, format='timed')
+    cached = result_cache_get('transcript', key)
+    if cached is not None:
+        return cached
+
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    with timed_stage('transcript_fetch'):
         transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        
-        # Get the first available transcript (usually the original language)
-        transcript = next(iter(transcript_list))
-        
-        # Fetch the actual transcript data
+        transcript = select_caption_track(transcript_list, languages)
         transcript_data = transcript.fetch()
-        
-        # Extract all 'text' fields and concatenate them
-        full_text = ' '.join(item['text'] for item in transcript_data)
-        
-        # Truncate the full text to a maximum of 4000 characters
-        truncated_text = full_text[:4000]
-        
-        # Detect the language
-        detected_language = detect_language(truncated_text[:100])  # Use the first 100 characters for detection
-        
-        # Translate to English if not already in English
-        if detected_language != 'en':
-            translated_text = translate_to_english(truncated_text)
-            return {
-                'original_transcription': truncated_text,
-                'detected_language': detected_language,
-                'english_translation': translated_text
-            }
+    
+    # Keep each caption's timing so windows and summary links can use it
+    result = {
+        'segments': Transcript.from_entries(transcript_data).to_dict(),
+        'language_code': transcript.language_code,
+        'is_generated': transcript.is_generated
+    }
+    result_cache_put('transcript', key, result)
+    return result
+
+def captions_transcript(video_id, languages):
+    captions = fetch_youtube_transcript(video_id, languages)
+    full_text = ' '.join(captions['segments']['text'])
+    
+    # YouTube already knows the caption language; detection is only a fallback
+    return {
+        'segments': captions['segments'],
+        'detected_language': detect_language(full_text, hint=captions.get('language_code')),
+        'source': 'generated_captions' if captions['is_generated'] else 'manual_captions'
+    }
+
+async def whisper_transcript_async(youtube_url):
+    mp3_file = await asyncio.to_thread(download_youtube_audio, youtube_url)
+    # A cancelled hedge stops here, so Whisper is never billed once captions have won
+    return {**await asyncio.to_thread(whisper_transcript, mp3_file), 'source': 'whisper'}
+
+async def first_successful(sources):
+    """Await {task: name} and return the first successful result, cancelling the rest."""
+    for task in sources:
+        # A loser can still fail after the winner returns; mark its error as seen
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    pending = set(sources)
+    errors = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                errors.append(f"{sources[task]}: {task.exception()}")
+        raise RuntimeError(f"No transcript available ({'; '.join(errors)})")
+    finally:
+        for task in pending:
+            task.cancel()
+
+def _transcript_key(youtube_url, languages=None):
+    # The key names a lock file, so the languages go in as a digest
+    return f"{_video_id_key(youtube_url)}-{text_digest(','.join(normalize_languages(languages)))[:16]}"
+
+@async_single_flight('transcript', _transcript_key)
+async def acquire_transcript_async(youtube_url, languages=None):
+    """Get a video's transcript from the cheapest source that has one.
+
+    Order: transcript cache, manual captions, generated captions, then audio
+    download + Whisper. Whisper starts speculatively if captions have not
+    arrived after TRANSCRIPT_HEDGE_SECONDS, and whichever finishes first wins.
+    """
+    languages = normalize_languages(languages)
+    video_id = require_video_id(youtube_url)
+    key = cache_key(video_id, source='acquired', languages=languages, format='timed')
+    cached = await asyncio.to_thread(result_cache_get, 'transcript', key)
+    if cached is not None:
+        return cached
+
+    logging.info(f"Processing transcript for video ID: {video_id}")
+    captions = asyncio.ensure_future(asyncio.to_thread(captions_transcript, video_id, languages))
+    sources = {captions: 'captions'}
+    # Pre-warming only uses captions unless PREWARM_WHISPER is set; Whisper is not in its token budget
+    if TRANSCRIPT_WHISPER_FALLBACK and (PREWARM_WHISPER or not _prewarm_run.get()):
+        hedge = TRANSCRIPT_HEDGE_SECONDS if TRANSCRIPT_HEDGE_SECONDS >= 0 else None
+        await asyncio.wait({captions}, timeout=hedge)
+        if not captions.done() or captions.exception() is not None:
+            logging.info(f"Captions for {video_id} are slow or missing; starting audio transcription")
+            sources[asyncio.ensure_future(whisper_transcript_async(youtube_url))] = 'whisper'
+
+    result = await first_successful(sources)
+    logging.info(f"Transcript for {video_id} came from {result['source']}")
+    await asyncio.to_thread(result_cache_put, 'transcript', key, result)
+    return result
+
+def localize_transcript(acquired, start=None, end=None):
+    """Cut an acquired transcript to a time window and translate only that window.
+
+    Returns the transcription result for the window and its English passages,
+    whose timings are used to link summary points back to the video.
+    """
+    passages = Transcript.from_dict(acquired['segments']).passages(TRANSLATION_CHUNK_CHARS).window(start, end)
+    if not passages:
+        raise EmptyTranscriptWindow("The transcript has no speech in the requested time window")
+    detected_language = acquired['detected_language']
+
+    # Translate to English if not already in English
+    if detected_language != 'en':
+        english = translate_transcript(passages, source_language=detected_language)
+        result = {
+            'original_transcription': passages.text,
+            'detected_language': detected_language,
+            'english_translation': english.text
+        }
+    else:
+        english = passages
+        result = {
+            'transcription': passages.text,
+            'detected_language': 'en'
+        }
+    if 'source' in acquired:
+        result['source'] = acquired['source']
+    if start is not None or end is not None:
+        result['window'] = {'start': passages.start, 'end': passages.end}
+    return result, english
+
+async def transcript_window_async(youtube_url, languages=None, start=None, end=None):
+    await asyncio.to_thread(note_video_request, extract_youtube_video_id(youtube_url))
+    acquired = await acquire_transcript_async(youtube_url, languages)
+    return await asyncio.to_thread(localize_transcript, acquired, start, end)
+
+def transcribe_youtube(youtube_url, languages=None, start=None, end=None):
+    """The transcription result for a video or a time window of it.
+
+    Raises ValueError for an invalid URL or a window without speech
+    (EmptyTranscriptWindow), and the pipeline's errors otherwise.
+    """
+    return run_pipeline(transcript_window_async(youtube_url, languages, start, end))[0]
+
+def init_job_store():
+    global _job_store_ready
+    if _job_store_ready:
+        return
+    with sqlite_db(JOBS_DB_PATH) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+    _job_store_ready = True
+
+def update_job(job_id, **fields):
+    fields['updated_at'] = time.time()
+    assignments = ', '.join(f"{name} = ?" for name in fields)
+    with sqlite_db(JOBS_DB_PATH) as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+def get_job(job_id):
+    init_job_store()
+    with sqlite_db(JOBS_DB_PATH) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job['payload'] = json.loads(job['payload'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+def claim_next_job():
+    # BEGIN IMMEDIATE takes the write lock up front, so two workers can never claim the same job
+    init_job_store()
+    conn = sqlite_connect(JOBS_DB_PATH)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', stage = 'starting', updated_at = ? WHERE id = ?",
+                (time.time(), row['id'])
+            )
+        conn.execute("COMMIT")
+        return row['id'] if row is not None else None
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def run_summary_pipeline(youtube_url, report_stage):
+    report_stage('transcript')
+    transcription_result, english = run_pipeline(transcript_window_async(youtube_url))
+
+    report_stage('summarize')
+    summary = summarize(transcript_summary_input(english))
+    return {
+        "transcription_result": transcription_result,
+        "summary": summary,
+        "summary_links": link_summary(summary, english, extract_youtube_video_id(youtube_url))
+    }
+
+def run_infographic_pipeline(youtube_url, report_stage):
+    result = run_summary_pipeline(youtube_url, report_stage)
+
+    report_stage('infographic')
+    generate_infographic(result['summary'])
+    result['infographic_key'] = infographic_cache_key(result['summary'])
+    return result
+
+JOB_PIPELINES = {
+    'summary': run_summary_pipeline,
+    'infographic': run_infographic_pipeline,
+    # Kept for existing clients: the same pipeline as 'infographic', captions first like every kind
+    'summary-infographic': run_infographic_pipeline,
+}
+
+def run_job(job_id):
+    _request_id.set(f"job-{job_id}")
+    # Jobs run in the background, so they get a longer budget than requests
+    _deadline.set(time.monotonic() + JOB_BUDGET_SECONDS)
+    job = get_job(job_id)
+    logging.info(f"Running job {job_id} ({job['kind']})")
+    meter = UsageMeter(job['payload'].get('tenant', ADMIN_TENANT))
+    _tenant_usage.set(meter)
+    try:
+        pipeline = JOB_PIPELINES[job['kind']]
+        result = pipeline(job['payload']['url'], lambda stage: update_job(job_id, stage=stage))
+        update_job(job_id, status='done', stage='done', result=json.dumps(result))
+    except Exception as e:
+        logging.error(f"Error running job {job_id}: {str(e)}")
+        update_job(job_id, status='failed', error=str(e))
+    finally:
+        meter.flush()
+
+def job_visible(job):
+    # Jobs from before tenants existed belong to the admin
+    owner = job['payload'].get('tenant', ADMIN_TENANT)
+    return g.tenant['tenant_id'] in (owner, ADMIN_TENANT)
+
+def get_job_executor():
+    global _job_executor
+    if _job_executor is None:
+        if JOB_POOL == 'process':
+            _job_executor = ProcessPoolExecutor(max_workers=JOB_WORKERS)
+        else:
+            _job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+    return _job_executor
+
+def dispatch_jobs():
+    # SQLite is the queue; each worker process pulls jobs while it has free slots.
+    # A draining worker leaves queued jobs for the other workers.
+    if _shutting_down.is_set():
+        return
+    while _job_slots.acquire(blocking=False):
+        try:
+            job_id = claim_next_job()
+        except Exception as e:
+            _job_slots.release()
+            logging.error(f"Error claiming job: {str(e)}")
+            return
+        if job_id is None:
+            _job_slots.release()
+            return
+        future = get_job_executor().submit(run_job, job_id)
+        future.add_done_callback(_on_job_finished)
+
+def _on_job_finished(future):
+    _job_slots.release()
+    if future.exception() is not None:
+        logging.error(f"Job worker crashed: {future.exception()}")
+    dispatch_jobs()
+
+def recover_jobs():
+    init_job_store()
+    # Jobs left running by a worker that died are put back on the queue
+    with sqlite_db(JOBS_DB_PATH) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', stage = NULL, updated_at = ? WHERE status = 'running' AND updated_at < ?",
+            (time.time(), time.time() - JOB_STALE_SECONDS)
+        )
+    dispatch_jobs()
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def job_response(job):
+    response = {
+        "id": job['id'],
+        "kind": job['kind'],
+        "status": job['status'],
+        "stage": job['stage'],
+        "created_at": job['created_at'],
+        "updated_at": job['updated_at']
+    }
+    if job['status'] == 'done':
+        response['result'] = job['result']
+        if job['result'].get('infographic_key'):
+            response['infographic_url'] = f"/jobs/{job['id']}/infographic"
+    if job['status'] == 'failed':
+        response['error'] = job['error']
+    return response
+
+def enqueue_job(kind, youtube_url, tenant):
+    """Queue a job unless the queue or the tenant's pending-job cap is full.
+
+    Returns the job ID, or None when the queue is full; raises TenantThrottled
+    at the tenant's cap. The counts and the insert share one write transaction,
+    so concurrent requests in any worker cannot all pass the checks.
+    """
+    init_job_store()
+    conn = sqlite_connect(JOBS_DB_PATH)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        job_id = None
+        pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+        if pending < JOB_WORKERS + JOB_QUEUE_SIZE:
+            if tenant['max_jobs']:
+                tenant_pending = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running') AND json_extract(payload, '$.tenant') = ?",
+                    (tenant['tenant_id'],)
+                ).fetchone()[0]
+                if tenant_pending >= tenant['max_jobs']:
+                    raise TenantThrottled('jobs', 30)
+
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps({"url": youtube_url, "tenant": tenant['tenant_id']}), now, now)
+            )
+        conn.execute("COMMIT")
+        return job_id
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+@app.route('/jobs', methods=['POST'])
+@require_auth
+def create_job():
+    data = request_json()
+    youtube_url = json_field(data, 'url')
+    kind = json_field(data, 'kind') or 'summary-infographic'
+
+    if not youtube_url:
+        return jsonify({"error": "No URL provided"}), 400
+    if kind not in JOB_PIPELINES:
+        return jsonify({"error": f"Invalid job kind. Expected one of {sorted(JOB_PIPELINES)}"}), 400
+    if not extract_youtube_video_id(youtube_url):
+        return jsonify({"error": "Invalid YouTube URL"}), 400
+
+    try:
+        job_id = enqueue_job(kind, youtube_url, g.tenant)
+    except TenantThrottled as e:
+        return throttled_response(e)
+    except Exception as e:
+        logging.error(f"Error creating job: {str(e)}")
+        return error_response(e)
+    if job_id is None:
+        response = jsonify({"error": "Job queue is full, try again later"})
+        response.headers['Retry-After'] = '30'
+        return response, 429
+
+    logging.info(f"Queued job {job_id} ({kind}) for {youtube_url}")
+    dispatch_jobs()
+    return jsonify({"id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+@require_auth
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None or not job_visible(job):
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_response(job))
+
+@app.route('/jobs/<job_id>/infographic', methods=['GET'])
+@require_auth
+def job_infographic(job_id):
+    job = get_job(job_id)
+    if job is None or not job_visible(job) or job['status'] != 'done' or not job['result'].get('infographic_key'):
+        return jsonify({"error": "Infographic not found"}), 404
+    try:
+        width = parse_image_width(request.args.get('w'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    image_path = result_cache_lookup('infographic', job['result']['infographic_key'], ext='png')
+    if image_path is None:
+        return jsonify({"error": "Infographic has expired from the cache"}), 410
+    return send_infographic(image_path, width)
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+@require_auth
+def job_events(job_id):
+    job = get_job(job_id)
+    if job is None or not job_visible(job):
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        last_state = None
+        while True:
+            job = get_job(job_id)
+            state = (job['status'], job['stage'])
+            if state != last_state:
+                last_state = state
+                event = 'stage' if job['status'] in ('queued', 'running') else job['status']
+                yield sse_event(event, job_response(job))
+            if job['status'] in ('done', 'failed'):
+                return
+            time.sleep(0.5)
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+def get_batch_executor():
+    global _batch_executor
+    with _inflight_lock:
+        if _batch_executor is None:
+            # Shared by all batch requests, so BATCH_CONCURRENCY caps the whole process
+            _batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='batch')
+    return _batch_executor
+
+def parse_batch_items(items):
+    """Group batch items by what they summarize, so duplicates are processed once.
+
+    Returns a dict mapping a dedupe key to (kind, value, [item indexes]).
+    """
+    work = {}
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"url": item}
+        if not isinstance(item, dict) or not (item.get('url') or item.get('text')) or not all(
+            isinstance(item.get(name), (str, type(None))) for name in ('url', 'text')
+        ):
+            raise ValueError(f"Item {index} must be a URL string or an object with a 'url' or 'text' string")
+        if item.get('url'):
+            video_id = extract_youtube_video_id(item['url'])
+            if not video_id:
+                raise ValueError(f"Item {index} has an invalid YouTube URL")
+            key, kind, value = f"video:{video_id}", 'url', item['url']
+        else:
+            key, kind, value = f"text:{text_digest(item['text'])}", 'text', item['text']
+        work.setdefault(key, (kind, value, []))[2].append(index)
+    return work
+
+def detect_batch_languages(work):
+    """Detect the language of every text item in one pass; returns {work key: language}."""
+    text_keys = [key for key, (kind, _, _) in work.items() if kind == 'text']
+    languages = identify_languages([work[key][1] for key in text_keys])
+    # Undetectable items are left out; they fail on their own when processed
+    return {key: result[0] for key, result in zip(text_keys, languages) if result is not None}
+
+def summarize_batch_item(kind, value, detected_language=None):
+    # Items wait in the shared batch pool, so each gets a full budget when it starts
+    # instead of whatever the streaming request has left
+    _deadline.set(time.monotonic() + REQUEST_BUDGET_SECONDS)
+    if kind == 'url':
+        result = run_summary_pipeline(value, lambda stage: None)
+        return {
+            "video_id": extract_youtube_video_id(value),
+            "detected_language": result['transcription_result'].get('detected_language'),
+            "summary": result['summary']
+        }
+    return summarize_text_input(value, detected_language)
+
+async def prepare_batch_item_async(kind, value, detected_language, semaphore):
+    """Prepare one deferred item; returns (summary cache key, cached summary, condensed text).
+
+    The text is the one the sync pipelines summarize (for a video, the notes of
+    its transcript sections, as in run_summary_pipeline), so deferred and sync
+    summaries share a cache key. Only one of the summary and the text is set.
+    """
+    async with semaphore:
+        if kind == 'url':
+            _, english = await transcript_window_async(value)
+            text = await transcript_summary_input_async(english)
         else:
-            return {
-                'transcription': truncated_text,
-                'detected_language': 'en'
+            text = (await asyncio.to_thread(prepare_text_input, value, detected_language))[1]
+        key = summary_cache_key(text)
+        cached = await asyncio.to_thread(result_cache_get, 'summary', key)
+        if cached is not None:
+            return key, cached, None
+        return key, None, await condense_for_summary_async(text)
+
+async def prepare_provider_batch_async(work, languages):
+    # Failures are returned in place, so one bad item does not hold back the rest of the batch
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    return await asyncio.gather(
+        *(prepare_batch_item_async(kind, value, languages.get(key), semaphore) for key, (kind, value, _) in work.items()),
+        return_exceptions=True
+    )
+
+def init_provider_batch_store():
+    global _provider_batches_ready
+    if _provider_batches_ready:
+        return
+    with sqlite_db(JOBS_DB_PATH) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS provider_batches (
+                batch_id TEXT NOT NULL,
+                custom_id TEXT NOT NULL,
+                summary_key TEXT NOT NULL,
+                item_indexes TEXT NOT NULL,
+                tenant TEXT,
+                charged INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (batch_id, custom_id)
+            )
+        """)
+        # Stores created before batches had owners; their rows keep a NULL tenant
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(provider_batches)")}
+        if 'tenant' not in columns:
+            conn.execute("ALTER TABLE provider_batches ADD COLUMN tenant TEXT")
+        if 'charged' not in columns:
+            conn.execute("ALTER TABLE provider_batches ADD COLUMN charged INTEGER NOT NULL DEFAULT 0")
+        # A deferred batch from the time it is accepted until its provider batch is created
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS batch_submissions (
+                id TEXT PRIMARY KEY,
+                tenant TEXT NOT NULL,
+                status TEXT NOT NULL,
+                provider_batch_id TEXT,
+                results TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+    _provider_batches_ready = True
+
+def update_batch_submission(submission_id, **fields):
+    fields['updated_at'] = time.time()
+    assignments = ', '.join(f"{name} = ?" for name in fields)
+    with sqlite_db(JOBS_DB_PATH) as conn:
+        conn.execute(f"UPDATE batch_submissions SET {assignments} WHERE id = ?", (*fields.values(), submission_id))
+
+def get_batch_submission(submission_id):
+    init_provider_batch_store()
+    with sqlite_db(JOBS_DB_PATH) as conn:
+        row = conn.execute("SELECT * FROM batch_submissions WHERE id = ?", (submission_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+def provider_batch_results(batch_id, timeout=None):
+    # Read in full inside the attempt, so a dropped connection is retried rather than truncating the results
+    return list(get_claude_client().messages.batches.results(batch_id, timeout=timeout))
+
+def claim_provider_batch_charge(batch_id, custom_id):
+    """True the first time a batch result is collected, so its usage is charged only once."""
+    with sqlite_db(JOBS_DB_PATH) as conn:
+        return conn.execute(
+            "UPDATE provider_batches SET charged = 1 WHERE batch_id = ? AND custom_id = ? AND charged = 0",
+            (batch_id, custom_id)
+        ).rowcount == 1
+
+def run_provider_batch(submission_id, work, languages, tenant_id):
+    """Prepare a deferred batch, then submit its uncached summaries as one Anthropic message batch.
+
+    Runs on the batch pool after the request has returned. Transcripts,
+    translations and section notes are charged to tenant_id, like a job's.
+    """
+    _request_id.set(f"batch-{submission_id}")
+    # Preparing runs in the background, so it gets a job's budget like the jobs queue
+    _deadline.set(time.monotonic() + JOB_BUDGET_SECONDS)
+    meter = UsageMeter(tenant_id)
+    _tenant_usage.set(meter)
+    try:
+        update_batch_submission(submission_id, status='preparing')
+        results = []
+        requests_by_id = {}
+        pending = []
+        prepared = run_pipeline(prepare_provider_batch_async(work, languages))
+        for number, ((_, _, indexes), outcome) in enumerate(zip(work.values(), prepared)):
+            if isinstance(outcome, BaseException):
+                logging.error(f"Error preparing batch item: {str(outcome)}")
+                results.extend({"index": index, "error": str(outcome)} for index in indexes)
+                continue
+            summary_key, cached, text = outcome
+            if cached is not None:
+                results.extend({"index": index, "summary": cached} for index in indexes)
+                continue
+            custom_id = f"item-{number}"
+            requests_by_id[custom_id] = {
+                "custom_id": custom_id,
+                "params": {
+                    "model": SUMMARY_MODEL,
+                    "max_tokens": 1000,
+                    "messages": summary_messages(text)
+                }
             }
+            pending.append((custom_id, summary_key, json.dumps(indexes)))
+
+        batch_id = None
+        if pending:
+            batch = call_provider(
+                'anthropic', get_claude_client().messages.batches.create, requests=list(requests_by_id.values())
+            )
+            batch_id = batch.id
+            with sqlite_db(JOBS_DB_PATH) as conn:
+                conn.executemany(
+                    "INSERT INTO provider_batches (batch_id, custom_id, summary_key, item_indexes, tenant) VALUES (?, ?, ?, ?, ?)",
+                    [(batch_id, custom_id, summary_key, indexes, tenant_id) for custom_id, summary_key, indexes in pending]
+                )
+            logging.info(f"Submitted provider batch {batch_id} with {len(pending)} summaries")
+        update_batch_submission(submission_id, status='submitted', provider_batch_id=batch_id, results=json.dumps(results))
+    except Exception as e:
+        logging.error(f"Error submitting batch {submission_id}: {str(e)}")
+        update_batch_submission(submission_id, status='failed', error=str(e))
+    finally:
+        meter.flush()
+
+def submit_provider_batch(work, languages=None, tenant_id=ADMIN_TENANT):
+    """Accept a deferred batch and prepare it in the background; returns its ID.
+
+    Batched requests cost less but may take hours, so this is only for non-urgent work.
+    The batch is recorded as tenant_id's; only that tenant and the admin can read it.
+    """
+    init_provider_batch_store()
+    submission_id = uuid.uuid4().hex
+    now = time.time()
+    with sqlite_db(JOBS_DB_PATH) as conn:
+        conn.execute(
+            "INSERT INTO batch_submissions (id, tenant, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+            (submission_id, tenant_id, now, now)
+        )
+    submit_in_context(get_batch_executor(), run_provider_batch, submission_id, work, languages or {}, tenant_id)
+    return submission_id
+
+@app.route('/batch/summarize', methods=['POST'])
+@require_auth
+def batch_summarize():
+    data = request_json(MAX_REQUEST_BYTES)
+    items = data.get('items')
+    mode = json_field(data, 'mode') or 'sync'
     
+    if not items or not isinstance(items, list):
+        return jsonify({"error": "No items provided. Expected a list of URLs or texts."}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Too many items. At most {BATCH_MAX_ITEMS} are allowed per batch."}), 400
+    if mode not in ('sync', 'deferred'):
+        return jsonify({"error": "Invalid mode. Expected 'sync' or 'deferred'."}), 400
+
+    try:
+        work = parse_batch_items(items)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    logging.info(f"Batch of {len(items)} items ({len(work)} unique) in {mode} mode")
+    languages = detect_batch_languages(work)
+    if mode == 'deferred':
+        try:
+            batch_id = submit_provider_batch(work, languages, g.tenant['tenant_id'])
+        except Exception as e:
+            logging.error(f"Error submitting batch: {str(e)}")
+            return error_response(e)
+        return jsonify({"batch_id": batch_id, "status": "queued", "status_url": f"/batch/summarize/{batch_id}"}), 202
+
+    def generate():
+        futures = {
+            submit_in_context(get_batch_executor(), summarize_batch_item, kind, value, languages.get(key)): indexes
+            for key, (kind, value, indexes) in work.items()
+        }
+        # One NDJSON line per input item, in completion order; failures only affect their own items
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Error in batch item: {str(e)}")
+                result = {"error": str(e)}
+            for index in futures[future]:
+                yield json.dumps({"index": index, **result}) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+def collect_provider_batch(batch_id, rows, owner):
+    """Fetch an ended provider batch, cache its summaries and return its results by item index."""
+    # Batched tokens count against the budget of the tenant that submitted the batch,
+    # whoever collects the results
+    owner_meter = UsageMeter(owner)
+    results = []
+    try:
+        for entry in call_provider('anthropic', provider_batch_results, batch_id):
+            row = rows[entry.custom_id]
+            if entry.result.type == 'succeeded':
+                if claim_provider_batch_charge(batch_id, entry.custom_id):
+                    record_usage('anthropic', SUMMARY_MODEL, entry.result.message.usage, meter=owner_meter)
+                summary = parse_summary(entry.result.message.content[0].text)
+                result_cache_put('summary', row['summary_key'], summary)
+                result = {"summary": summary}
+            else:
+                result = {"error": f"Batch request {entry.result.type}"}
+            results.extend({"index": index, **result} for index in json.loads(row['item_indexes']))
+    finally:
+        owner_meter.flush()
+    return results
+
+@app.route('/batch/summarize/<batch_id>', methods=['GET'])
+@require_auth
+def batch_summarize_results(batch_id):
+    try:
+        submission = get_batch_submission(batch_id)
+        results = []
+        if submission is not None:
+            if g.tenant['tenant_id'] not in (submission['tenant'], ADMIN_TENANT):
+                return jsonify({"error": "Batch not found"}), 404
+            status = submission['status']
+            # Like a stale job, a batch still preparing this long was left behind by a worker that died
+            if status in ('queued', 'preparing') and submission['updated_at'] < time.time() - JOB_STALE_SECONDS:
+                status, submission['error'] = 'failed', "Batch preparation was interrupted; submit it again"
+            if status == 'failed':
+                return jsonify({"batch_id": batch_id, "status": "failed", "error": submission['error']})
+            if status != 'submitted':
+                return jsonify({"batch_id": batch_id, "status": status}), 202
+            results = json.loads(submission['results'])
+            provider_batch_id = submission['provider_batch_id']
+        else:
+            # Batches submitted before they were prepared in the background are known by their provider batch ID
+            provider_batch_id = batch_id
+
+        if provider_batch_id is not None:
+            with sqlite_db(JOBS_DB_PATH) as conn:
+                rows = {
+                    row['custom_id']: row
+                    for row in conn.execute("SELECT * FROM provider_batches WHERE batch_id = ?", (provider_batch_id,))
+                }
+            # Batches from before they had owners belong to the admin, like jobs
+            owner = (next(iter(rows.values()))['tenant'] if rows else None) or ADMIN_TENANT
+            if not rows or g.tenant['tenant_id'] not in (owner, ADMIN_TENANT):
+                return jsonify({"error": "Batch not found"}), 404
+
+            batch = call_provider('anthropic', get_claude_client().messages.batches.retrieve, provider_batch_id)
+            if batch.processing_status != 'ended':
+                return jsonify({"batch_id": batch_id, "status": batch.processing_status}), 202
+            results += collect_provider_batch(provider_batch_id, rows, owner)
+        return jsonify({"batch_id": batch_id, "status": "ended", "results": sorted(results, key=lambda r: r['index'])})
+    except Exception as e:
+        logging.error(f"Error fetching batch results: {str(e)}")
+        return error_response(e)
+
+def init_prewarm_db():
+    with sqlite_db(PREWARM_DB_PATH) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS prewarm_videos (
+                video_id TEXT PRIMARY KEY,
+                source TEXT,
+                discovered_at REAL,
+                warmed_at REAL,
+                error TEXT,
+                score REAL NOT NULL DEFAULT 0,
+                last_request REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS prewarm_videos_last_request ON prewarm_videos (last_request)")
+        conn.execute("CREATE TABLE IF NOT EXISTS prewarm_state (name TEXT PRIMARY KEY, value REAL)")
+
+def decayed_score(score, last_request, now):
+    # Each request adds 1 and the total halves every PREWARM_HIT_HALF_LIFE_SECONDS
+    if last_request is None:
+        return 0.0
+    return score * 0.5 ** ((now - last_request) / PREWARM_HIT_HALF_LIFE_SECONDS)
+
+def note_video_request(video_id):
+    """Count a request for a video, so hot videos are refreshed before they expire."""
+    if not PREWARM_ENABLED or not video_id or _prewarm_run.get():
+        return
+    now = time.time()
+    try:
+        init_prewarm_db()
+        conn = sqlite_connect(PREWARM_DB_PATH)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT score, last_request FROM prewarm_videos WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            score = decayed_score(row['score'], row['last_request'], now) + 1 if row else 1.0
+            conn.execute(
+                """
+                INSERT INTO prewarm_videos (video_id, score, last_request) VALUES (?, ?, ?)
+                ON CONFLICT (video_id) DO UPDATE SET score = excluded.score, last_request = excluded.last_request
+                """,
+                (video_id, score, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
     except Exception as e:
-        logging.error(f"Error in transcribe_youtube: {str(e)}")
-        return {'error': str(e)}
+        # Hit counting must never fail the request
+        logging.warning(f"Error counting request for {video_id}: {str(e)}")
+
+def in_prewarm_hours(now=None):
+    if not PREWARM_HOURS.strip():
+        return True
+    start, _, end = PREWARM_HOURS.partition('-')
+    start, end = int(start), int(end or start)
+    hour = time.gmtime(now).tm_hour
+    # "22-6" wraps around midnight
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+def parse_watch_source(source):
+    """('channel' | 'playlist' | 'url', id or URL) for a watchlist entry."""
+    match = re.search(r'[?&]list=([\w-]+)', source)
+    if match:
+        return 'playlist', match.group(1)
+    match = re.search(r'(?:^|/channel/)(UC[\w-]{22})$', source.rstrip('/'))
+    if match:
+        return 'channel', match.group(1)
+    if re.fullmatch(r'(?:PL|UU|OL|FL)[\w-]+', source):
+        return 'playlist', source
+    return 'url', source
+
+def get_youtube_api():
+    global _youtube_api
+    with _client_lock:
+        if _youtube_api is None:
+            from googleapiclient.discovery import build
+            client_options = {'api_endpoint': YOUTUBE_API_ENDPOINT} if YOUTUBE_API_ENDPOINT else None
+            _youtube_api = build(
+                'youtube', 'v3', developerKey=YOUTUBE_API_KEY, client_options=client_options, cache_discovery=False
+            )
+    return _youtube_api
+
+def discover_with_api(kind, source_id):
+    # Only the scheduler thread calls the Data API client, which is not thread-safe
+    api = get_youtube_api()
+    if kind == 'channel':
+        if source_id not in _uploads_playlists:
+            response = api.channels().list(part='contentDetails', id=source_id).execute(num_retries=2)
+            if not response.get('items'):
+                raise ValueError(f"Channel {source_id} not found")
+            _uploads_playlists[source_id] = response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+        source_id = _uploads_playlists[source_id]
+    response = api.playlistItems().list(
+        part='contentDetails', playlistId=source_id, maxResults=min(PREWARM_DISCOVER_LIMIT, 50)
+    ).execute(num_retries=2)
+    return [item['contentDetails']['videoId'] for item in response.get('items', [])]
+
+def discover_with_yt_dlp(kind, source_id):
+    import yt_dlp
+
+    if kind == 'channel':
+        url = f"https://www.youtube.com/channel/{source_id}/videos"
+    elif kind == 'playlist':
+        url = f"https://www.youtube.com/playlist?list={source_id}"
+    else:
+        url = source_id
+    # Flat extraction lists the entries without resolving each video
+    ydl_opts = {'extract_flat': 'in_playlist', 'playlistend': PREWARM_DISCOVER_LIMIT, 'quiet': True, 'no_warnings': True}
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    return [entry['id'] for entry in info.get('entries') or [] if entry and re.fullmatch(r'[\w-]{11}', entry.get('id') or '')]
+
+def discover_uploads():
+    """Record uploads on the watchlist that have not been seen before; returns how many were new."""
+    new_videos = 0
+    for source in PREWARM_WATCHLIST:
+        kind, source_id = parse_watch_source(source)
+        backend = 'api' if YOUTUBE_API_KEY and kind != 'url' else 'yt_dlp'
+        try:
+            with timed_stage('prewarm_discovery'):
+                if backend == 'api':
+                    video_ids = discover_with_api(kind, source_id)
+                else:
+                    video_ids = discover_with_yt_dlp(kind, source_id)
+        except Exception as e:
+            logging.error(f"Error discovering uploads for {source}: {str(e)}")
+            continue
+        with sqlite_db(PREWARM_DB_PATH) as conn:
+            inserted = conn.executemany(
+                "INSERT OR IGNORE INTO prewarm_videos (video_id, source, discovered_at) VALUES (?, ?, ?)",
+                [(video_id, source, time.time()) for video_id in video_ids]
+            ).rowcount
+        if inserted:
+            logging.info(f"Found {inserted} new uploads for {source}")
+            inc_counter('prewarm_discovered_total', inserted, backend=backend)
+        new_videos += inserted
+    return new_videos
+
+def prewarm_queue(now=None):
+    """(video_id, reason) pairs to warm: new uploads, newest first, then hot videos due for a refresh."""
+    now = now or time.time()
+    with sqlite_db(PREWARM_DB_PATH) as conn:
+        new_uploads = conn.execute(
+            "SELECT video_id FROM prewarm_videos WHERE warmed_at IS NULL AND source IS NOT NULL ORDER BY discovered_at DESC"
+        ).fetchall()
+        # Refreshing every half refresh-ahead period means no entry can expire between two refreshes
+        candidates = conn.execute(
+            """
+            SELECT video_id, score, last_request FROM prewarm_videos
+            WHERE last_request > ? AND (warmed_at IS NULL OR warmed_at < ?)
+            """,
+            (now - 10 * PREWARM_HIT_HALF_LIFE_SECONDS, now - PREWARM_REFRESH_AHEAD_SECONDS / 2)
+        ).fetchall()
+    queue = [(row['video_id'], 'new') for row in new_uploads]
+    queued = {video_id for video_id, _ in queue}
+    hot = sorted(
+        (
+            (decayed_score(row['score'], row['last_request'], now), row['video_id']) for row in candidates
+            if row['video_id'] not in queued
+        ),
+        reverse=True
+    )
+    queue.extend((video_id, 'refresh') for score, video_id in hot if score >= PREWARM_HOT_SCORE)
+    return queue
+
+def prewarm_budget_left():
+    return PREWARM_DAILY_TOKENS - tenant_usage(PREWARM_TENANT)['tokens']
+
+def mark_prewarmed(video_id, error=None):
+    # A failed video is not retried until its next refresh is due
+    with sqlite_db(PREWARM_DB_PATH) as conn:
+        conn.execute(
+            "UPDATE prewarm_videos SET warmed_at = ?, error = ? WHERE video_id = ?", (time.time(), error, video_id)
+        )
+
+async def prewarm_video_async(video_id, reason, semaphore):
+    async with semaphore:
+        # Checked per video, so a cycle stops when the budget or the off-peak window runs out
+        if not in_prewarm_hours() or await asyncio.to_thread(prewarm_budget_left) <= 0:
+            return 'skipped'
+        meter = UsageMeter(PREWARM_TENANT)
+        _tenant_usage.set(meter)
+        _prewarm_run.set(True)
+        _refresh_ahead.set(PREWARM_REFRESH_AHEAD_SECONDS if reason == 'refresh' else 0)
+        _deadline.set(time.monotonic() + JOB_BUDGET_SECONDS)
+        error = None
+        try:
+            await youtube_pipeline_async(f"https://www.youtube.com/watch?v={video_id}")
+        except Exception as e:
+            logging.warning(f"Pre-warming {video_id} failed: {str(e)}")
+            error = str(e)
+        finally:
+            await asyncio.to_thread(meter.flush)
+        await asyncio.to_thread(mark_prewarmed, video_id, error)
+        result = 'error' if error else 'ok'
+        inc_counter('prewarm_videos_total', reason=reason, result=result)
+        return result
+
+async def prewarm_videos_async(queue):
+    semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+    return await asyncio.gather(*(prewarm_video_async(video_id, reason, semaphore) for video_id, reason in queue))
+
+def run_prewarm_cycle():
+    """Discover new uploads, then warm them and refresh hot videos within the hours and budget."""
+    init_prewarm_db()
+    counts = {"discovered": discover_uploads(), "ok": 0, "error": 0, "skipped": 0}
+    if not in_prewarm_hours():
+        return counts
+    queue = prewarm_queue()
+    if queue:
+        logging.info(f"Pre-warming {len(queue)} videos")
+        for result in run_pipeline(prewarm_videos_async(queue)):
+            counts[result] += 1
+    return counts
+
+def _prewarm_scheduler():
+    while not _shutting_down.wait(PREWARM_INTERVAL_SECONDS):
+        try:
+            # One worker process runs each cycle; the others find the lock taken or the cycle recent
+            with try_file_lock('prewarm') as leader:
+                if not leader:
+                    continue
+                init_prewarm_db()
+                with sqlite_db(PREWARM_DB_PATH) as conn:
+                    row = conn.execute("SELECT value FROM prewarm_state WHERE name = 'last_cycle'").fetchone()
+                if row is not None and time.time() - row['value'] < PREWARM_INTERVAL_SECONDS:
+                    continue
+                with sqlite_db(PREWARM_DB_PATH) as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO prewarm_state (name, value) VALUES ('last_cycle', ?)", (time.time(),)
+                    )
+                _request_id.set(f"prewarm-{uuid.uuid4().hex[:8]}")
+                logging.info(f"Pre-warm cycle: {run_prewarm_cycle()}")
+        except Exception as e:
+            logging.error(f"Error in pre-warm cycle: {str(e)}")
+
+def start_prewarm_scheduler():
+    if not PREWARM_ENABLED:
+        return
+    init_prewarm_db()
+    threading.Thread(target=_prewarm_scheduler, name='prewarm-scheduler', daemon=True).start()
+
+def prewarm_status():
+    init_prewarm_db()
+    now = time.time()
+    with sqlite_db(PREWARM_DB_PATH) as conn:
+        counts = conn.execute(
+            """
+            SELECT COUNT(*) AS tracked,
+                   SUM(source IS NOT NULL AND warmed_at IS NULL) AS pending,
+                   SUM(error IS NOT NULL) AS failed
+            FROM prewarm_videos
+            """
+        ).fetchone()
+        recent = conn.execute(
+            "SELECT video_id, score, last_request, warmed_at FROM prewarm_videos WHERE last_request > ?",
+            (now - 10 * PREWARM_HIT_HALF_LIFE_SECONDS,)
+        ).fetchall()
+    hot = sorted(
+        (
+            {"video_id": row['video_id'], "score": round(decayed_score(row['score'], row['last_request'], now), 2),
+             "warmed_at": row['warmed_at']}
+            for row in recent
+        ),
+        key=lambda video: video['score'], reverse=True
+    )
+    return {
+        "enabled": PREWARM_ENABLED,
+        "watchlist": PREWARM_WATCHLIST,
+        "off_peak": in_prewarm_hours(now),
+        "tokens_today": tenant_usage(PREWARM_TENANT)['tokens'],
+        "daily_token_budget": PREWARM_DAILY_TOKENS,
+        "videos_tracked": counts['tracked'],
+        "uploads_pending": counts['pending'] or 0,
+        "failed": counts['failed'] or 0,
+        "hottest": [video for video in hot if video['score'] >= PREWARM_HOT_SCORE][:20],
+    }
+
+@app.route('/prewarm', methods=['GET'])
+@require_admin
+def prewarm_status_api():
+    try:
+        return jsonify(prewarm_status())
+    except Exception as e:
+        logging.error(f"Error reading pre-warm status: {str(e)}")
+        return error_response(e)
+
+def shutdown_executors(wait=True):
+    # Called when a gunicorn worker exits: stop pulling queued jobs, then let
+    # in-flight jobs and their fan-out pools finish
+    _shutting_down.set()
+    for executor in (_job_executor, _batch_executor, _translation_executor, _whisper_executor,
+                     _hedge_executor):
+        if executor is not None:
+            executor.shutdown(wait=wait)
+    if _engine_loop is not None:
+        _engine_loop.call_soon_threadsafe(_engine_loop.stop)
 
-# Add this function to convert SRT to plain text
 def convert_srt_to_text(srt_content):
-    lines = srt_content.split('\n')
-    text_lines = []
-    for line in lines:
-        if not line.strip().isdigit() and not '-->' in line and line.strip():
-            text_lines.append(line.strip())
-    return ' '.join(text_lines)
+    return Transcript.from_srt(srt_content).text
+
+def start_background_services():
+    """Start the cache janitor, language profile warm-up, job recovery and pre-warm scheduler.
+
+    Called once per worker process (gunicorn's post_worker_init, or __main__), not at
+    import, so importing the module starts no threads and creates no files. Repeat
+    calls in the same process do nothing.
+    """
+    global _background_services_pid
+    with _background_services_lock:
+        if _background_services_pid == os.getpid():
+            return
+        _background_services_pid = os.getpid()
+    start_audio_cache_janitor()
+    warm_language_detector()
+    recover_jobs()
+    start_prewarm_scheduler()
 
 if __name__ == "__main__":
-    # Ensure the temp_audio directory exists
-    os.makedirs("temp_audio", exist_ok=True)
+    start_background_services()
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""Compare plain langdetect.detect with the app's sampled, seeded language detection.
+
+Usage:
+    python benchmarks/langdetect_bench.py [--runs 20] [--output results.json]
+
+For texts of increasing size in several languages, this reports:
+- cold: the first detection in a fresh interpreter. Plain langdetect loads its
+  profiles during that call; the app has already loaded them when the worker started
+- warm: the median time per call once the profiles are loaded
+- batch: identify_languages over every sample at once
+- stability: how many distinct answers repeated calls give on a short, ambiguous text
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PARAGRAPHS = {
+    'en': "The committee met on Tuesday to discuss the new budget. Several members raised concerns about the cost of the project and asked for a detailed report before the next meeting.",
+    'es': "El comité se reunió el martes para hablar del nuevo presupuesto. Varios miembros expresaron su preocupación por el costo del proyecto y pidieron un informe detallado antes de la próxima reunión.",
+    'de': "Der Ausschuss traf sich am Dienstag, um den neuen Haushalt zu besprechen. Mehrere Mitglieder äußerten Bedenken über die Kosten des Projekts und baten vor der nächsten Sitzung um einen ausführlichen Bericht.",
+    'fr': "Le comité s'est réuni mardi pour discuter du nouveau budget. Plusieurs membres ont exprimé des inquiétudes quant au coût du projet et ont demandé un rapport détaillé avant la prochaine réunion.",
+}
+SIZES = (100, 10_000, 200_000)
+AMBIGUOUS_TEXT = "Taxi Bar Hotel"
+
+
+def sample_texts():
+    texts = {}
+    for language, paragraph in PARAGRAPHS.items():
+        for size in SIZES:
+            repeated = (paragraph + ' ') * (size // len(paragraph) + 1)
+            texts[f"{language}-{size}"] = (language, repeated[:size])
+    return texts
+
+
+def app_env(work_dir):
+    return dict(
+        os.environ,
+        OPENAI_API_KEY='benchmark',
+        CLAUDE_API_KEY='benchmark',
+        AUDIO_CACHE_DIR=os.path.join(work_dir, 'audio'),
+        RESULT_CACHE_DIR=os.path.join(work_dir, 'results'),
+        JOBS_DB_PATH=os.path.join(work_dir, 'jobs.db'),
+        TENANTS_DB_PATH=os.path.join(work_dir, 'tenants.db'),
+        TRANSLATION_MEMORY_PATH=os.path.join(work_dir, 'translation_memory.db'),
+        LOG_FORMAT='text',
+        PYTHONPATH=REPO_ROOT,
+    )
+
+
+def measure_cold(runs, work_dir):
+    # A worker warms the app's detector when it starts its background services;
+    # load it up front so the app timing is the first request after startup
+    code = {
+        'langdetect': (
+            "import time; t = time.perf_counter(); from langdetect import detect; "
+            "detect('Le comité s est réuni mardi'); print(time.perf_counter() - t)"
+        ),
+        'app': (
+            "import app, time; app.get_language_detector_factory(); t = time.perf_counter(); "
+            "app.identify_language('Le comité s est réuni mardi'); print(time.perf_counter() - t)"
+        ),
+    }
+    results = {}
+    for name, snippet in code.items():
+        timings = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c', snippet], env=app_env(work_dir), cwd=work_dir,
+                capture_output=True, text=True, check=True
+            ).stdout
+            timings.append(float(output.strip().splitlines()[-1]))
+        results[name] = summarize_timings(timings)
+    return results
+
+
+def measure_warm(app, runs):
+    from langdetect import detect
+
+    detect('warm up')
+    app.get_language_detector_factory()
+    results = {}
+    for name, (language, text) in sample_texts().items():
+        entry = {}
+        for approach, fn in (('langdetect', detect), ('app', lambda t: app.identify_language(t)[0])):
+            timings = []
+            answers = set()
+            for _ in range(runs):
+                start = time.perf_counter()
+                answers.add(fn(text))
+                timings.append(time.perf_counter() - start)
+            entry[approach] = {**summarize_timings(timings), 'correct': answers == {language}}
+        results[name] = entry
+    return results
+
+
+def measure_batch(app, runs):
+    texts = [text for _, text in sample_texts().values()]
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        app.identify_languages(texts)
+        timings.append(time.perf_counter() - start)
+    return {'texts': len(texts), **summarize_timings(timings)}
+
+
+def measure_stability(app, runs):
+    from langdetect import detect
+
+    return {
+        'text': AMBIGUOUS_TEXT,
+        'langdetect_distinct_answers': len({detect(AMBIGUOUS_TEXT) for _ in range(runs)}),
+        'app_distinct_answers': len({app.identify_language(AMBIGUOUS_TEXT)[0] for _ in range(runs)}),
+    }
+
+
+def summarize_timings(timings):
+    return {
+        'runs': len(timings),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20, help='calls per measurement')
+    parser.add_argument('--cold-runs', type=int, default=3, help='fresh interpreters per cold measurement')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = {'cold': measure_cold(args.cold_runs, work_dir)}
+
+        os.environ.update(app_env(work_dir))
+        sys.path.insert(0, REPO_ROOT)
+        import app
+
+        results['warm'] = measure_warm(app, args.runs)
+        results['batch'] = measure_batch(app, args.runs)
+        results['stability'] = measure_stability(app, args.runs)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
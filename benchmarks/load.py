@@ -0,0 +1,289 @@
+"""Offline load test: every endpoint against stubbed providers, under a real WSGI server.
+
+Usage:
+    python benchmarks/load.py [--endpoints summarize-youtube,summarize-text]
+                              [--requests 50] [--concurrency 8] [--videos 10]
+                              [--latency-ms 200] [--failure-rate 0.0]
+                              [--workers 2] [--threads 8] [--max-error-rate 0.0]
+                              [--output results.json] [--log servers.log]
+
+The stub provider server (stubs.py) and the app (stub_app.py) are started as
+subprocesses with fresh cache directories, so runs are reproducible and start
+cold. The app runs under gunicorn with gthread workers when gunicorn is
+installed, otherwise under Werkzeug's threaded server. Requests cycle through
+--videos distinct video IDs: fewer videos means more cache hits.
+
+For each endpoint the results record throughput, p50/p95/p99 latency and the
+mean response size, plus the peak resident memory of the app's process tree and
+the git commit, so two revisions can be compared by diffing their JSON files.
+The script exits with status 1 when an endpoint's share of failed requests
+(connection errors or 4xx/5xx) is above --max-error-rate; raise it when
+--failure-rate is set and some provider failures are expected to surface.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+
+# Every benchmark starts the app with this admin key (ADMIN_API_KEY) and sends it on each request
+ADMIN_API_KEY = 'benchmark-admin'
+AUTH_HEADERS = {'X-API-Key': ADMIN_API_KEY}
+SAMPLE_TEXT = " ".join(
+    f"Sentence {n} of the sample article describes another aspect of the subject." for n in range(300)
+)
+
+# name -> (method, path, request builder taking a video URL)
+ENDPOINTS = {
+    'summarize-youtube': ('POST', '/summarize-youtube', lambda url: {'json': {'url': url}}),
+    'summarize-youtube-stream': ('POST', '/summarize-youtube/stream', lambda url: {'json': {'url': url}, 'stream': True}),
+    'transcribe-youtube': ('POST', '/transcribe-youtube', lambda url: {'json': {'url': url}}),
+    'summarize-youtube-window': ('POST', '/summarize-youtube', lambda url: {
+        'json': {'url': url},
+        'params': {'start': 600, 'end': 900},
+    }),
+    'infographic-youtube': ('POST', '/infographic-youtube', lambda url: {'json': {'url': url}}),
+    'youtube-summary-infographic': ('POST', '/youtube-summary-infographic', lambda url: {'json': {'url': url}}),
+    'download-mp3-youtube': ('GET', '/download-mp3-youtube', lambda url: {'params': {'url': url}, 'stream': True}),
+    'summarize-text': ('POST', '/summarize-text', lambda url: {'json': {'text': f"{url} {SAMPLE_TEXT}"}}),
+    'summarize-text-stream': ('POST', '/summarize-text/stream', lambda url: {'json': {'text': f"{url} {SAMPLE_TEXT}"}, 'stream': True}),
+    'create-infographic': ('POST', '/create-infographic', lambda url: {'json': {'summary': [f"Key point about {url}", "Another key point"]}}),
+    'create-infographic-thumbnail': ('POST', '/create-infographic', lambda url: {
+        'json': {'summary': [f"Key point about {url}", "Another key point"]},
+        'params': {'w': 320},
+        'headers': {'Accept': 'image/webp'},
+    }),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start within {timeout}s")
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    return {'commit': git('rev-parse', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '--', 'app.py'))}
+
+
+def process_tree_rss(pid):
+    """Resident memory of a process and its descendants in bytes (Linux only)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return total
+
+
+class PeakRssSampler:
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if os.path.isdir('/proc'):
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def start_servers(args, work_dir):
+    provider_port = free_port()
+    app_port = free_port()
+    provider_url = f"http://127.0.0.1:{provider_port}"
+    env = dict(
+        os.environ,
+        STUB_LATENCY_MS=str(args.latency_ms),
+        STUB_JITTER_MS=str(args.jitter_ms),
+        STUB_FAILURE_RATE=str(args.failure_rate),
+        STUB_PROVIDER_URL=provider_url,
+        OPENAI_API_KEY='benchmark',
+        CLAUDE_API_KEY='benchmark',
+        OPENAI_BASE_URL=f"{provider_url}/v1",
+        ANTHROPIC_BASE_URL=provider_url,
+        AUDIO_CACHE_DIR=os.path.join(work_dir, 'audio'),
+        RESULT_CACHE_DIR=os.path.join(work_dir, 'results'),
+        JOBS_DB_PATH=os.path.join(work_dir, 'jobs.db'),
+        TENANTS_DB_PATH=os.path.join(work_dir, 'tenants.db'),
+        ADMIN_API_KEY=ADMIN_API_KEY,
+        LOG_FORMAT='text',
+    )
+    log = open(args.log or os.path.join(work_dir, 'servers.log'), 'w')
+    provider = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARK_DIR, 'stubs.py'), '--port', str(provider_port)],
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    if shutil.which('gunicorn'):
+        server = 'gunicorn'
+        command = [
+            'gunicorn', '--chdir', BENCHMARK_DIR, '--bind', f"127.0.0.1:{app_port}",
+            '--worker-class', 'gthread', '--workers', str(args.workers), '--threads', str(args.threads),
+            '--timeout', '300', 'stub_app:app',
+        ]
+    else:
+        server = 'werkzeug'
+        command = [sys.executable, os.path.join(BENCHMARK_DIR, 'stub_app.py'), '--port', str(app_port)]
+    app_process = subprocess.Popen(command, env=env, cwd=work_dir, stdout=log, stderr=subprocess.STDOUT)
+    wait_for_port(provider_port)
+    wait_for_port(app_port)
+    return server, provider, app_process, f"http://127.0.0.1:{app_port}"
+
+
+def run_endpoint(base_url, name, args, session):
+    method, path, build = ENDPOINTS[name]
+    video_urls = [f"https://www.youtube.com/watch?v=bench{n:06d}" for n in range(args.videos)]
+
+    def one_request(n):
+        kwargs = build(video_urls[n % len(video_urls)])
+        stream = kwargs.pop('stream', False)
+        headers = {**AUTH_HEADERS, **kwargs.pop('headers', {})}
+        received = 0
+        start = time.perf_counter()
+        try:
+            response = session.request(
+                method, base_url + path, headers=headers, timeout=args.timeout, stream=stream, **kwargs
+            )
+            # Streaming responses are timed until the last byte arrives
+            for chunk in response.iter_content(65536):
+                received += len(chunk)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        return time.perf_counter() - start, status, received
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        outcomes = list(executor.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _, _ in outcomes)
+    statuses = {}
+    for _, status, _ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': len(outcomes),
+        'errors': sum(1 for _, status, _ in outcomes if status is None or status >= 400),
+        'statuses': statuses,
+        'throughput_rps': round(len(outcomes) / elapsed, 3),
+        'mean_response_bytes': round(statistics.mean(received for _, _, received in outcomes)),
+        'latency_ms': {
+            'p50': percentile_ms(latencies, 50),
+            'p95': percentile_ms(latencies, 95),
+            'p99': percentile_ms(latencies, 99),
+            'mean': round(statistics.mean(latencies) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3),
+        },
+    }
+
+
+def percentile_ms(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[index] * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='comma-separated endpoint names')
+    parser.add_argument('--requests', type=int, default=50, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight at once')
+    parser.add_argument('--videos', type=int, default=10, help='distinct video IDs to cycle through')
+    parser.add_argument('--latency-ms', type=float, default=200, help='mean stub provider latency')
+    parser.add_argument('--jitter-ms', type=float, default=50, help='uniform jitter around the mean')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of provider calls that fail')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--timeout', type=float, default=300, help='per-request client timeout in seconds')
+    parser.add_argument('--max-error-rate', type=float, default=0.0, help='allowed fraction of failed requests per endpoint')
+    parser.add_argument('--log', help='keep the stub and app server logs in this file')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in names if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        server, provider, app_process, base_url = start_servers(args, work_dir)
+        try:
+            results = {
+                **git_commit(),
+                'server': server,
+                'ffmpeg': bool(shutil.which('ffmpeg')),
+                'config': {key: value for key, value in vars(args).items() if key not in ('output', 'log')},
+                'endpoints': {},
+            }
+            with requests.Session() as session, PeakRssSampler(app_process.pid) as sampler:
+                session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+                for name in names:
+                    results['endpoints'][name] = run_endpoint(base_url, name, args, session)
+            results['peak_rss_mb'] = round(sampler.peak / 2**20, 1) if sampler.peak else None
+        finally:
+            for process in (app_process, provider):
+                process.terminate()
+                process.wait(timeout=30)
+
+    failing = [
+        name for name, endpoint in results['endpoints'].items()
+        if endpoint['errors'] > args.max_error_rate * endpoint['requests']
+    ]
+    results['ok'] = not failing
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if failing:
+        sys.exit(f"Endpoints over --max-error-rate: {', '.join(failing)}")
+
+
+if __name__ == '__main__':
+    main()
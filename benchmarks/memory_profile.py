@@ -0,0 +1,263 @@
+"""Check that the memory a request needs stays within a linear bound of its input.
+
+Usage:
+    python benchmarks/memory_profile.py [--sentences 400,4000,40000]
+                                        [--text-kb 16,256,1536] [--bytes-per-char 12]
+                                        [--slack-mb 16] [--output results.json]
+
+Each measurement runs in a fresh interpreter that imports the app against the
+stub providers (stubs.py) and serves one small warm-up request first, so lazy
+imports and clients are already loaded. The peak resident memory of the
+process is then reset (Linux /proc/self/clear_refs) and one request is made,
+reading the response in chunks like a client would. The growth of the peak
+over the resident memory before the request is that request's cost.
+
+Measured requests:
+- youtube-summary-infographic: transcripts of each --sentences size
+- summarize-text: bodies of each --text-kb size
+- summarize-text-oversized: a chunked body far above MAX_TEXT_BODY_BYTES,
+  which must be refused with a 413 before it is read in full
+
+The bound is linear, not flat: a request holds its transcript or text while
+the pipeline runs, so its peak grows with the input. What is gated is that the
+rest of the request (encoding, caching, streaming the response) adds no copies
+on top. Two checks, and the script exits with status 1 when either fails, so
+it can gate a change:
+- every request stays under --slack-mb + --bytes-per-char * its input
+  characters (transcript text or accepted body)
+- for each request kind, the marginal growth between its smallest and largest
+  size, in bytes per added input character, stays under --bytes-per-char
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from load import ADMIN_API_KEY, AUTH_HEADERS, free_port, wait_for_port  # noqa: E402
+
+OVERSIZED_BODY_BYTES = 64 * 1024 * 1024
+SENTENCE = "Sentence {n} of the sample article describes another aspect of the subject. "
+
+
+def proc_status_bytes(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError(f"{field} missing from /proc/self/status")
+
+
+def reset_peak_rss():
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+
+
+class GeneratedBody(io.RawIOBase):
+    """A request body produced as it is read, so the client side holds none of it."""
+
+    def __init__(self, size):
+        self.remaining = size
+        self.chunk = b'{"text": "' + b'x' * (64 * 1024)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), len(self.chunk), self.remaining)
+        buffer[:n] = self.chunk[:n]
+        self.remaining -= n
+        return n
+
+
+def sample_text(size):
+    sentences, length, n = [], 0, 0
+    while length < size:
+        sentence = SENTENCE.format(n=n)
+        sentences.append(sentence)
+        length += len(sentence)
+        n += 1
+    return ''.join(sentences)[:size]
+
+
+def measure(kind, size, provider_url):
+    """Runs in the child interpreter; returns the request's input size and peak memory growth."""
+    import gc
+
+    import stubs
+    stubs.install_fakes(provider_url)
+    import app
+
+    client = app.app.test_client()
+
+    def consume(response):
+        received = sum(len(chunk) for chunk in response.response)
+        response.close()
+        return received
+
+    stubs.STUB_TRANSCRIPT_SENTENCES = 50
+    warm_up = client.post(
+        '/youtube-summary-infographic', json={'url': 'https://www.youtube.com/watch?v=warmup00000'},
+        headers=AUTH_HEADERS
+    )
+    consume(warm_up)
+    client.post('/summarize-text', json={'text': sample_text(2000)}, headers=AUTH_HEADERS)
+
+    if kind == 'youtube-summary-infographic':
+        stubs.STUB_TRANSCRIPT_SENTENCES = size
+        input_chars = sum(len(segment['text']) for segment in stubs.fake_transcript('memprofile0'))
+        request = lambda: client.post(  # noqa: E731
+            '/youtube-summary-infographic', json={'url': 'https://www.youtube.com/watch?v=memprofile0'},
+            headers=AUTH_HEADERS, buffered=False
+        )
+    elif kind == 'summarize-text':
+        body = json.dumps({'text': sample_text(size * 1024)})
+        input_chars = len(body)
+        request = lambda: client.post(  # noqa: E731
+            '/summarize-text', data=body, content_type='application/json', headers=AUTH_HEADERS, buffered=False
+        )
+    else:
+        # Chunked: no Content-Length, so only the incremental read can stop it. The test
+        # client always sets one, so the request goes to the WSGI app directly
+        from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+        input_chars = app.MAX_TEXT_BODY_BYTES
+        environ = EnvironBuilder(
+            path='/summarize-text', method='POST', content_type='application/json',
+            headers={**AUTH_HEADERS, 'Transfer-Encoding': 'chunked'}
+        ).get_environ()
+        environ.pop('CONTENT_LENGTH', None)
+        environ.update({'wsgi.input': GeneratedBody(size), 'wsgi.input_terminated': True})
+        request = lambda: app.app.response_class(*run_wsgi_app(app.app, environ))  # noqa: E731
+
+    gc.collect()
+    reset_peak_rss()
+    before = proc_status_bytes('VmRSS')
+    response = request()
+    status = response.status_code
+    received = consume(response)
+    peak = proc_status_bytes('VmHWM')
+    app.shutdown_executors(wait=True)
+    return {
+        'status': status,
+        'content_type': response.headers.get('Content-Type', '').split(';')[0],
+        'largest_header_bytes': max(len(value) for _, value in response.headers),
+        'input_chars': input_chars,
+        'response_bytes': received,
+        'peak_growth_mb': round((peak - before) / 2**20, 2),
+    }
+
+
+def run_child(kind, size, env):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', kind, str(size)],
+        env=env, cwd=env['WORK_DIR'], capture_output=True, text=True
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"{kind} {size} failed:\n{output.stderr[-4000:]}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sentences', default='400,4000,40000', help='transcript sizes in caption lines')
+    parser.add_argument('--text-kb', default='16,256,1536', help='/summarize-text body sizes in KB')
+    parser.add_argument('--bytes-per-char', type=float, default=12, help='allowed peak growth per input character')
+    parser.add_argument('--slack-mb', type=float, default=16, help='allowed peak growth independent of input size')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    parser.add_argument('--child', nargs=2, metavar=('KIND', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        kind, size = args.child
+        sys.path.insert(0, REPO_ROOT)
+        print(json.dumps(measure(kind, int(size), os.environ['STUB_PROVIDER_URL'])))
+        return
+    if not os.path.exists('/proc/self/clear_refs'):
+        parser.error('peak memory is read from /proc, so this only runs on Linux')
+
+    runs = [('youtube-summary-infographic', int(size)) for size in args.sentences.split(',')]
+    runs += [('summarize-text', int(size)) for size in args.text_kb.split(',')]
+    runs.append(('summarize-text-oversized', OVERSIZED_BODY_BYTES))
+
+    results = {'config': {key: value for key, value in vars(args).items() if key not in ('output', 'child')}, 'runs': []}
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        provider_port = free_port()
+        provider_url = f"http://127.0.0.1:{provider_port}"
+        env = dict(
+            os.environ,
+            WORK_DIR=work_dir,
+            STUB_LATENCY_MS='0',
+            STUB_JITTER_MS='0',
+            STUB_PROVIDER_URL=provider_url,
+            OPENAI_API_KEY='benchmark',
+            CLAUDE_API_KEY='benchmark',
+            OPENAI_BASE_URL=f"{provider_url}/v1",
+            ANTHROPIC_BASE_URL=provider_url,
+            ADMIN_API_KEY=ADMIN_API_KEY,
+            LOG_FORMAT='text',
+        )
+        log = open(os.path.join(work_dir, 'stubs.log'), 'w')
+        provider = subprocess.Popen(
+            [sys.executable, os.path.join(BENCHMARK_DIR, 'stubs.py'), '--port', str(provider_port)],
+            env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        try:
+            wait_for_port(provider_port)
+            for n, (kind, size) in enumerate(runs):
+                # Fresh caches for every run, so each request does the full pipeline
+                run_dir = os.path.join(work_dir, str(n))
+                os.makedirs(run_dir)
+                run_env = dict(
+                    env,
+                    WORK_DIR=run_dir,
+                    AUDIO_CACHE_DIR=os.path.join(run_dir, 'audio'),
+                    RESULT_CACHE_DIR=os.path.join(run_dir, 'results'),
+                    JOBS_DB_PATH=os.path.join(run_dir, 'jobs.db'),
+                    TENANTS_DB_PATH=os.path.join(run_dir, 'tenants.db'),
+                    TRANSLATION_MEMORY_PATH=os.path.join(run_dir, 'translation_memory.db'),
+                    PREWARM_DB_PATH=os.path.join(run_dir, 'prewarm.db'),
+                )
+                result = {'request': kind, 'size': size, **run_child(kind, size, run_env)}
+                limit_mb = args.slack_mb + args.bytes_per_char * result['input_chars'] / 2**20
+                result['limit_mb'] = round(limit_mb, 2)
+                expected_status = 413 if kind == 'summarize-text-oversized' else 200
+                if result['status'] != expected_status or result['peak_growth_mb'] > limit_mb:
+                    failures.append(result)
+                results['runs'].append(result)
+        finally:
+            provider.terminate()
+            provider.wait(timeout=30)
+
+    results['bytes_per_char'] = {}
+    for kind in dict.fromkeys(result['request'] for result in results['runs']):
+        sized = sorted((r for r in results['runs'] if r['request'] == kind), key=lambda r: r['input_chars'])
+        if len(sized) < 2 or sized[-1]['input_chars'] == sized[0]['input_chars']:
+            continue
+        marginal = (sized[-1]['peak_growth_mb'] - sized[0]['peak_growth_mb']) * 2**20 / (
+            sized[-1]['input_chars'] - sized[0]['input_chars']
+        )
+        results['bytes_per_char'][kind] = round(marginal, 2)
+        if marginal > args.bytes_per_char:
+            failures.append({'request': kind, 'bytes_per_char': marginal})
+
+    results['ok'] = not failures
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
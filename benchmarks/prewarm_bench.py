@@ -0,0 +1,167 @@
+"""Measure what pre-warming buys: first-request latency for warmed and cold videos.
+
+Usage:
+    python benchmarks/prewarm_bench.py [--uploads 5] [--latency-ms 200] [--output results.json]
+
+The stub provider server (stubs.py) is started as a subprocess and also serves
+the YouTube Data API, so discovery runs against a fake channel with --uploads
+videos. The app is imported in-process with pre-warming enabled at any hour.
+The benchmark then:
+- runs one pre-warm cycle and records what was discovered, warmed and spent
+- times the first /summarize-youtube request for a warmed upload and for a
+  video the scheduler has never seen
+- publishes a new upload and runs a second cycle, which warms only that video
+- makes one warmed video hot, ages its last warm, and runs a third cycle,
+  which refreshes it ahead of expiry
+
+The script exits with status 1 when a cycle fails to warm a video or a timed
+request does not succeed.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from load import ADMIN_API_KEY, AUTH_HEADERS, free_port, wait_for_port  # noqa: E402
+
+CHANNEL_ID = 'UCbenchmarkchannel000000'
+UPLOADS_PLAYLIST = 'UU' + CHANNEL_ID[2:]
+
+
+def app_env(args, work_dir, provider_url):
+    return dict(
+        os.environ,
+        STUB_LATENCY_MS=str(args.latency_ms),
+        STUB_UPLOADS=str(args.uploads),
+        STUB_PROVIDER_URL=provider_url,
+        OPENAI_API_KEY='benchmark',
+        CLAUDE_API_KEY='benchmark',
+        OPENAI_BASE_URL=f"{provider_url}/v1",
+        ANTHROPIC_BASE_URL=provider_url,
+        YOUTUBE_API_KEY='benchmark',
+        YOUTUBE_API_ENDPOINT=provider_url,
+        AUDIO_CACHE_DIR=os.path.join(work_dir, 'audio'),
+        RESULT_CACHE_DIR=os.path.join(work_dir, 'results'),
+        JOBS_DB_PATH=os.path.join(work_dir, 'jobs.db'),
+        TENANTS_DB_PATH=os.path.join(work_dir, 'tenants.db'),
+        TRANSLATION_MEMORY_PATH=os.path.join(work_dir, 'translation_memory.db'),
+        PREWARM_DB_PATH=os.path.join(work_dir, 'prewarm.db'),
+        ADMIN_API_KEY=ADMIN_API_KEY,
+        PREWARM_ENABLED='true',
+        PREWARM_WATCHLIST=CHANNEL_ID,
+        PREWARM_HOURS='',
+        # The benchmark drives cycles itself; keep the background scheduler idle
+        PREWARM_INTERVAL_SECONDS=str(86400),
+        PREWARM_DISCOVER_LIMIT=str(args.uploads + 1),
+        LOG_FORMAT='text',
+    )
+
+
+def timed_cycle(app):
+    tokens_before = app.tenant_usage(app.PREWARM_TENANT)['tokens']
+    start = time.perf_counter()
+    counts = app.run_prewarm_cycle()
+    return {
+        **counts,
+        'seconds': round(time.perf_counter() - start, 3),
+        'tokens': app.tenant_usage(app.PREWARM_TENANT)['tokens'] - tokens_before,
+    }
+
+
+def first_request_ms(client, video_id):
+    start = time.perf_counter()
+    response = client.post(
+        '/summarize-youtube', json={'url': f"https://www.youtube.com/watch?v={video_id}"}, headers=AUTH_HEADERS
+    )
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"{video_id}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+    return round(elapsed * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', type=int, default=5, help='uploads on the fake channel')
+    parser.add_argument('--latency-ms', type=float, default=200, help='mean stub provider latency')
+    parser.add_argument('--cold-videos', type=int, default=3, help='never-seen videos to time')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        provider_port = free_port()
+        provider_url = f"http://127.0.0.1:{provider_port}"
+        env = app_env(args, work_dir, provider_url)
+        log = open(os.path.join(work_dir, 'stubs.log'), 'w')
+        provider = subprocess.Popen(
+            [sys.executable, os.path.join(BENCHMARK_DIR, 'stubs.py'), '--port', str(provider_port)],
+            env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        try:
+            wait_for_port(provider_port)
+            os.environ.update(env)
+            sys.path.insert(0, REPO_ROOT)
+            import stubs
+            stubs.install_fakes(provider_url)
+            import app
+
+            client = app.app.test_client()
+            results = {'config': {key: value for key, value in vars(args).items() if key != 'output'}}
+            results['first_cycle'] = timed_cycle(app)
+
+            warmed = [video['video_id'] for video in recent_uploads(app)]
+            results['first_request_ms'] = {
+                'warmed': [first_request_ms(client, video_id) for video_id in warmed[:args.cold_videos]],
+                'cold': [first_request_ms(client, f"coldvid{n:04d}") for n in range(args.cold_videos)],
+            }
+
+            published = requests.post(f"{provider_url}/stub/publish/{UPLOADS_PLAYLIST}", timeout=30).json()['video_id']
+            results['second_cycle'] = {'published': published, **timed_cycle(app)}
+
+            # Make one warmed video hot, then pretend its last warm was long enough ago to be due.
+            # A refresh-ahead period longer than every TTL makes all of the video's entries due too
+            hot_video = warmed[0]
+            for _ in range(int(app.PREWARM_HOT_SCORE) + 1):
+                app.note_video_request(hot_video)
+            app.PREWARM_REFRESH_AHEAD_SECONDS = max(app.RESULT_CACHE_TTLS.values()) + 1
+            with app.sqlite_db(app.PREWARM_DB_PATH) as conn:
+                conn.execute(
+                    "UPDATE prewarm_videos SET warmed_at = ? WHERE video_id = ?",
+                    (time.time() - app.PREWARM_REFRESH_AHEAD_SECONDS, hot_video)
+                )
+            results['refresh_cycle'] = {'hot_video': hot_video, **timed_cycle(app)}
+            results['status'] = app.prewarm_status()
+            app.shutdown_executors(wait=True)
+        finally:
+            provider.terminate()
+            provider.wait(timeout=30)
+
+    failing = [name for name in ('first_cycle', 'second_cycle', 'refresh_cycle') if results[name]['error']]
+    results['ok'] = not failing
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if failing:
+        sys.exit(f"Pre-warm cycles with errors: {', '.join(failing)}")
+
+
+def recent_uploads(app):
+    with app.sqlite_db(app.PREWARM_DB_PATH) as conn:
+        return [dict(row) for row in conn.execute(
+            "SELECT video_id FROM prewarm_videos WHERE warmed_at IS NOT NULL AND error IS NULL ORDER BY discovered_at DESC"
+        ).fetchall()]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Measure worker cold-start time and per-request connection overhead.
+
+Usage:
+    python benchmarks/startup.py [--runs 10] [--ref baseline] [--url URL] [--output results.json]
+
+Import time is measured in fresh interpreters with dummy API keys, so no
+external API is called. With --ref, the app.py from that git revision is
+measured too for comparison. Connection overhead compares a new connection
+per request (bare requests.get) against the app's pooled session; it uses a
+local HTTP server unless --url is given (use an https URL to include TLS).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(app_dir, runs):
+    timings = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        env = dict(
+            os.environ,
+            OPENAI_API_KEY='benchmark',
+            CLAUDE_API_KEY='benchmark',
+            AUDIO_CACHE_DIR=os.path.join(work_dir, 'audio'),
+            RESULT_CACHE_DIR=os.path.join(work_dir, 'results'),
+            JOBS_DB_PATH=os.path.join(work_dir, 'jobs.db'),
+            TENANTS_DB_PATH=os.path.join(work_dir, 'tenants.db'),
+            PYTHONPATH=app_dir,
+        )
+        code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+        for _ in range(runs):
+            result = subprocess.run(
+                [sys.executable, '-c', code], env=env, cwd=work_dir,
+                capture_output=True, text=True, check=True
+            )
+            timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return summarize_timings(timings)
+
+
+def measure_import_at_ref(ref, runs):
+    source = subprocess.run(
+        ['git', 'show', f"{ref}:app.py"], cwd=REPO_ROOT,
+        capture_output=True, text=True, check=True
+    ).stdout
+    with tempfile.TemporaryDirectory() as app_dir:
+        with open(os.path.join(app_dir, 'app.py'), 'w') as f:
+            f.write(source)
+        return measure_import(app_dir, runs)
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Buffer writes so headers and body go out in one segment (avoids delayed-ACK stalls on keep-alive)
+    wbufsize = 65536
+
+    def do_GET(self):
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def measure_connections(url, requests_count):
+    import requests
+
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    os.environ.setdefault('CLAUDE_API_KEY', 'benchmark')
+    import app
+
+    def timed(get):
+        timings = []
+        for _ in range(requests_count):
+            start = time.perf_counter()
+            get(url).raise_for_status()
+            timings.append(time.perf_counter() - start)
+        return summarize_timings(timings)
+
+    return {
+        'url': url,
+        'fresh_connection': timed(lambda target: requests.get(target, timeout=10)),
+        'pooled_session': timed(app.http_get),
+    }
+
+
+def summarize_timings(timings):
+    return {
+        'runs': len(timings),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters per import measurement')
+    parser.add_argument('--requests', type=int, default=50, help='requests per connection measurement')
+    parser.add_argument('--ref', help='git revision to compare import time against')
+    parser.add_argument('--url', help='URL for the connection benchmark (defaults to a local server)')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    results = {'import': {'current': measure_import(REPO_ROOT, args.runs)}}
+    if args.ref:
+        results['import'][args.ref] = measure_import_at_ref(args.ref, args.runs)
+
+    server = None
+    url = args.url
+    if not url:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _OkHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+    try:
+        results['connections'] = measure_connections(url, args.requests)
+    finally:
+        if server:
+            server.shutdown()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
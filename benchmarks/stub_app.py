@@ -0,0 +1,46 @@
+"""WSGI entry point that runs the app against the stub providers in stubs.py.
+
+The provider SDKs are pointed at the stub server through OPENAI_BASE_URL and
+ANTHROPIC_BASE_URL, and YouTubeTranscriptApi/yt_dlp are replaced in-process,
+so nothing leaves the machine. load.py starts this module under gunicorn:
+
+    gunicorn --chdir benchmarks stub_app:app
+
+or, when gunicorn is not installed, with `python benchmarks/stub_app.py --port N`.
+"""
+import argparse
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stubs  # noqa: E402
+
+PROVIDER_URL = os.getenv('STUB_PROVIDER_URL', 'http://127.0.0.1:8900')
+
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+os.environ.setdefault('CLAUDE_API_KEY', 'benchmark')
+os.environ.setdefault('OPENAI_BASE_URL', f"{PROVIDER_URL}/v1")
+os.environ.setdefault('ANTHROPIC_BASE_URL', PROVIDER_URL)
+stubs.install_fakes(PROVIDER_URL)
+
+from app import app, start_background_services  # noqa: E402
+
+# load.py does not use the repository's gunicorn.conf.py, whose post_worker_init does this
+start_background_services()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    from werkzeug.serving import run_simple
+    run_simple(args.host, args.port, app, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,472 @@
+"""Local stand-ins for every external service the app talks to.
+
+The provider server speaks just enough of the OpenAI (chat, Whisper, DALL-E)
+and Anthropic (messages, including streaming, and message batches) HTTP APIs for the SDKs to work,
+and of the YouTube Data API (channels, playlistItems) for upload discovery. It
+also serves the generated image and the source audio. YouTubeTranscriptApi
+and yt_dlp are replaced in-process by install_fakes().
+
+Latency and failures are configured with environment variables:
+
+    STUB_LATENCY_MS          mean latency added to every provider call (default 200)
+    STUB_JITTER_MS           uniform jitter around the mean (default 50)
+    STUB_FAILURE_RATE        fraction of provider calls that fail (default 0)
+    STUB_FAILURE_STATUS      HTTP status used for failures (default 503)
+    STUB_DOWN_MODELS         comma-separated models whose calls always fail, for
+                             exercising circuit breakers and fallback models
+    STUB_SLOW_RATE           fraction of chat calls that take 10x longer, for hedging
+    STUB_TRANSCRIPT_SENTENCES  sentences per fake transcript (default 400)
+    STUB_AUDIO_SECONDS       length of the fake source audio (default 60)
+    STUB_IMAGE_SIZE          width/height of the fake infographic (default 1024)
+    STUB_UPLOADS             uploads listed per channel or playlist (default 5);
+                             POST /stub/publish/<playlist id> adds one more
+
+Run the provider server on its own with:
+    python benchmarks/stubs.py --port 8900
+"""
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import struct
+import sys
+import time
+import types
+import wave
+import zlib
+
+from flask import Flask, Response, request, jsonify
+
+STUB_LATENCY_MS = float(os.getenv('STUB_LATENCY_MS', 200))
+STUB_JITTER_MS = float(os.getenv('STUB_JITTER_MS', 50))
+STUB_FAILURE_RATE = float(os.getenv('STUB_FAILURE_RATE', 0))
+STUB_FAILURE_STATUS = int(os.getenv('STUB_FAILURE_STATUS', 503))
+STUB_DOWN_MODELS = {model.strip() for model in os.getenv('STUB_DOWN_MODELS', '').split(',') if model.strip()}
+STUB_SLOW_RATE = float(os.getenv('STUB_SLOW_RATE', 0))
+STUB_TRANSCRIPT_SENTENCES = int(os.getenv('STUB_TRANSCRIPT_SENTENCES', 400))
+STUB_AUDIO_SECONDS = int(os.getenv('STUB_AUDIO_SECONDS', 60))
+STUB_IMAGE_SIZE = int(os.getenv('STUB_IMAGE_SIZE', 1024))
+STUB_UPLOADS = int(os.getenv('STUB_UPLOADS', 5))
+
+SUMMARY_TEXT = "\n".join(f"- Point {n}: A key idea from the video" for n in range(1, 8))
+
+
+def simulate_latency(scale=1.0):
+    delay_ms = max(0.0, STUB_LATENCY_MS + random.uniform(-STUB_JITTER_MS, STUB_JITTER_MS)) * scale
+    time.sleep(delay_ms / 1000)
+
+
+def should_fail(model=None):
+    return model in STUB_DOWN_MODELS or random.random() < STUB_FAILURE_RATE
+
+
+def make_png(size):
+    """Build a valid RGB PNG with a pattern that compresses like a real illustration."""
+    rows = []
+    for y in range(size):
+        row = bytearray([0])
+        for x in range(size):
+            row += bytes(((x ^ y) & 0xFF, (x * 3) & 0xFF, (y * 5) & 0xFF))
+        rows.append(bytes(row))
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', header)
+        + chunk(b'IDAT', zlib.compress(b''.join(rows), 6))
+        + chunk(b'IEND', b'')
+    )
+
+
+def make_wav(seconds, sample_rate=16000):
+    """Mono WAV alternating four seconds of tone with one second of silence."""
+    frames = bytearray()
+    for n in range(seconds * sample_rate):
+        in_silence = (n // sample_rate) % 5 == 4
+        value = 0 if in_silence else int(3000 * math.sin(2 * math.pi * 220 * n / sample_rate))
+        frames += struct.pack('<h', value)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+def fake_transcript(video_id):
+    return [
+        {
+            'text': f"Sentence {n} of video {video_id} explains one more detail about the topic.",
+            'start': n * 4.0,
+            'duration': 4.0,
+        }
+        for n in range(STUB_TRANSCRIPT_SENTENCES)
+    ]
+
+
+def fake_upload_id(playlist_id, n):
+    return hashlib.sha1(f"{playlist_id}-{n}".encode()).hexdigest()[:11]
+
+
+# Provider HTTP server
+
+provider = Flask(__name__)
+_cached_png = None
+_published = {}
+_batches = {}
+_cached_wav = None
+
+
+def failure_response():
+    return jsonify({"error": {"type": "overloaded_error", "message": "Stub failure"}}), STUB_FAILURE_STATUS
+
+
+@provider.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    body = request.json
+    simulate_latency(10 if random.random() < STUB_SLOW_RATE else 1)
+    if should_fail(body['model']):
+        return failure_response()
+    prompt = body['messages'][-1]['content']
+    # Translation requests echo the source text, which keeps reassembly checkable
+    content = prompt.split('\n\n', 1)[-1]
+    return jsonify({
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body['model'],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": len(prompt + content) // 4},
+    })
+
+
+@provider.route('/v1/audio/transcriptions', methods=['POST'])
+def audio_transcriptions():
+    simulate_latency(scale=3)
+    if should_fail():
+        return failure_response()
+    upload = request.files['file'].read()
+    text = "This is the stub transcription of an audio segment. It talks about the topic at length."
+    if request.form.get('response_format') != 'verbose_json':
+        return Response(text, mimetype='text/plain')
+    duration = max(1.0, len(upload) / 3000)
+    return jsonify({
+        "task": "transcribe",
+        "language": "english",
+        "duration": duration,
+        "text": text,
+        "segments": [{"id": 0, "start": 0.0, "end": duration, "text": text}],
+    })
+
+
+@provider.route('/v1/images/generations', methods=['POST'])
+def images_generations():
+    simulate_latency(scale=5)
+    if should_fail():
+        return failure_response()
+    return jsonify({
+        "created": int(time.time()),
+        "data": [{"url": f"{request.host_url}images/stub.png", "revised_prompt": request.json['prompt']}],
+    })
+
+
+@provider.route('/youtube/v3/channels', methods=['GET'])
+def youtube_channels():
+    simulate_latency(scale=0.2)
+    channel_id = request.args['id']
+    return jsonify({
+        "kind": "youtube#channelListResponse",
+        "items": [{"id": channel_id, "contentDetails": {"relatedPlaylists": {"uploads": "UU" + channel_id[2:]}}}],
+    })
+
+
+@provider.route('/youtube/v3/playlistItems', methods=['GET'])
+def youtube_playlist_items():
+    simulate_latency(scale=0.2)
+    if should_fail():
+        return failure_response()
+    playlist_id = request.args['playlistId']
+    limit = int(request.args.get('maxResults', 5))
+    count = STUB_UPLOADS + _published.get(playlist_id, 0)
+    # Newest first, like a channel's uploads playlist
+    return jsonify({
+        "kind": "youtube#playlistItemListResponse",
+        "items": [
+            {"contentDetails": {"videoId": fake_upload_id(playlist_id, n)}}
+            for n in range(count - 1, max(-1, count - 1 - limit), -1)
+        ],
+    })
+
+
+@provider.route('/stub/publish/<playlist_id>', methods=['POST'])
+def publish_upload(playlist_id):
+    _published[playlist_id] = _published.get(playlist_id, 0) + 1
+    count = STUB_UPLOADS + _published[playlist_id]
+    return jsonify({"video_id": fake_upload_id(playlist_id, count - 1)})
+
+
+@provider.route('/images/<name>', methods=['GET'])
+def image(name):
+    global _cached_png
+    if _cached_png is None:
+        _cached_png = make_png(STUB_IMAGE_SIZE)
+    return Response(_cached_png, mimetype='image/png')
+
+
+@provider.route('/audio/<name>', methods=['GET'])
+def audio(name):
+    global _cached_wav
+    if _cached_wav is None:
+        _cached_wav = make_wav(STUB_AUDIO_SECONDS)
+    return Response(_cached_wav, mimetype='audio/wav')
+
+
+def _anthropic_stream(model, text, input_tokens):
+    def event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    yield event('message_start', {"type": "message_start", "message": {
+        "id": "msg_stub", "type": "message", "role": "assistant", "content": [], "model": model,
+        "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": input_tokens, "output_tokens": 1},
+    }})
+    yield event('content_block_start', {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+    for line in text.splitlines(keepends=True):
+        time.sleep(STUB_LATENCY_MS / 1000 / 10)
+        yield event('content_block_delta', {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": line}})
+    yield event('content_block_stop', {"type": "content_block_stop", "index": 0})
+    yield event('message_delta', {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": len(text) // 4}})
+    yield event('message_stop', {"type": "message_stop"})
+
+
+@provider.route('/v1/messages', methods=['POST'])
+def messages():
+    body = request.json
+    simulate_latency(10 if random.random() < STUB_SLOW_RATE else 1)
+    if should_fail(body['model']):
+        return failure_response()
+    input_tokens = len(json.dumps(body['messages'])) // 4
+    if body.get('stream'):
+        return Response(_anthropic_stream(body['model'], SUMMARY_TEXT, input_tokens), mimetype='text/event-stream')
+    return jsonify({
+        "id": "msg_stub",
+        "type": "message",
+        "role": "assistant",
+        "model": body['model'],
+        "content": [{"type": "text", "text": SUMMARY_TEXT}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": input_tokens, "output_tokens": len(SUMMARY_TEXT) // 4},
+    })
+
+
+def _message_batch(batch_id):
+    created = _batches[batch_id]['created_at']
+    counts = {"processing": 0, "succeeded": len(_batches[batch_id]['requests']), "errored": 0, "canceled": 0, "expired": 0}
+    return {
+        "id": batch_id,
+        "type": "message_batch",
+        "processing_status": "ended",
+        "request_counts": counts,
+        "created_at": created,
+        "ended_at": created,
+        "expires_at": created,
+        "archived_at": None,
+        "cancel_initiated_at": None,
+        "results_url": f"{request.host_url}v1/messages/batches/{batch_id}/results",
+    }
+
+
+@provider.route('/v1/messages/batches', methods=['POST'])
+def create_message_batch():
+    # Batches end as soon as they are created; every request succeeds with the stub summary
+    simulate_latency()
+    if should_fail():
+        return failure_response()
+    batch_id = f"msgbatch_stub{len(_batches):06d}"
+    _batches[batch_id] = {'requests': request.json['requests'], 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ')}
+    return jsonify(_message_batch(batch_id))
+
+
+@provider.route('/v1/messages/batches/<batch_id>', methods=['GET'])
+def retrieve_message_batch(batch_id):
+    simulate_latency(scale=0.2)
+    if should_fail():
+        return failure_response()
+    if batch_id not in _batches:
+        return jsonify({"error": {"type": "not_found_error", "message": "Batch not found"}}), 404
+    return jsonify(_message_batch(batch_id))
+
+
+@provider.route('/v1/messages/batches/<batch_id>/results', methods=['GET'])
+def message_batch_results(batch_id):
+    simulate_latency(scale=0.2)
+    if should_fail():
+        return failure_response()
+    lines = []
+    for entry in _batches[batch_id]['requests']:
+        model = entry['params']['model']
+        lines.append(json.dumps({"custom_id": entry['custom_id'], "result": {"type": "succeeded", "message": {
+            "id": "msg_stub", "type": "message", "role": "assistant", "model": model,
+            "content": [{"type": "text", "text": SUMMARY_TEXT}], "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": len(json.dumps(entry['params']['messages'])) // 4, "output_tokens": len(SUMMARY_TEXT) // 4},
+        }}}))
+    return Response('\n'.join(lines) + '\n', mimetype='application/binary')
+
+
+# In-process stand-ins for YouTubeTranscriptApi and yt_dlp
+
+class NoTranscriptFound(Exception):
+    pass
+
+
+class TranscriptsDisabled(Exception):
+    pass
+
+
+class FakeTranscript:
+    def __init__(self, video_id, language_code='en', is_generated=False):
+        self.video_id = video_id
+        self.language_code = language_code
+        self.is_generated = is_generated
+
+    def fetch(self):
+        simulate_latency()
+        if should_fail():
+            raise RuntimeError("Stub transcript fetch failure")
+        return fake_transcript(self.video_id)
+
+
+class FakeTranscriptList:
+    def __init__(self, video_id):
+        self.video_id = video_id
+        self._transcripts = [FakeTranscript(video_id)]
+        self.transcript_data = [{'language_code': 'en'}]
+
+    def __iter__(self):
+        return iter(self._transcripts)
+
+    def _find(self, language_codes, generated):
+        for transcript in self._transcripts:
+            if transcript.language_code in language_codes and generated in (None, transcript.is_generated):
+                return transcript
+        raise NoTranscriptFound(self.video_id)
+
+    def find_transcript(self, language_codes):
+        return self._find(language_codes, None)
+
+    def find_manually_created_transcript(self, language_codes):
+        return self._find(language_codes, False)
+
+    def find_generated_transcript(self, language_codes):
+        return self._find(language_codes, True)
+
+
+class FakeYouTubeTranscriptApi:
+    @classmethod
+    def list_transcripts(cls, video_id):
+        simulate_latency(scale=0.5)
+        return FakeTranscriptList(video_id)
+
+
+class FakeYoutubeDL:
+    provider_url = os.getenv('STUB_PROVIDER_URL', 'http://127.0.0.1:8900')
+
+    def __init__(self, options):
+        self.options = options
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def extract_info(self, url, download=True):
+        import requests
+
+        simulate_latency()
+        if self.options.get('extract_flat'):
+            # Channel and playlist listings come from the stub Data API, so published uploads show up here too
+            playlist_id = url.split('list=')[-1] if 'list=' in url else 'UU' + url.split('/channel/UC')[-1].split('/')[0]
+            response = requests.get(
+                f"{self.provider_url}/youtube/v3/playlistItems",
+                params={'playlistId': playlist_id, 'maxResults': self.options.get('playlistend') or 50}, timeout=30
+            )
+            response.raise_for_status()
+            return {'id': playlist_id, 'entries': [
+                {'id': item['contentDetails']['videoId']} for item in response.json()['items']
+            ]}
+        video_id = url.rsplit('/', 1)[-1].split('v=')[-1][:11]
+        audio_url = f"{self.provider_url}/audio/{video_id}.wav"
+        info = {'id': video_id, 'url': audio_url, 'ext': 'wav', 'http_headers': {}}
+        if not download:
+            return info
+
+        audio = requests.get(audio_url, timeout=30).content
+        template = self.options['outtmpl']
+        if self.options.get('postprocessors'):
+            self._write_mp3(audio, f"{template}.mp3")
+        else:
+            with open(template.replace('%(ext)s', 'wav'), 'wb') as f:
+                f.write(audio)
+        return info
+
+    def prepare_filename(self, info):
+        return self.options['outtmpl'].replace('%(ext)s', info['ext'])
+
+    def download(self, urls):
+        for url in urls:
+            self.extract_info(url, download=True)
+
+    @staticmethod
+    def _write_mp3(wav_bytes, path):
+        import shutil
+        import subprocess
+
+        if shutil.which('ffmpeg'):
+            subprocess.run(
+                ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error', '-f', 'wav', '-i', 'pipe:0', '-b:a', '192k', path],
+                input=wav_bytes, check=True
+            )
+        else:
+            # Without ffmpeg the bytes are not a real MP3, but download endpoints still work
+            with open(path, 'wb') as f:
+                f.write(wav_bytes)
+
+
+def install_fakes(provider_url):
+    """Register fake youtube_transcript_api and yt_dlp modules before the app imports them."""
+    FakeYoutubeDL.provider_url = provider_url
+
+    transcript_api = types.ModuleType('youtube_transcript_api')
+    transcript_api.YouTubeTranscriptApi = FakeYouTubeTranscriptApi
+    errors = types.ModuleType('youtube_transcript_api._errors')
+    errors.NoTranscriptFound = NoTranscriptFound
+    errors.TranscriptsDisabled = TranscriptsDisabled
+    transcript_api._errors = errors
+    sys.modules['youtube_transcript_api'] = transcript_api
+    sys.modules['youtube_transcript_api._errors'] = errors
+
+    yt_dlp = types.ModuleType('yt_dlp')
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+    sys.modules['yt_dlp'] = yt_dlp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    args = parser.parse_args()
+
+    from werkzeug.serving import run_simple
+    run_simple(args.host, args.port, provider, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
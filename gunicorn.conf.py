@@ -0,0 +1,49 @@
+# Production server settings; gunicorn picks this file up from the working directory:
+#   gunicorn app:app
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+# Requests spend nearly all their time waiting on remote APIs, so each worker
+# runs many threads. A request holds its thread until its pipeline is done
+# (the handlers block on the async engine), so threads * workers is the number
+# of requests served at once. Every worker process has its own caches and pools.
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+
+# Long pipelines (download, Whisper, summary, DALL-E) can take minutes
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 600))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# On SIGTERM, workers stop accepting connections and get this long to drain
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 300))
+
+# Recycling workers bounds slow memory growth; 0 disables it
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Header limits; the body limit is MAX_REQUEST_BYTES in app.py
+limit_request_line = int(os.getenv('GUNICORN_LIMIT_REQUEST_LINE', 8190))
+limit_request_fields = int(os.getenv('GUNICORN_LIMIT_REQUEST_FIELDS', 100))
+limit_request_field_size = int(os.getenv('GUNICORN_LIMIT_REQUEST_FIELD_SIZE', 8190))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+# Each worker loads the app itself and starts its own background services
+# (cache janitor, job dispatcher, pre-warm scheduler) in post_worker_init.
+preload_app = False
+
+
+def post_worker_init(worker):
+    from app import start_background_services
+    start_background_services()
+
+
+def worker_exit(server, worker):
+    # Background jobs and fan-out pools outlive the request that started them;
+    # wait for them so a restart does not cut pipelines off halfway
+    from app import shutdown_executors
+    shutdown_executors(wait=True)
@@ -0,0 +1,115 @@
+"""Fixtures that import the app against the stub providers in benchmarks/stubs.py.
+
+The stub provider server runs as a subprocess, and the app is configured
+through the environment before it is imported, with every database and cache
+in a temporary directory. No external API is called.
+"""
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(REPO_ROOT, 'benchmarks')
+sys.path[:0] = [REPO_ROOT, BENCHMARK_DIR]
+
+from load import ADMIN_API_KEY, AUTH_HEADERS, free_port, wait_for_port  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    work_dir = str(tmp_path_factory.mktemp('app'))
+    provider_port = free_port()
+    provider_url = f"http://127.0.0.1:{provider_port}"
+    env = {
+        'STUB_LATENCY_MS': '0',
+        'STUB_JITTER_MS': '0',
+        'STUB_PROVIDER_URL': provider_url,
+        'OPENAI_API_KEY': 'test',
+        'CLAUDE_API_KEY': 'test',
+        'OPENAI_BASE_URL': f"{provider_url}/v1",
+        'ANTHROPIC_BASE_URL': provider_url,
+        'AUDIO_CACHE_DIR': os.path.join(work_dir, 'audio'),
+        'RESULT_CACHE_DIR': os.path.join(work_dir, 'results'),
+        'JOBS_DB_PATH': os.path.join(work_dir, 'jobs.db'),
+        'TENANTS_DB_PATH': os.path.join(work_dir, 'tenants.db'),
+        'TRANSLATION_MEMORY_PATH': os.path.join(work_dir, 'translation_memory.db'),
+        'PREWARM_DB_PATH': os.path.join(work_dir, 'prewarm.db'),
+        'ADMIN_API_KEY': ADMIN_API_KEY,
+        'LOG_FORMAT': 'text',
+    }
+    with open(os.path.join(work_dir, 'stubs.log'), 'w') as log:
+        provider = subprocess.Popen(
+            [sys.executable, os.path.join(BENCHMARK_DIR, 'stubs.py'), '--port', str(provider_port)],
+            env=dict(os.environ, **env), stdout=log, stderr=subprocess.STDOUT
+        )
+    try:
+        wait_for_port(provider_port)
+        os.environ.update(env)
+        import stubs
+        stubs.install_fakes(provider_url)
+        import app
+
+        yield app
+        app.shutdown_executors(wait=True)
+    finally:
+        provider.terminate()
+        provider.wait(timeout=30)
+
+
+def metric_total(app_module, name, **labels):
+    return sum(
+        value for (metric, metric_labels), value in list(app_module._metric_values.items())
+        if metric == name and labels.items() <= dict(metric_labels).items()
+    )
+
+
+@pytest.fixture(autouse=True)
+def primary_models_serve(request):
+    """Fail a test when a fallback model answered, which hides a broken primary provider."""
+    if 'app_module' not in request.fixturenames:
+        yield
+        return
+    app_module = request.getfixturevalue('app_module')
+    before = metric_total(app_module, 'provider_fallbacks_total')
+    yield
+    assert metric_total(app_module, 'provider_fallbacks_total') == before, 'a fallback model served the request'
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def admin_headers():
+    return dict(AUTH_HEADERS)
+
+
+@pytest.fixture
+def make_tenant(app_module):
+    """Create a tenant with the given limits; returns (tenant_id, request headers)."""
+    def make(**limits):
+        tenant_id = f"tenant-{uuid.uuid4().hex[:12]}"
+        api_key, _ = app_module.create_tenant(tenant_id, **limits)
+        return tenant_id, {'X-API-Key': api_key}
+    return make
+
+
+def video_url(name):
+    # Video IDs are 11 characters
+    return f"https://www.youtube.com/watch?v={name[:11]:0<11}"
+
+
+def wait_for_batch_submission(app_module, batch_id, timeout=30):
+    """Wait until a deferred batch has been prepared in the background; returns its submission row."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        submission = app_module.get_batch_submission(batch_id)
+        if submission['status'] in ('submitted', 'failed'):
+            return submission
+        time.sleep(0.05)
+    raise AssertionError(f"Batch {batch_id} still {submission['status']} after {timeout}s")
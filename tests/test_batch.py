@@ -0,0 +1,101 @@
+import asyncio
+import json
+import threading
+
+from conftest import video_url, wait_for_batch_submission
+
+
+def ndjson(response):
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_sync_batch_has_one_line_per_item(client, admin_headers):
+    items = [
+        video_url('batch1'),
+        {'text': 'An article about rivers and the towns that grew up along them, for the batch test.'},
+        {'url': video_url('batch1')},
+        {'text': '1234 5678 90 ... !!!'},
+    ]
+    response = client.post('/batch/summarize', json={'items': items}, headers=admin_headers)
+    assert response.status_code == 200
+    lines = {line['index']: line for line in ndjson(response)}
+    assert sorted(lines) == [0, 1, 2, 3]
+    # Duplicate items are summarized once and reported under every index
+    assert lines[0]['summary'] == lines[2]['summary']
+    assert lines[0]['video_id'] == video_url('batch1')[-11:]
+    assert lines[1]['detected_language'] == 'en'
+    # One failing item does not fail the rest
+    assert 'error' in lines[3]
+
+
+def test_invalid_batches_are_400(client, admin_headers):
+    for body in (
+        {'items': []},
+        {'items': 'not a list'},
+        {'items': [{'url': 5}]},
+        {'items': ['https://example.com/not-youtube']},
+        {'items': [video_url('batch2')], 'mode': 'later'},
+    ):
+        response = client.post('/batch/summarize', json=body, headers=admin_headers)
+        assert response.status_code == 400, body
+
+
+def submit_deferred(client, headers, items):
+    response = client.post('/batch/summarize', json={'items': items, 'mode': 'deferred'}, headers=headers)
+    assert response.status_code == 202
+    return response.get_json()
+
+
+def test_deferred_batch(app_module, client, admin_headers):
+    items = [
+        {'text': 'A deferred article about lighthouses and the people who kept them, for the batch test.'},
+        video_url('deferred1'),
+    ]
+    batch = submit_deferred(client, admin_headers, items)
+    assert wait_for_batch_submission(app_module, batch['batch_id'])['status'] == 'submitted'
+    response = client.get(batch['status_url'], headers=admin_headers)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['status'] == 'ended'
+    assert [item['index'] for item in result['results']] == [0, 1]
+    assert all(item['summary'] for item in result['results'])
+
+    # Summaries fetched from the batch are cached, so the same items are not sent to the provider again
+    batch = submit_deferred(client, admin_headers, items)
+    assert wait_for_batch_submission(app_module, batch['batch_id'])['provider_batch_id'] is None
+    response = client.get(batch['status_url'], headers=admin_headers)
+    assert response.status_code == 200
+    assert [item['index'] for item in response.get_json()['results']] == [0, 1]
+
+
+def test_deferred_batch_reuses_sync_summaries(app_module, client, admin_headers):
+    url = video_url('deferred2')
+    response = client.post('/summarize-youtube', json={'url': url}, headers=admin_headers)
+    assert response.status_code == 200
+
+    batch = submit_deferred(client, admin_headers, [url])
+    # Keyed like the sync pipeline, so the video's summary is already cached
+    assert wait_for_batch_submission(app_module, batch['batch_id'])['provider_batch_id'] is None
+    result = client.get(batch['status_url'], headers=admin_headers).get_json()
+    assert result['results'] == [{'index': 0, 'summary': response.get_json()['summary']}]
+
+
+def test_deferred_batch_is_prepared_after_the_response(app_module, client, admin_headers, monkeypatch):
+    release = threading.Event()
+    prepare = app_module.prepare_batch_item_async
+
+    async def held_prepare(*args):
+        await asyncio.to_thread(release.wait, 30)
+        return await prepare(*args)
+    monkeypatch.setattr(app_module, 'prepare_batch_item_async', held_prepare)
+
+    try:
+        batch = submit_deferred(client, admin_headers, [video_url('deferred3')])
+        response = client.get(batch['status_url'], headers=admin_headers)
+        assert response.status_code == 202
+        assert response.get_json()['status'] in ('queued', 'preparing')
+    finally:
+        release.set()
+    assert wait_for_batch_submission(app_module, batch['batch_id'])['status'] == 'submitted'
+    assert client.get(batch['status_url'], headers=admin_headers).status_code == 200
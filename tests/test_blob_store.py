@@ -0,0 +1,79 @@
+import os
+import time
+import uuid
+
+import pytest
+
+from conftest import metric_total
+
+
+@pytest.fixture(params=['file', 's3'])
+def blob_store(request, app_module, monkeypatch, tmp_path):
+    """A shared blob store tier behind an empty local result cache; returns a function to switch replicas."""
+    if request.param == 's3':
+        moto = pytest.importorskip('moto')
+        for name, value in (('AWS_ACCESS_KEY_ID', 'test'), ('AWS_SECRET_ACCESS_KEY', 'test'),
+                            ('AWS_DEFAULT_REGION', 'us-east-1')):
+            monkeypatch.setenv(name, value)
+        mock = moto.mock_aws()
+        mock.start()
+        request.addfinalizer(mock.stop)
+        import boto3
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='results')
+        monkeypatch.setattr(app_module, 'BLOB_STORE_URL', 's3://results/cache')
+        monkeypatch.setattr(app_module, 'BLOB_STORE_ENDPOINT_URL', None)
+        monkeypatch.setattr(app_module, 'BLOB_STORE_REGION', 'us-east-1')
+    else:
+        monkeypatch.setattr(app_module, 'BLOB_STORE_URL', f"file://{tmp_path / 'shared'}")
+    monkeypatch.setattr(app_module, '_blob_store', None)
+    monkeypatch.setattr(app_module, '_blob_store_pid', None)
+
+    def use_replica(name):
+        # Each replica has its own local cache directory; the blob store is shared
+        monkeypatch.setattr(app_module, 'RESULT_CACHE_DIR', str(tmp_path / name))
+    use_replica('a')
+    return use_replica
+
+
+def promotes(app_module, result):
+    return metric_total(app_module, 'blob_store_requests_total', op='promote', result=result)
+
+
+def test_miss_then_promote_then_local_hit(app_module, blob_store):
+    key = uuid.uuid4().hex
+    misses = promotes(app_module, 'miss')
+    assert app_module.result_cache_get('summary', key) is None
+    assert promotes(app_module, 'miss') == misses + 1
+
+    app_module.result_cache_put('summary', key, ['A point from replica a'])
+
+    # Another replica finds the entry in the shared tier and copies it into its local cache
+    blob_store('b')
+    hits = promotes(app_module, 'hit')
+    assert app_module.result_cache_get('summary', key) == ['A point from replica a']
+    assert promotes(app_module, 'hit') == hits + 1
+    assert os.path.exists(app_module._result_cache_path('summary', key, 'json'))
+
+    # From then on it is served locally
+    assert app_module.result_cache_get('summary', key) == ['A point from replica a']
+    assert promotes(app_module, 'hit') == hits + 1
+
+
+def test_expired_blobs_are_not_promoted(app_module, blob_store, monkeypatch):
+    key = uuid.uuid4().hex
+    app_module.result_cache_put('summary', key, ['A point that expires'])
+    blob_store('b')
+
+    # Promoted while fresh, the local copy keeps the blob's creation time
+    assert app_module.result_cache_get('summary', key) == ['A point that expires']
+    later = time.time() + app_module.RESULT_CACHE_TTLS['summary'] + 60
+    monkeypatch.setattr(app_module.time, 'time', lambda: later)
+    assert app_module.result_cache_get('summary', key) is None
+    assert not os.path.exists(app_module._result_cache_path('summary', key, 'json'))
+
+    # Past the TTL, the shared copy is a miss for a replica that never had it
+    blob_store('c')
+    misses = promotes(app_module, 'miss')
+    assert app_module.result_cache_get('summary', key) is None
+    assert promotes(app_module, 'miss') == misses + 1
+    assert not os.path.exists(app_module._result_cache_path('summary', key, 'json'))
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+
+@pytest.fixture
+def breaker(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'BREAKER_FAILURE_THRESHOLD', 2)
+    monkeypatch.setattr(app_module, 'BREAKER_RESET_SECONDS', 30)
+    return app_module.CircuitBreaker('test-provider')
+
+
+def fail(breaker):
+    breaker.before_call()
+    breaker.record(requests.ConnectionError('connection refused'))
+
+
+def test_opens_after_threshold(app_module, breaker):
+    fail(breaker)
+    assert breaker.state == 'closed'
+    fail(breaker)
+    assert breaker.state == 'open'
+    with pytest.raises(app_module.ProviderUnavailable) as raised:
+        breaker.before_call()
+    assert 1 <= raised.value.retry_after <= 30
+
+
+def test_errors_that_do_not_blame_the_provider_reset_the_count(breaker):
+    fail(breaker)
+    breaker.before_call()
+    breaker.record(ValueError('bad input'))
+    fail(breaker)
+    assert breaker.state == 'closed'
+
+
+def test_half_open_probe_closes(app_module, breaker):
+    fail(breaker)
+    fail(breaker)
+    breaker.opened_at -= app_module.BREAKER_RESET_SECONDS
+    breaker.before_call()
+    assert breaker.state == 'half_open'
+    # Only one probe at a time
+    with pytest.raises(app_module.ProviderUnavailable):
+        breaker.before_call()
+    breaker.record()
+    assert breaker.state == 'closed'
+    breaker.before_call()
+
+
+def test_half_open_probe_failure_reopens(app_module, breaker):
+    fail(breaker)
+    fail(breaker)
+    breaker.opened_at -= app_module.BREAKER_RESET_SECONDS
+    fail(breaker)
+    assert breaker.state == 'open'
+
+
+def test_open_breakers_are_503(app_module, client, admin_headers, monkeypatch):
+    monkeypatch.setattr(app_module, '_breakers', {})
+    get_breaker = app_module.get_breaker
+
+    def open_breaker(provider):
+        # Completions have a breaker per model; open every one the request asks for
+        breaker = get_breaker(provider)
+        breaker.state, breaker.opened_at = 'open', time.monotonic()
+        return breaker
+    monkeypatch.setattr(app_module, 'get_breaker', open_breaker)
+
+    response = client.post(
+        '/summarize-text', json={'text': 'An article about open circuit breakers, written for the test suite.'},
+        headers=admin_headers
+    )
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+    assert set(app_module.breaker_states().values()) == {'open'}
+
+
+def half_open(app_module, provider):
+    breaker = app_module.get_breaker(provider)
+    breaker.state, breaker.opened_at = 'open', time.monotonic() - app_module.BREAKER_RESET_SECONDS
+    return breaker
+
+
+def test_client_disconnect_mid_stream_frees_the_probe(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, '_breakers', {})
+    breaker = half_open(app_module, f"anthropic/{app_module.SUMMARY_MODEL}")
+    events = app_module.stream_summary('A streamed article about breakers and disconnecting clients, for the test.')
+    for event, _ in events:
+        if event == 'token':
+            break
+    assert breaker.probing
+    events.close()
+
+    assert breaker.state == 'half_open' and not breaker.probing
+    # The next call is let through as the probe
+    breaker.before_call()
+
+
+def test_cancelled_call_frees_the_probe(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, '_breakers', {})
+    breaker = half_open(app_module, 'test-provider')
+
+    async def slow_call(timeout):
+        await asyncio.sleep(60)
+
+    async def cancel_during_probe():
+        task = asyncio.ensure_future(app_module.call_provider_async('test-provider', slow_call))
+        await asyncio.sleep(0.05)
+        assert breaker.probing
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_during_probe())
+    assert breaker.state == 'half_open' and not breaker.probing
@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import video_url
+
+
+def wait_for_job(app_module, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = app_module.get_job(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} still {job['status']} after {timeout}s")
+
+
+def insert_job(app_module, status, updated_at, tenant='admin'):
+    app_module.init_job_store()
+    job_id = uuid.uuid4().hex
+    with app_module.sqlite_db(app_module.JOBS_DB_PATH) as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, payload, status, stage, created_at, updated_at) VALUES (?, 'summary', ?, ?, 'summarize', ?, ?)",
+            (job_id, json.dumps({'url': video_url(job_id), 'tenant': tenant}), status, updated_at, updated_at)
+        )
+    return job_id
+
+
+def test_job_runs_to_completion(app_module, client, admin_headers):
+    for kind in ('summary', 'summary-infographic'):
+        response = client.post('/jobs', json={'url': video_url(f"job{kind}"), 'kind': kind}, headers=admin_headers)
+        assert response.status_code == 202
+        job = wait_for_job(app_module, response.get_json()['id'])
+        assert job['status'] == 'done', job['error']
+        assert job['result']['summary']
+        assert job['result']['transcription_result']['source'] == 'manual_captions'
+
+
+def test_recover_requeues_stale_running_jobs(app_module):
+    now = time.time()
+    stale = insert_job(app_module, 'running', now - app_module.JOB_STALE_SECONDS - 60)
+    fresh = insert_job(app_module, 'running', now)
+
+    app_module.recover_jobs()
+
+    # The stale job is put back on the queue and run again; a job still being worked on is left alone
+    job = wait_for_job(app_module, stale)
+    assert job['status'] == 'done', job['error']
+    assert job['result']['summary']
+    assert app_module.get_job(fresh)['status'] == 'running'
+
+
+def test_concurrent_enqueues_respect_the_tenant_cap(app_module, make_tenant):
+    tenant_id, _ = make_tenant(max_jobs=2)
+    tenant = app_module.load_tenant(tenant_id=tenant_id)
+    barrier = threading.Barrier(8)
+
+    def enqueue(n):
+        barrier.wait()
+        try:
+            return app_module.enqueue_job('summary', video_url(f"cap{n}"), tenant)
+        except app_module.TenantThrottled:
+            return None
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        job_ids = [job_id for job_id in executor.map(enqueue, range(8)) if job_id]
+    try:
+        assert len(job_ids) == 2
+    finally:
+        # Not dispatched; keep them from running in later tests
+        with app_module.sqlite_db(app_module.JOBS_DB_PATH) as conn:
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
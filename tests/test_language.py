@@ -0,0 +1,13 @@
+def test_detected_language(client, admin_headers):
+    response = client.post(
+        '/summarize-text', json={'text': 'Der schnelle braune Fuchs springt über den faulen Hund und läuft weiter.'},
+        headers=admin_headers
+    )
+    assert response.status_code == 200
+    assert response.get_json()['detected_language'] == 'de'
+
+
+def test_undetectable_language_is_400(client, admin_headers):
+    for path in ('/summarize-text', '/summarize-text/stream'):
+        response = client.post(path, json={'text': '1234 5678 90 ... !!!'}, headers=admin_headers)
+        assert response.status_code == 400, path
@@ -0,0 +1,9 @@
+def test_metrics_are_admin_only(client, admin_headers, make_tenant):
+    tenant_id, headers = make_tenant()
+    client.get(f"/tenants/{tenant_id}", headers=headers)
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers=headers).status_code == 403
+    response = client.get('/metrics', headers={'Authorization': f"Bearer {admin_headers['X-API-Key']}"})
+    assert response.status_code == 200
+    assert 'http_request_duration_seconds' in response.get_data(as_text=True)
@@ -0,0 +1,125 @@
+import io
+import json
+import tracemalloc
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.test import EnvironBuilder
+
+from conftest import metric_total
+
+SAMPLE_TEXT = " ".join(
+    f"Sentence {n} of the sample article describes another aspect of the subject." for n in range(20)
+)
+
+
+def test_requires_authentication(client):
+    response = client.post('/summarize-text', json={'text': SAMPLE_TEXT})
+    assert response.status_code == 401
+
+
+def test_summarize_text(app_module, client, admin_headers):
+    tokens_before = metric_total(app_module, 'provider_tokens_total', model=app_module.SUMMARY_MODEL)
+    response = client.post('/summarize-text', json={'text': SAMPLE_TEXT}, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.get_json()['detected_language'] == 'en'
+    assert response.get_json()['summary']
+    # The summary came from the primary model, not a fallback tier
+    assert metric_total(app_module, 'provider_tokens_total', model=app_module.SUMMARY_MODEL) > tokens_before
+
+
+def test_non_object_body_is_400(client, admin_headers):
+    response = client.post('/summarize-text', json=['not', 'an', 'object'], headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Request body must be a JSON object'}
+
+
+def test_invalid_json_is_400(client, admin_headers):
+    response = client.post(
+        '/summarize-text', data='{"text": ', content_type='application/json', headers=admin_headers
+    )
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Request body is not valid JSON'}
+
+
+def test_mistyped_field_is_400(client, admin_headers):
+    response = client.post('/summarize-text', json={'text': {'a': 1}}, headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "'text' must be a string"}
+
+
+def test_non_json_content_type_is_415(client, admin_headers):
+    response = client.post('/summarize-text', data='text=hello', content_type='text/plain', headers=admin_headers)
+    assert response.status_code == 415
+    assert 'error' in response.get_json()
+
+
+def test_body_over_json_cap_is_413(app_module, client, admin_headers):
+    body = json.dumps({'url': 'x' * (app_module.MAX_JSON_BODY_BYTES + 1)})
+    response = client.post('/summarize-youtube', data=body, content_type='application/json', headers=admin_headers)
+    assert response.status_code == 413
+    assert 'error' in response.get_json()
+
+
+def test_text_over_text_cap_is_413(app_module, client, admin_headers):
+    body = json.dumps({'text': 'x' * (app_module.MAX_TEXT_BODY_BYTES + 1)})
+    response = client.post('/summarize-text', data=body, content_type='application/json', headers=admin_headers)
+    assert response.status_code == 413
+
+
+def traced_peak(fn):
+    tracemalloc.start()
+    try:
+        result = fn()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_parsing_holds_at_most_two_copies_of_the_body(app_module):
+    for size in (app_module.MAX_TEXT_BODY_BYTES // 8, app_module.MAX_TEXT_BODY_BYTES // 2):
+        body = json.dumps({'text': 'x' * size}).encode()
+        with app_module.app.test_request_context(
+            '/summarize-text', method='POST', data=body, content_type='application/json'
+        ):
+            data, peak = traced_peak(lambda: app_module.request_json(app_module.MAX_TEXT_BODY_BYTES))
+        assert len(data['text']) == size
+        # The decoded text and the parsed values; the raw bytes are gone before parsing
+        assert peak < 2.2 * len(body)
+
+
+class GeneratedBody(io.RawIOBase):
+    """A chunked request body produced as it is read, counting what the app reads."""
+
+    def __init__(self, size):
+        self.remaining = size
+        self.read_bytes = 0
+        self.chunk = b'{"text": "' + b'x' * (64 * 1024)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), len(self.chunk), self.remaining)
+        buffer[:n] = self.chunk[:n]
+        self.remaining -= n
+        self.read_bytes += n
+        return n
+
+
+def test_oversized_chunked_body_is_refused_while_reading(app_module):
+    max_bytes = app_module.MAX_TEXT_BODY_BYTES
+    body = GeneratedBody(32 * max_bytes)
+    environ = EnvironBuilder(path='/summarize-text', method='POST', content_type='application/json').get_environ()
+    # Chunked: no Content-Length, so only the incremental read can stop it
+    environ.pop('CONTENT_LENGTH', None)
+    environ.update({'wsgi.input': body, 'wsgi.input_terminated': True})
+
+    def read():
+        with pytest.raises(RequestEntityTooLarge):
+            app_module.request_json(max_bytes)
+
+    with app_module.app.request_context(environ):
+        _, peak = traced_peak(read)
+    assert body.read_bytes <= max_bytes + app_module.BODY_CHUNK_BYTES
+    assert peak < 2.2 * max_bytes
@@ -0,0 +1,119 @@
+import json
+import time
+import uuid
+
+from conftest import video_url, wait_for_batch_submission
+
+SAMPLE_TEXT = "A short article about the weather in the mountains, written for the test suite."
+
+
+def test_rate_limit(client, make_tenant):
+    tenant_id, headers = make_tenant(rate_limit=2)
+    for _ in range(2):
+        assert client.get(f"/tenants/{tenant_id}", headers=headers).status_code == 200
+    response = client.get(f"/tenants/{tenant_id}", headers=headers)
+    assert response.status_code == 429
+    assert response.get_json()['reason'] == 'rate'
+    assert int(response.headers['Retry-After']) >= 1
+
+
+def test_daily_token_budget(app_module, client, make_tenant):
+    tenant_id, headers = make_tenant(daily_tokens=100)
+    app_module.charge_tenant(tenant_id, tokens=100)
+    response = client.post('/summarize-text', json={'text': SAMPLE_TEXT}, headers=headers)
+    assert response.status_code == 429
+    assert response.get_json()['reason'] == 'daily_tokens'
+    # Endpoints that spend no provider budget are still allowed
+    assert client.get(f"/tenants/{tenant_id}", headers=headers).status_code == 200
+
+
+def test_concurrency_cap(app_module, client, make_tenant):
+    tenant_id, headers = make_tenant(max_concurrent=1)
+    slot_id = app_module.admit_request(app_module.load_tenant(tenant_id=tenant_id), take_slot=True)
+    try:
+        response = client.post('/summarize-text', json={'text': SAMPLE_TEXT}, headers=headers)
+        assert response.status_code == 429
+        assert response.get_json()['reason'] == 'concurrency'
+    finally:
+        app_module.release_slot(slot_id)
+    assert client.post('/summarize-text', json={'text': SAMPLE_TEXT}, headers=headers).status_code == 200
+
+
+def test_pending_job_cap(app_module, client, make_tenant):
+    tenant_id, headers = make_tenant(max_jobs=1)
+    app_module.init_job_store()
+    now = time.time()
+    with app_module.sqlite_db(app_module.JOBS_DB_PATH) as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, 'summary', ?, 'running', ?, ?)",
+            (uuid.uuid4().hex, json.dumps({'url': 'https://youtu.be/pendingjob0', 'tenant': tenant_id}), now, now)
+        )
+    response = client.post('/jobs', json={'url': 'https://youtu.be/pendingjob1', 'kind': 'summary'}, headers=headers)
+    assert response.status_code == 429
+    assert response.get_json()['reason'] == 'jobs'
+
+
+def test_tenants_only_see_themselves(client, admin_headers, make_tenant):
+    tenant_a, headers_a = make_tenant()
+    tenant_b, _ = make_tenant()
+    assert client.get(f"/tenants/{tenant_b}", headers=headers_a).status_code == 404
+    assert client.get(f"/tenants/{tenant_a}", headers=admin_headers).status_code == 200
+
+
+def test_only_admin_creates_tenants(client, admin_headers, make_tenant):
+    _, headers = make_tenant()
+    assert client.post('/tenants', json={'tenant_id': 'someone-else'}, headers=headers).status_code == 403
+    response = client.post('/tenants', json={'tenant_id': 'created-by-admin', 'rate_limit': 5}, headers=admin_headers)
+    assert response.status_code == 201
+    assert response.get_json()['rate_limit'] == 5
+    created = {'X-API-Key': response.get_json()['api_key']}
+    assert client.get('/tenants/created-by-admin', headers=created).status_code == 200
+
+
+def test_jobs_are_private_to_their_tenant(app_module, client, admin_headers, make_tenant):
+    tenant_a, headers_a = make_tenant()
+    _, headers_b = make_tenant()
+    app_module.init_job_store()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with app_module.sqlite_db(app_module.JOBS_DB_PATH) as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, 'summary', ?, 'failed', ?, ?)",
+            (job_id, json.dumps({'url': video_url('privatejob'), 'tenant': tenant_a}), now, now)
+        )
+
+    assert client.get(f"/jobs/{job_id}", headers=headers_a).status_code == 200
+    assert client.get(f"/jobs/{job_id}", headers=headers_b).status_code == 404
+    assert client.get(f"/jobs/{job_id}", headers=admin_headers).status_code == 200
+
+
+def test_deferred_batches_are_private_to_their_tenant(app_module, client, admin_headers, make_tenant):
+    _, headers_a = make_tenant()
+    _, headers_b = make_tenant()
+    items = [{'text': 'A deferred article about harbours and the boats that used them, for the tenant test.'}]
+    response = client.post('/batch/summarize', json={'items': items, 'mode': 'deferred'}, headers=headers_a)
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    wait_for_batch_submission(app_module, response.get_json()['batch_id'])
+
+    assert client.get(status_url, headers=headers_b).status_code == 404
+    assert client.get(status_url, headers=headers_a).status_code == 200
+    assert client.get(status_url, headers=admin_headers).status_code == 200
+
+
+def test_deferred_batch_usage_is_charged_to_its_tenant_once(app_module, client, admin_headers, make_tenant):
+    tenant_id, headers = make_tenant()
+    items = [{'text': 'A deferred article about canals and the locks along them, for the usage test.'}]
+    response = client.post('/batch/summarize', json={'items': items, 'mode': 'deferred'}, headers=headers)
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    wait_for_batch_submission(app_module, response.get_json()['batch_id'])
+    tokens_submitted = app_module.tenant_usage(tenant_id)['tokens']
+
+    # Collected by the admin, charged to the tenant that submitted it
+    assert client.get(status_url, headers=admin_headers).status_code == 200
+    tokens_collected = app_module.tenant_usage(tenant_id)['tokens']
+    assert tokens_collected > tokens_submitted
+
+    assert client.get(status_url, headers=headers).status_code == 200
+    assert app_module.tenant_usage(tenant_id)['tokens'] == tokens_collected
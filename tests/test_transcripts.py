@@ -0,0 +1,49 @@
+from conftest import video_url
+
+
+def test_captions_in_requested_languages(client, admin_headers):
+    for languages in (None, ['en', 'de'], ['pt-BR']):
+        response = client.post(
+            '/transcribe-youtube', json={'url': video_url('languages'), 'languages': languages}, headers=admin_headers
+        )
+        assert response.status_code == 200, languages
+        assert response.get_json()['source'] == 'manual_captions'
+
+
+def test_invalid_languages_are_400(client, admin_headers):
+    for languages in (['../x'], 5, ['en', 3]):
+        response = client.post(
+            '/transcribe-youtube', json={'url': video_url('languages'), 'languages': languages}, headers=admin_headers
+        )
+        assert response.status_code == 400, languages
+
+
+def test_window_without_speech_is_400(client, admin_headers):
+    # The stub transcript is 400 captions of 4 seconds each
+    response = client.post(
+        '/transcribe-youtube', query_string={'start': 5000, 'end': 6000},
+        json={'url': video_url('window')}, headers=admin_headers
+    )
+    assert response.status_code == 400
+
+
+def test_transcribe_window(client, admin_headers):
+    response = client.post(
+        '/transcribe-youtube', query_string={'start': 40, 'end': 80},
+        json={'url': video_url('window')}, headers=admin_headers
+    )
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['source'] == 'manual_captions'
+    # Windows are cut at passage boundaries, so the result covers at least the requested span
+    assert result['window']['start'] <= 40 and result['window']['end'] >= 80
+
+
+def test_invalid_url_is_400_before_any_work(client, admin_headers):
+    for path in (
+        '/summarize-youtube', '/summarize-youtube/stream', '/infographic-youtube', '/youtube-summary-infographic',
+        '/transcribe-youtube', '/jobs',
+    ):
+        response = client.post(path, json={'url': 'https://example.com/not-a-video'}, headers=admin_headers)
+        assert response.status_code == 400, path
+        assert response.get_json() == {'error': 'Invalid YouTube URL'}, path